@@ -0,0 +1,106 @@
+"""
+Agregados de gasto sobre os resultados gravados.
+
+O ResultStore mantém a tabela facts: uma linha por documento (a coleta mais
+recente) com colunas já tipadas (valor em centavos, mês ISO, tipo,
+modalidade, contratada normalizada). Os agregados são um único GROUP BY no
+SQLite, sem percorrer linhas em Python: totais por mês, tipo, modalidade ou
+contratada, maiores fornecedores e distribuição por faixa de valor.
+"""
+import re
+import sqlite3
+import unicodedata
+from contextlib import closing
+from typing import List, Optional
+
+_RE_NO_VALUE = re.compile(r'sem impacto|sem ônus|sem onus|sem o acréscimo', re.IGNORECASE)
+# 1.234.567,89 | 1234,5 | 1234 (formato brasileiro)
+_RE_BR_VALUE = re.compile(r'(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{1,2}))?')
+# 1234.56 (ponto decimal, como a IA às vezes devolve)
+_RE_DOT_DECIMAL = re.compile(r'(?<![\d.])(\d+)\.(\d{2})(?![\d.])')
+_RE_COMPANY_SUFFIX = re.compile(r'\b(?:LTDA|EIRELI|EPP|ME|S A|SA|CIA)\b')
+
+GROUPS = {
+    "month": "month",
+    "doc_type": "doc_type",
+    "modality": "modality",
+    "contractor": "contractor_key",
+}
+# Limites das faixas de valor, em reais
+BUCKETS = [0, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def parse_value_cents(value: str) -> Optional[int]:
+    """'1.234,56 (mil duzentos...)' -> 123456; 'Sem impacto' -> 0; None se não houver valor"""
+    if not value or value.strip() in ("-", ""):
+        return None
+    if _RE_NO_VALUE.search(value):
+        return 0
+    if "," not in value:
+        m = _RE_DOT_DECIMAL.search(value)
+        if m:
+            return int(m.group(1)) * 100 + int(m.group(2))
+    m = _RE_BR_VALUE.search(value)
+    if not m:
+        return None
+    return int(m.group(1).replace(".", "")) * 100 + int((m.group(2) or "0").ljust(2, "0"))
+
+
+def contractor_key(name: str, company_doc: str = "") -> str:
+    """Chave da contratada: o CNPJ quando houver, senão o nome sem acentos, pontuação e sufixos (LTDA, ME...)"""
+    digits = re.sub(r'\D', '', company_doc or "")
+    if len(digits) == 14:
+        return digits
+    if not name or name.strip() in ("-", ""):
+        return ""
+    text = unicodedata.normalize("NFKD", name.upper())
+    text = "".join(ch for ch in text if ch.isalnum() or ch.isspace())
+    return " ".join(_RE_COMPANY_SUFFIX.sub(" ", text).split())
+
+
+def _filters(date_from: str = None, date_to: str = None, doc_types: List[str] = None, run_id: str = None):
+    where, params = ["1 = 1"], []
+    if date_from:
+        where.append("date_iso >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date_iso <= ?")
+        params.append(date_to)
+    if doc_types:
+        where.append(f"doc_type IN ({', '.join('?' for _ in doc_types)})")
+        params += doc_types
+    if run_id:
+        where.append("run_id = ?")
+        params.append(run_id)
+    return " AND ".join(where), params
+
+
+def aggregate(conn: sqlite3.Connection, group_by: str, limit: int = 100, **filters) -> List[dict]:
+    """Contagem, total, média e máximo (centavos) por grupo; contratadas por total, o resto pela chave"""
+    if group_by not in GROUPS:
+        raise ValueError(f"Agrupamento inválido; use {', '.join(GROUPS)}")
+    column = GROUPS[group_by]
+    where, params = _filters(**filters)
+    label = "MAX(contractor)" if group_by == "contractor" else column
+    order = "total_cents DESC" if group_by == "contractor" else "key"
+    sql = (f"SELECT {column} AS key, {label} AS label, COUNT(*) AS count, COUNT(value_cents) AS valued, "
+           f"COALESCE(SUM(value_cents), 0) AS total_cents, CAST(AVG(value_cents) AS INTEGER) AS avg_cents, "
+           f"MAX(value_cents) AS max_cents FROM facts WHERE {where} AND {column} != '' "
+           f"GROUP BY {column} ORDER BY {order} LIMIT ?")
+    with closing(conn.execute(sql, [*params, limit])) as cur:
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+
+
+def distribution(conn: sqlite3.Connection, **filters) -> List[dict]:
+    """Quantidade e total por faixa de valor (limites em BUCKETS, em reais)"""
+    where, params = _filters(**filters)
+    cases = " ".join(f"WHEN value_cents < {upper * 100} THEN {i}" for i, upper in enumerate(BUCKETS[1:]))
+    sql = (f"SELECT CASE {cases} ELSE {len(BUCKETS) - 1} END AS bucket, COUNT(*), SUM(value_cents) "
+           f"FROM facts WHERE {where} AND value_cents IS NOT NULL GROUP BY bucket ORDER BY bucket")
+    counts = {bucket: (count, total) for bucket, count, total in conn.execute(sql, params)}
+    return [
+        {"min_reais": low, "max_reais": BUCKETS[i + 1] if i + 1 < len(BUCKETS) else None,
+         "count": counts.get(i, (0, 0))[0], "total_cents": counts.get(i, (0, 0))[1]}
+        for i, low in enumerate(BUCKETS)
+    ]
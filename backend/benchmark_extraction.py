@@ -0,0 +1,245 @@
+"""
+Micro-benchmark da extração (lado CPU) com corpus dourado.
+
+Mede tempo por documento e pico de alocação de extract_details, de cada
+helper _extract_*, de extract_object e dos métodos de DiarioFormatter sobre
+o corpus em golden/corpus.json (repetido até --docs documentos), confere a
+acurácia contra os valores esperados e compara com golden/budget.json.
+Sai com código 1 se o tempo/memória piorar além da tolerância ou se a
+acurácia de qualquer campo cair. Uma função acima do orçamento de tempo é
+medida de novo (--confirm-runs vezes) e só conta como regressão se a
+mediana das medições ainda passar do limite: um pico de carga da máquina
+durante uma medição não derruba o gate.
+
+    python benchmark_extraction.py --docs 3000
+    python benchmark_extraction.py --update-budget   # grava o novo orçamento
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+from scraper_service import DiarioScraper
+from formatter import DiarioFormatter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(BASE_DIR, "golden")
+CORPUS_FILE = os.path.join(GOLDEN_DIR, "corpus.json")
+BUDGET_FILE = os.path.join(GOLDEN_DIR, "budget.json")
+
+REGEX_HELPERS = [
+    "_extract_modality", "_extract_dates", "_extract_contractor",
+    "_extract_contract_info", "_extract_values", "_classify_document",
+]
+FORMATTER_METHODS = [
+    "classificar_tipo", "extrair_vigencia", "extrair_numero_aditamento",
+    "extrair_numero_contrato_origem", "extrair_data_abertura",
+    "extrair_modalidade", "extrair_vencedor",
+]
+
+
+def load_corpus(path=CORPUS_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    for page in corpus.get("pages", []):
+        with open(os.path.join(BASE_DIR, page["html"]), "r", encoding="utf-8", errors="replace") as f:
+            page["content"] = f.read()
+    return corpus
+
+
+def build_cases(scraper, formatter, corpus):
+    """Monta {nome: (função, entradas)}; cada entrada é um documento"""
+    pages = corpus.get("pages", [])
+    texts = [t["sintese"] for t in corpus.get("texts", [])]
+    empty_soup = BeautifulSoup("", "html.parser")
+    soups = [BeautifulSoup(p["content"], "html.parser") for p in pages]
+
+    cases = {
+        "parse": (lambda html: BeautifulSoup(html, "html.parser"), [p["content"] for p in pages]),
+        "extract_details[page]": (scraper.extract_details, soups),
+        "extract_details[text]": (lambda t: scraper.extract_details(empty_soup, default_summary=t), texts),
+        "extract_object": (scraper.extract_object, texts),
+    }
+    for name in REGEX_HELPERS:
+        helper = getattr(scraper, name)
+        cases[name] = (lambda t, helper=helper: helper(t, scraper._new_details(t)), texts)
+    for name in FORMATTER_METHODS:
+        cases[f"formatter.{name}"] = (getattr(formatter, name), texts)
+    return {k: v for k, v in cases.items() if v[1]}
+
+
+def time_case(func, inputs, docs, repeat=3):
+    """µs por documento; usa a melhor de `repeat` medições para reduzir ruído"""
+    rounds = max(1, math.ceil(docs / len(inputs)))
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for item in inputs:
+                func(item)
+        best = min(best, time.perf_counter() - t0)
+    return best / (rounds * len(inputs)) * 1e6
+
+
+def alloc_case(func, inputs):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    for item in inputs:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return max(0, peak - base) / 1024
+
+
+def _norm(value):
+    return re.sub(r'\s+', ' ', str(value)).strip()
+
+
+def check_accuracy(scraper, formatter, corpus):
+    """Compara as saídas com os valores dourados; retorna (acurácia por campo, divergências)"""
+    hits = defaultdict(int)
+    totals = defaultdict(int)
+    mismatches = []
+
+    def check(case_id, field, got, expected):
+        totals[field] += 1
+        if _norm(got) == _norm(expected):
+            hits[field] += 1
+        else:
+            mismatches.append({"case": case_id, "field": field, "expected": expected, "got": got})
+
+    empty_soup = BeautifulSoup("", "html.parser")
+    for page in corpus.get("pages", []):
+        details = scraper.extract_details(BeautifulSoup(page["content"], "html.parser"))
+        for field, expected in page["expected"].get("details", {}).items():
+            check(page["id"], f"details.{field}", details.get(field, ""), expected)
+
+    for case in corpus.get("texts", []):
+        text, expected = case["sintese"], case["expected"]
+        details = scraper.extract_details(empty_soup, default_summary=text)
+        for field, value in expected.get("details", {}).items():
+            check(case["id"], f"details.{field}", details.get(field, ""), value)
+        if "object" in expected:
+            check(case["id"], "object", scraper.extract_object(text), expected["object"])
+        for method, value in expected.get("formatter", {}).items():
+            check(case["id"], f"formatter.{method}", getattr(formatter, method)(text), value)
+
+    accuracy = {field: round(hits[field] / totals[field], 4) for field in sorted(totals)}
+    accuracy["_overall"] = round(sum(hits.values()) / max(1, sum(totals.values())), 4)
+    return accuracy, mismatches
+
+
+def over_time_budget(name, us_per_doc, budget, time_tol):
+    b = budget.get("functions", {}).get(name)
+    # Folga absoluta (2µs) evita falsos alarmes em funções muito rápidas
+    return bool(b) and us_per_doc > b["us_per_doc"] * (1 + time_tol) + 2
+
+
+def confirm_times(report, cases, budget, time_tol, docs, repeat, runs):
+    """Remede as funções acima do orçamento de tempo e fica com a mediana das medições"""
+    for name, cur in report["functions"].items():
+        if runs <= 0 or not over_time_budget(name, cur["us_per_doc"], budget, time_tol):
+            continue
+        func, inputs = cases[name]
+        samples = [cur["us_per_doc"]] + [time_case(func, inputs, docs, repeat) for _ in range(runs)]
+        cur["us_per_doc"] = round(statistics.median(samples), 2)
+        print(f"{name:<38} {cur['us_per_doc']:>10.2f} (mediana de {len(samples)} medições)")
+
+
+def compare(report, budget, time_tol, mem_tol):
+    regressions = []
+    for name, cur in report["functions"].items():
+        b = budget.get("functions", {}).get(name)
+        if not b:
+            continue
+        if over_time_budget(name, cur["us_per_doc"], budget, time_tol):
+            regressions.append(f"{name}: {cur['us_per_doc']}µs/doc > orçamento {b['us_per_doc']}µs/doc")
+        # Idem para a memória (1KiB)
+        if cur["peak_kib"] > b["peak_kib"] * (1 + mem_tol) + 1:
+            regressions.append(f"{name}: pico {cur['peak_kib']}KiB > orçamento {b['peak_kib']}KiB")
+    for field, acc in budget.get("accuracy", {}).items():
+        if report["accuracy"].get(field, 0.0) < acc:
+            regressions.append(f"acurácia {field}: {report['accuracy'].get(field, 0.0)} < {acc}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark e acurácia da extração")
+    parser.add_argument("--docs", type=int, default=3000, help="documentos por função (corpus repetido)")
+    parser.add_argument("--corpus", default=CORPUS_FILE)
+    parser.add_argument("--budget", default=BUDGET_FILE)
+    parser.add_argument("--update-budget", action="store_true", help="grava os resultados como novo orçamento")
+    parser.add_argument("--repeat", type=int, default=3, help="medições por função (vale a melhor)")
+    parser.add_argument("--time-tolerance", type=float, default=0.4)
+    parser.add_argument("--confirm-runs", type=int, default=5,
+                        help="medições extras de uma função acima do orçamento (vale a mediana)")
+    parser.add_argument("--mem-tolerance", type=float, default=0.25)
+    parser.add_argument("--output", default=None, help="arquivo JSON com o relatório")
+    parser.add_argument("-v", "--verbose", action="store_true", help="lista as divergências de acurácia")
+    args = parser.parse_args()
+
+    # Aqui só interessam os números, não os logs da extração
+    logging.basicConfig(level=logging.ERROR)
+
+    scraper = DiarioScraper()
+    formatter = DiarioFormatter()
+    corpus = load_corpus(args.corpus)
+    cases = build_cases(scraper, formatter, corpus)
+
+    report = {"docs": args.docs, "functions": {}}
+    print(f"{'função':<38} {'µs/doc':>10} {'pico KiB':>10}")
+    for name, (func, inputs) in cases.items():
+        func(inputs[0])  # aquecimento (compilação de regex, caches)
+        us = time_case(func, inputs, args.docs, args.repeat)
+        peak = alloc_case(func, inputs)
+        report["functions"][name] = {"us_per_doc": round(us, 2), "peak_kib": round(peak, 1)}
+        print(f"{name:<38} {us:>10.2f} {peak:>10.1f}")
+
+    accuracy, mismatches = check_accuracy(scraper, formatter, corpus)
+    report["accuracy"] = accuracy
+    report["mismatches"] = mismatches
+    print(f"\nAcurácia geral: {accuracy['_overall']:.1%} ({len(mismatches)} divergências)")
+    if args.verbose:
+        for m in mismatches:
+            print(f"  [{m['case']}] {m['field']}: esperado {m['expected']!r}, obtido {m['got']!r}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_budget:
+        budget = {"functions": report["functions"], "accuracy": accuracy}
+        with open(args.budget, "w", encoding="utf-8") as f:
+            json.dump(budget, f, ensure_ascii=False, indent=2)
+        print(f"Orçamento atualizado em {args.budget}")
+        return 0
+
+    if not os.path.exists(args.budget):
+        print("Sem orçamento para comparar (use --update-budget).")
+        return 0
+    with open(args.budget, "r", encoding="utf-8") as f:
+        budget = json.load(f)
+    confirm_times(report, cases, budget, args.time_tolerance, args.docs, args.repeat, args.confirm_runs)
+    regressions = compare(report, budget, args.time_tolerance, args.mem_tolerance)
+    if regressions:
+        print("REGRESSÕES:")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    print("Dentro do orçamento.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark do relatório HTML (DiarioFormatter / report_renderer).
+
+Gera N resultados sintéticos a partir dos textos do corpus dourado e mede
+tempo e pico de alocação (tracemalloc) de formatar_html (string inteira) e
+de salvar_html (streaming para arquivo, consumindo um gerador).
+
+    python benchmark_report.py --results 5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from formatter import DiarioFormatter
+from models import SearchResult
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "corpus.json")
+DOC_TYPES = ["OUTRO", "PEDIDO_COMPRA", "HOMOLOGACAO", "ACORDO_COOPERACAO", "CONTRATO", "ADITAMENTO", "PREGAO", "DIVERSOS"]
+
+
+def synthetic_results(n, texts):
+    """Gerador: os resultados não ficam todos em memória ao mesmo tempo"""
+    for i in range(n):
+        text = texts[i % len(texts)]
+        yield SearchResult(
+            date="02/02/2026", term="Geral", process_number=f"7410.2025/{i:07d}-0", document_id=str(100000 + i),
+            summary=text, object_text=text[:120], contractor="EMPRESA EXEMPLO LTDA" if i % 2 else "-",
+            company_doc="12.345.678/0001-90" if i % 3 else "123.456.789-01", value="R$ 1.234,56" if i % 2 else "-",
+            contract_number="14/25" if i % 3 else "", link_html=f"https://exemplo/doc={i}", link_pdf=f"https://exemplo/pdf={i}",
+            doc_type=DOC_TYPES[i % len(DOC_TYPES)],
+        )
+
+
+def measure(func, repeat=3):
+    """(melhor tempo em s, pico de alocação em MiB); o tempo é medido sem tracemalloc ligado"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do relatório HTML")
+    parser.add_argument("--results", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="medições por caso (vale a melhor)")
+    parser.add_argument("--output", default=None, help="arquivo JSON com o relatório")
+    args = parser.parse_args()
+
+    with open(CORPUS_FILE, "r", encoding="utf-8") as f:
+        texts = [t["sintese"] for t in json.load(f)["texts"]]
+    formatter = DiarioFormatter()
+    formatter.formatar_html(synthetic_results(50, texts))  # aquecimento
+
+    results_list = list(synthetic_results(args.results, texts))
+    report = {"results": args.results}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "relatorio.html")
+        cases = {
+            # Lista já em memória, documento montado como string única
+            "formatar_html": lambda: formatter.formatar_html(results_list),
+            # Lista já em memória, escrita em streaming
+            "salvar_html[lista]": lambda: formatter.salvar_html(results_list, path),
+            # Resultados gerados sob demanda e escritos em streaming (memória constante)
+            "salvar_html[gerador]": lambda: formatter.salvar_html(synthetic_results(args.results, texts), path),
+        }
+        print(f"{'caso':<24} {'tempo s':>9} {'µs/card':>9} {'pico MiB':>9}")
+        for name, func in cases.items():
+            elapsed, peak_mb = measure(func, args.repeat)
+            report[name] = {"seconds": round(elapsed, 4), "us_per_card": round(elapsed / args.results * 1e6, 1), "peak_mib": round(peak_mb, 2)}
+            print(f"{name:<24} {elapsed:>9.3f} {elapsed / args.results * 1e6:>9.1f} {peak_mb:>9.2f}")
+        report["file_mib"] = round(os.path.getsize(path) / (1024 * 1024), 2)
+    print(f"Arquivo gerado: {report['file_mib']} MiB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
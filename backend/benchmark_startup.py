@@ -0,0 +1,128 @@
+"""
+Relatório de tempo de inicialização do servidor.
+
+Mede o tempo de import de main.py com `python -X importtime` (total e os
+módulos mais caros) e o tempo até o servidor responder o index.html. Falha
+(código 1) se algum módulo pesado voltar a ser importado na inicialização
+ou se os tempos piorarem além da tolerância em relação a
+golden/startup_budget.json.
+
+    python benchmark_startup.py
+    python benchmark_startup.py --update-budget
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(BASE_DIR, "golden", "startup_budget.json")
+
+# Carregados em background (init_service/warm_ai_module/check_updates_on_startup), nunca no import de main
+DEFERRED_MODULES = ["playwright", "bs4", "tenacity", "aiohttp", "packaging", "google.generativeai", "scraper_service", "uvicorn"]
+
+
+def measure_imports(repeat=3):
+    """Melhor de `repeat` execuções: (total_ms, módulos {nome: (self_ms, cumulativo_ms)})"""
+    best_total, best_modules = float("inf"), {}
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        modules = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = (p.strip() for p in line[len("import time:"):].split("|"))
+            modules[name] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+        total = modules.get("main", (0, 0))[1]
+        if total < best_total:
+            best_total, best_modules = total, modules
+    return best_total, best_modules
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_byte(timeout=30):
+    """ms entre iniciar o processo do servidor e o primeiro GET / respondido"""
+    port = _free_port()
+    code = f"import main, uvicorn; uvicorn.run(main.app, host='127.0.0.1', port={port}, log_level='warning')"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - t0) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("Servidor não respondeu ao GET /")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de inicialização do servidor")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="módulos mais caros a listar")
+    parser.add_argument("--budget", default=BUDGET_FILE)
+    parser.add_argument("--update-budget", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", default=None, help="arquivo JSON com o relatório")
+    args = parser.parse_args()
+
+    import_ms, modules = measure_imports(args.repeat)
+    first_byte_ms = min(measure_first_byte() for _ in range(args.repeat))
+    deferred_loaded = [m for m in DEFERRED_MODULES if m in modules]
+    top = sorted(modules.items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]
+
+    print(f"Import de main: {import_ms:.0f}ms | primeiro GET /: {first_byte_ms:.0f}ms")
+    print(f"{'módulo':<50} {'self ms':>9} {'cumul. ms':>10}")
+    for name, (self_ms, cumulative_ms) in top:
+        print(f"{name:<50} {self_ms:>9.1f} {cumulative_ms:>10.1f}")
+
+    report = {
+        "import_ms": round(import_ms, 1),
+        "first_byte_ms": round(first_byte_ms, 1),
+        "deferred_loaded": deferred_loaded,
+        "top_modules": [{"module": n, "self_ms": round(s, 1), "cumulative_ms": round(c, 1)} for n, (s, c) in top],
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_budget:
+        with open(args.budget, "w", encoding="utf-8") as f:
+            json.dump({"import_ms": report["import_ms"], "first_byte_ms": report["first_byte_ms"]}, f, indent=2)
+        print(f"Orçamento atualizado em {args.budget}")
+        return 0
+
+    regressions = [f"{m} importado na inicialização" for m in deferred_loaded]
+    if os.path.exists(args.budget):
+        with open(args.budget, "r", encoding="utf-8") as f:
+            budget = json.load(f)
+        for key in ("import_ms", "first_byte_ms"):
+            if report[key] > budget[key] * (1 + args.tolerance):
+                regressions.append(f"{key}: {report[key]}ms > orçamento {budget[key]}ms")
+    if regressions:
+        print("REGRESSÕES:")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    print("Dentro do orçamento.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
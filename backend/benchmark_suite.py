@@ -0,0 +1,201 @@
+"""
+Benchmark reproduzível do DiarioScraper contra o replay_server local.
+
+Roda DiarioScraper.scrape sem tocar no site real, em cenários com latência
+e falhas injetadas, e grava um JSON com docs/s, p50/p95 por etapa e pico de
+memória (RSS). Com --baseline compara com uma execução anterior e sai com
+código 1 se alguma métrica piorar além da tolerância.
+
+    python benchmark_suite.py
+    python benchmark_suite.py --scenario instavel --output bench.json
+    python benchmark_suite.py --baseline logs/benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, replace
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from replay_server import ReplayConfig, ReplayServer
+from scraper_service import DiarioScraper
+
+SCENARIOS = {
+    "baseline": ReplayConfig(latency_ms=20, jitter_ms=10),
+    "lento": ReplayConfig(latency_ms=250, jitter_ms=100),
+    "instavel": ReplayConfig(latency_ms=20, jitter_ms=10, error_rate=0.05, timeout_rate=0.02, hang_s=8),
+}
+
+# Timeout de navegação usado nos cenários (menor que o hang injetado)
+BENCH_NAV_TIMEOUT_MS = 5000
+
+
+class PeakRSSSampler:
+    """Amostra o RSS do processo (e do Chromium, se psutil estiver disponível)"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _current(self) -> int:
+        try:
+            import psutil
+            proc = psutil.Process()
+            total = proc.memory_info().rss
+            for child in proc.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        except ImportError:
+            import resource
+            # ru_maxrss é em KiB no Linux (pico, não valor atual)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._current())
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+async def run_scenario(name, config, start_date, end_date, orgaos, trace=False):
+    stage_samples = defaultdict(list)
+    with ReplayServer(config) as server, tempfile.TemporaryDirectory() as tmp:
+        scraper = DiarioScraper(debug=False, site_url=server.url)
+        scraper.nav_timeout_ms = BENCH_NAV_TIMEOUT_MS
+        scraper.partial_results_file = os.path.join(tmp, "partial_results.json")
+        # Documentos sintéticos do replay não entram no índice de republicações (logs/dedup.db)
+        # nem no arquivo de páginas (logs/archive) de produção
+        scraper.logs_dir = tmp
+        if trace:
+            scraper.traces_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "traces")
+        scraper.stage_observers.append(lambda stage, secs: stage_samples[stage].append(secs))
+
+        with PeakRSSSampler() as rss:
+            t0 = time.perf_counter()
+            results = await scraper.scrape(start_date, end_date, [], use_ai=False, orgaos=orgaos, trace=trace)
+            wall = time.perf_counter() - t0
+
+        stages = {}
+        for stage, samples in sorted(stage_samples.items()):
+            stages[stage] = {
+                "count": len(samples),
+                "total_s": round(sum(samples), 4),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(_percentile(samples, 95) * 1000, 2),
+            }
+
+        return {
+            "scenario": name,
+            "config": asdict(config),
+            "docs": len(results),
+            "wall_s": round(wall, 3),
+            "docs_per_sec": round(len(results) / wall, 3) if wall else 0.0,
+            "stages": stages,
+            "peak_rss_mb": round(rss.peak_bytes / (1024 * 1024), 1),
+            "server": dict(server.stats),
+            "trace": os.path.join(scraper.traces_dir, f"trace_{scraper.last_run_id}.json") if trace else None,
+        }
+
+
+def compare(report, baseline, tolerance):
+    """Retorna a lista de regressões em relação ao baseline"""
+    regressions = []
+    base_by_name = {s["scenario"]: s for s in baseline.get("scenarios", [])}
+    for cur in report["scenarios"]:
+        base = base_by_name.get(cur["scenario"])
+        if not base:
+            continue
+        tag = cur["scenario"]
+        if cur["docs_per_sec"] < base["docs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{tag}: docs/s {cur['docs_per_sec']} < {base['docs_per_sec']}")
+        if cur["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{tag}: pico RSS {cur['peak_rss_mb']}MB > {base['peak_rss_mb']}MB")
+        for stage, stats in cur["stages"].items():
+            b = base["stages"].get(stage)
+            if b and stats["p95_ms"] > b["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{tag}: p95 de {stage} {stats['p95_ms']}ms > {b['p95_ms']}ms")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do scraper")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="cenário(s) a rodar (padrão: todos)")
+    parser.add_argument("--start", default="02/02/2026")
+    parser.add_argument("--end", default="06/02/2026")
+    parser.add_argument("--orgaos", default="68", help="IDs separados por vírgula")
+    parser.add_argument("--docs-per-day", type=int, default=None)
+    parser.add_argument("--output", default=None, help="arquivo JSON de saída")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--trace", action="store_true", help="grava um trace de spans por cenário em logs/traces/")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="piora relativa aceita (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    orgaos = [o.strip() for o in args.orgaos.split(",") if o.strip()]
+
+    report = {"generated_at": datetime.now().isoformat(timespec="seconds"), "start": args.start, "end": args.end, "scenarios": []}
+    for name in args.scenario or sorted(SCENARIOS):
+        config = SCENARIOS[name]
+        if args.docs_per_day is not None:
+            config = replace(config, docs_per_day=args.docs_per_day)
+        print(f"Cenário {name}...")
+        result = await run_scenario(name, config, args.start, args.end, orgaos, trace=args.trace)
+        report["scenarios"].append(result)
+        print(f"  {result['docs']} docs em {result['wall_s']}s ({result['docs_per_sec']} docs/s), pico RSS {result['peak_rss_mb']}MB")
+        for stage, stats in result["stages"].items():
+            print(f"  {stage:<14} n={stats['count']:<5} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms")
+
+    output = args.output
+    if not output:
+        bench_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "benchmarks")
+        os.makedirs(bench_dir, exist_ok=True)
+        output = os.path.join(bench_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Relatório salvo em {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSÕES:")
+            for r in regressions:
+                print(f"  - {r}")
+            return 1
+        print("Sem regressões em relação ao baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
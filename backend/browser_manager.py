@@ -0,0 +1,312 @@
+"""
+Navegador persistente compartilhado entre execuções de scraping.
+
+O BrowserManager pertence ao lifespan do FastAPI: lança o Chromium uma vez,
+mantém um contexto "quente" (cookies/sessão restaurados de
+logs/browser_state.json e página de pesquisa já carregada) pronto para a
+próxima execução e relança o navegador se ele cair.
+
+Em execuções longas um watchdog acompanha a memória do navegador e o tempo
+de cada navegação: páginas travadas são fechadas (a navegação falha na hora
+e o retry abre outra), e o contexto ou o navegador inteiro são reciclados
+após N páginas ou acima do limite de memória.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 DiárioOficialScraper/1.0"
+# Folga sobre o timeout de navegação antes de dar a página por travada: a listagem ainda
+# espera os resultados (até 13s) dentro da mesma navegação acompanhada
+STALL_MARGIN_S = 15
+
+
+class BrowserSession:
+    """Contexto + página de listagem entregues a uma execução"""
+
+    def __init__(self, manager, context, page):
+        self.manager = manager
+        self.context = context
+        self.page = page
+        self.pages_opened = 0
+        self.recycles = 0
+        self.recycle_reason = None  # Pedido de reciclagem feito pelo watchdog
+        self.notify = None  # Callback async opcional (mensagem) para avisar reciclagens
+        self._active = {}  # página -> (início monotônico, rótulo)
+        self._recycle_lock = asyncio.Lock()
+        self._watchdog = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self.manager.is_connected and self.context.browser is not None and self.context.browser.is_connected()
+
+    async def new_page(self):
+        """Nova página; se o navegador caiu, o trabalho segue numa instância nova.
+        Os limites de páginas e de memória também valem no meio de um dia grande, não só entre unidades"""
+        if not self.is_alive:
+            await self.manager.recycle(self, "queda", browser=True)
+        else:
+            await self.manager.maybe_recycle(self)
+        self.pages_opened += 1
+        return await self.context.new_page()
+
+    async def listing_page(self):
+        """Página de listagem; recriada se tiver sido fechada (ex.: pelo watchdog)"""
+        if not self.is_alive:
+            await self.manager.recycle(self, "queda", browser=True)
+        if self.page.is_closed():
+            self.page = await self.new_page()
+            await self.page.goto(self.manager.base_url, timeout=self.manager.nav_timeout_ms)
+        return self.page
+
+    @asynccontextmanager
+    async def track(self, page, label: str):
+        """Marca uma navegação em andamento para a detecção de travamentos"""
+        self._active[page] = (time.monotonic(), label)
+        try:
+            yield page
+        finally:
+            self._active.pop(page, None)
+
+    def stalled_pages(self, stall_timeout_s: float):
+        now = time.monotonic()
+        return [(page, label, now - t0) for page, (t0, label) in list(self._active.items()) if now - t0 > stall_timeout_s]
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception as e:
+            logger.debug(f"Erro ao fechar contexto: {e}")
+
+
+class BrowserManager:
+    def __init__(self, base_url: str, debug: bool = False, nav_timeout_ms: int = 30000, state_file: str = None, keep_warm: bool = True,
+                 max_pages_per_context: int = 200, max_memory_mb: float = 1536, stall_timeout_s: float = None, watchdog_interval_s: float = 2):
+        self.base_url = base_url
+        # Sem keep_warm (uso avulso, ex.: scripts) nenhum contexto reserva é preparado nem há relançamento automático
+        self.keep_warm = keep_warm
+        self.debug = debug
+        self.nav_timeout_ms = nav_timeout_ms
+        self.state_file = state_file
+        self._playwright = None
+        self._browser = None
+        self._spare = None  # Task que prepara o próximo contexto quente
+        self._lock = asyncio.Lock()
+        self._closing = False
+        self.launches = 0
+        # Limites do watchdog
+        self.max_pages_per_context = max_pages_per_context
+        self.max_memory_mb = max_memory_mb
+        # Por padrão, só depois que o próprio timeout da navegação teria disparado
+        self.stall_timeout_s = stall_timeout_s if stall_timeout_s is not None else nav_timeout_ms / 1000 + STALL_MARGIN_S
+        self.watchdog_interval_s = watchdog_interval_s
+
+    @property
+    def is_connected(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        """Lança o navegador e já prepara um contexto quente"""
+        await self._ensure_browser()
+        self._schedule_spare()
+        return self
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._closing:
+                raise RuntimeError("Gerenciador de navegador encerrado")
+            if self.is_connected:
+                return self._browser
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            launch_options = {"headless": not self.debug, "timeout": self.nav_timeout_ms}
+            browser = None
+            try:
+                browser = await self._playwright.chromium.launch(**launch_options)
+            except:
+                try:
+                    browser = await self._playwright.chromium.launch(channel="chrome", **launch_options)
+                except:
+                    browser = await self._playwright.chromium.launch(channel="msedge", **launch_options)
+            if not browser: raise Exception("Falha crítica ao iniciar navegador.")
+
+            browser.on("disconnected", self._on_disconnected)
+            self._browser = browser
+            self.launches += 1
+            logger.info(f"Navegador iniciado (lançamento #{self.launches}, debug={self.debug})")
+            return browser
+
+    def _on_disconnected(self, browser):
+        if browser is not self._browser or self._closing:
+            return
+        if not self.keep_warm:
+            self._browser = None
+            return
+        logger.warning("Navegador desconectado inesperadamente; será relançado")
+        self._browser = None
+        self._spare = None
+        asyncio.get_running_loop().create_task(self._relaunch())
+
+    async def _relaunch(self):
+        try:
+            await self.start()
+        except Exception as e:
+            logger.error(f"Falha ao relançar navegador: {e}")
+
+    async def _new_context(self):
+        browser = await self._ensure_browser()
+        storage_state = self.state_file if self.state_file and os.path.exists(self.state_file) else None
+        context = await browser.new_context(user_agent=USER_AGENT, storage_state=storage_state)
+        context.set_default_navigation_timeout(self.nav_timeout_ms)
+        page = await context.new_page()
+        try:
+            await page.goto(self.base_url, timeout=self.nav_timeout_ms)
+            if self.state_file:
+                await context.storage_state(path=self.state_file)
+        except Exception:
+            await context.close()
+            raise
+        return context, page
+
+    async def _warm_session(self) -> BrowserSession:
+        context, page = await self._new_context()
+        return BrowserSession(self, context, page)
+
+    def _schedule_spare(self):
+        if not self.keep_warm or self._closing or (self._spare is not None and not self._spare.done()):
+            return
+        self._spare = asyncio.get_running_loop().create_task(self._warm_session())
+
+    async def acquire(self) -> BrowserSession:
+        """Entrega um contexto quente (ou cria um na hora), liga o watchdog e prepara o próximo em background"""
+        spare, self._spare = self._spare, None
+        session = None
+        if spare is not None:
+            try:
+                session = await spare
+                if not self.is_connected:
+                    session = None
+            except Exception as e:
+                logger.warning(f"Contexto quente indisponível ({e}); criando um novo")
+        if session is None:
+            session = await self._warm_session()
+        session._watchdog = asyncio.get_running_loop().create_task(self._watch(session))
+        self._schedule_spare()
+        return session
+
+    async def release(self, session: BrowserSession):
+        if session._watchdog is not None:
+            session._watchdog.cancel()
+            try:
+                await session._watchdog
+            except asyncio.CancelledError:
+                pass
+            session._watchdog = None
+        await session.close()
+
+    async def recycle(self, session: BrowserSession, reason: str, browser: bool = False):
+        """Troca o contexto (ou o navegador inteiro) da sessão por um novo"""
+        seen = session.context
+        async with session._recycle_lock:
+            # Outra corrotina já reciclou enquanto esta esperava o lock
+            if session.context is not seen or (reason == "queda" and session.is_alive):
+                return
+            scope = "browser" if browser else "context"
+            old_context = session.context
+            # Na queda o navegador já morreu (ou foi relançado); só na reciclagem por memória o atual é aposentado
+            old_browser = self._browser if browser and reason != "queda" else None
+            if old_browser is not None:
+                if self._spare is not None:
+                    self._spare.cancel()
+                self._spare = None
+                self._browser = None
+            session.context, session.page = await self._new_context()
+            session.pages_opened = 0
+            session.recycle_reason = None
+            session.recycles += 1
+            metrics.BROWSER_RECYCLES.inc(scope=scope, reason=reason)
+            msg = f"Navegador reciclado ({'navegador' if browser else 'contexto'}, motivo: {reason})"
+            logger.warning(msg)
+
+            # O contexto antigo é fechado por último, depois que as navegações em andamento nele terminam
+            # (no máximo stall_timeout_s); o que ainda estiver aberto falha e o retry usa o novo
+            if reason != "queda":
+                await self._drain(session, old_context)
+            try:
+                await old_context.close()
+            except Exception:
+                pass
+            if old_browser is not None:
+                try:
+                    await old_browser.close()
+                except Exception:
+                    pass
+                self._schedule_spare()
+        if session.notify:
+            try:
+                await session.notify(msg)
+            except Exception as e:
+                logger.debug(f"Falha ao notificar reciclagem: {e}")
+
+    async def _drain(self, session: BrowserSession, context):
+        deadline = time.monotonic() + self.stall_timeout_s
+        while time.monotonic() < deadline and any(page.context is context for page in list(session._active)):
+            await asyncio.sleep(0.1)
+
+    async def maybe_recycle(self, session: BrowserSession):
+        """Chamado entre unidades de trabalho e a cada página nova: recicla se o watchdog ou o limite de páginas pedirem"""
+        if session.recycle_reason == "memoria":
+            await self.recycle(session, "memoria", browser=True)
+        elif session.recycle_reason or session.pages_opened >= self.max_pages_per_context:
+            await self.recycle(session, session.recycle_reason or "paginas")
+
+    async def _watch(self, session: BrowserSession):
+        """Acompanha memória e navegações travadas enquanto a sessão está em uso"""
+        while True:
+            await asyncio.sleep(self.watchdog_interval_s)
+            try:
+                for page, label, elapsed in session.stalled_pages(self.stall_timeout_s):
+                    logger.warning(f"Navegação travada há {elapsed:.0f}s ({label}); fechando a página")
+                    metrics.PAGE_STALLS.inc(page=label)
+                    session._active.pop(page, None)
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass
+
+                if self.max_memory_mb and session.recycle_reason is None:
+                    rss = await asyncio.to_thread(metrics._browser_memory_bytes)
+                    if rss and rss / (1024 * 1024) > self.max_memory_mb:
+                        logger.warning(f"Memória do navegador em {rss / (1024 * 1024):.0f}MB (limite {self.max_memory_mb}MB); reciclagem agendada")
+                        session.recycle_reason = "memoria"
+            except Exception as e:
+                logger.debug(f"Watchdog do navegador falhou: {e}")
+
+    async def close(self):
+        self._closing = True
+        if self._spare is not None:
+            try:
+                spare = await self._spare
+                await spare.close()
+            except Exception:
+                pass
+            self._spare = None
+        # O lock espera um lançamento em andamento terminar antes de fechar
+        async with self._lock:
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.debug(f"Erro ao fechar navegador: {e}")
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
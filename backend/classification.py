@@ -0,0 +1,133 @@
+"""
+Classificação canônica das publicações.
+
+O tipo do documento é decidido uma única vez, na extração (texto completo
+da síntese), e viaja no SearchResult (doc_type, doc_label, amendment_number,
+parent_contract). Formatter, relatório e frontend apenas consomem esses
+campos, sem reclassificar.
+"""
+import re
+
+# Tipo canônico -> rótulo exibido
+TYPE_LABELS = {
+    "ADITAMENTO": "ADITAMENTO",
+    "APOSTILAMENTO": "APOSTILAMENTO",
+    "CONTRATO": "CONTRATO",
+    "EMPENHO": "EMPENHO",
+    "PEDIDO_COMPRA": "PEDIDO COMPRA",
+    "HOMOLOGACAO": "HOMOLOGAÇÃO",
+    "PREGAO": "LICITAÇÃO",
+    "PARCERIA": "PARCERIA",
+    "DOACAO": "DOAÇÃO",
+    "ACORDO_COOPERACAO": "ACORDO COOPERAÇÃO",
+    "DIVERSOS": "DIVERSOS",
+    "OUTRO": "OUTRO",
+}
+
+_RE_MODALITY = re.compile(r'PREGÃO ELETRÔNICO|PREGÃO|CONCORRÊNCIA|TOMADA DE PREÇOS|CONVITE|LEILÃO|DIÁLOGO COMPETITIVO|INEXIGIBILIDADE|DISPENSA')
+# O número precisa começar por dígito: "DESPACHO DE ADITAMENTO. ... TERMO DE ADITAMENTO Nº 070/2025" não captura o "."
+RE_AMENDMENT = re.compile(r'(?:Termo de )?(Aditamento|Apostilamento)\s*(?:nº|n°)?\s*(\d[\d\.]*(?:/[\d]{2,4})?)', re.IGNORECASE)
+RE_PARENT_CONTRACT = re.compile(r'ao (?:Termo de )?(?:Contrato|Termo de Colaboração|Termo de Fomento|Ajuste)\s*(?:nº|n°)?\s*([\d\.]+(?:/[\d]{2,4})?)', re.IGNORECASE)
+
+# Aplicadas ao texto já em maiúsculas (bem mais rápido que IGNORECASE com acentos)
+_RE_AMENDMENT_UPPER = re.compile(r'(ADITAMENTO|APOSTILAMENTO)\s*(?:Nº|N°)?\s*\d')
+_RE_AMENDMENT_KEYWORD = re.compile(r'(APOSTILAMENTO|ADITAMENTO|TERMO ADITIVO)')
+_RE_CONTRACT = re.compile(r'(?:FORMALIZAÇÃO|TERMO|EXTRATO) D[OA] CONTRATO|CONTRATO\s*(?:Nº|N°)\s*\d')
+_RE_AWARD = re.compile(r'DESPACHO DE ADJUDICAÇÃO|ADJUDICO|DESPACHO DE HOMOLOGAÇÃO|HOMOLOGO|AUTORIZO A CONTRATAÇÃO')
+_RE_PARTNERSHIP = re.compile(r'TERMO DE (?:FOMENTO|COLABORAÇÃO)')
+_RE_DONATION = re.compile(r'TERMO DE (?:DOAÇÃO|COMODATO)')
+_RE_COOPERATION = re.compile(r'ACORDO DE COOPERA[ÇC][ÃA]O')
+# Avisos que apenas citam um contrato/pregão (ex.: "NOTIFICAÇÃO ... referente ao Contrato nº") continuam DIVERSOS
+_RE_MISC_HEAD = re.compile(r'\s*(?:DESPACHO DE )?(?:ESCLARECIMENTO|QUESTIONAMENTO|IMPUGNAÇ|NOTIFICAÇÃO|ATA DE ABERTURA|DEMONSTRATIVO DAS COMPRAS)')
+_RE_MISC = re.compile(r'ESCLARECIMENTO|QUESTIONAMENTO|IMPUGNAÇ|NOTIFICAÇÃO|ATA DE ABERTURA|DEMONSTRATIVO DAS COMPRAS')
+_RE_BIDDING = re.compile(r'PREGÃO|LICITAÇÃO|CONCORRÊNCIA|CONVITE')
+
+# Vocabulário antigo de DiarioFormatter.classificar_tipo
+_FORMATTER_TYPES = {
+    "ADITAMENTO": "ADITAMENTO", "APOSTILAMENTO": "ADITAMENTO",
+    "CONTRATO": "CONTRATO", "EMPENHO": "CONTRATO",
+    "PREGAO": "LICITACAO", "HOMOLOGACAO": "LICITACAO", "PEDIDO_COMPRA": "LICITACAO",
+}
+
+
+def detect_modality(text: str) -> str:
+    upper = (text or "").upper()
+    m = _RE_MODALITY.search(upper)
+    if m:
+        return m.group(0)
+    return "LICITAÇÃO" if "LICITAÇÃO" in upper else ""
+
+
+def classify(text: str, modality: str = None, current: str = None) -> str:
+    """Tipo canônico a partir do texto completo; `current` preserva aditamento/apostilamento já identificados"""
+    if current in ("ADITAMENTO", "APOSTILAMENTO"):
+        return current
+    upper = (text or "").upper()
+    # Cada regex só roda se a palavra-chave dela aparece no texto: o teste com `in` custa uma fração da busca
+    if "ADIT" in upper or "APOSTILAMENTO" in upper:
+        m_amend = _RE_AMENDMENT_UPPER.search(upper)
+        if m_amend:
+            return m_amend.group(1)
+        m_keyword = _RE_AMENDMENT_KEYWORD.search(upper)
+        if m_keyword:
+            return "APOSTILAMENTO" if m_keyword.group(1) == "APOSTILAMENTO" else "ADITAMENTO"
+
+    if _RE_MISC_HEAD.match(upper):
+        return "DIVERSOS"
+    if modality is None:
+        modality = detect_modality(upper) if "DISPENSA" in upper else ""
+    if "DISPENSA" in (modality or "").upper():
+        return "PEDIDO_COMPRA"
+    if "CONTRATO" in upper and _RE_CONTRACT.search(upper):
+        return "CONTRATO"
+    if ("ADJUDIC" in upper or "HOMOLOG" in upper or "AUTORIZO" in upper) and _RE_AWARD.search(upper):
+        return "HOMOLOGACAO"
+    if "TERMO DE " in upper:
+        if _RE_PARTNERSHIP.search(upper):
+            return "PARCERIA"
+        if _RE_DONATION.search(upper):
+            return "DOACAO"
+    if "ACORDO DE COOPERA" in upper and _RE_COOPERATION.search(upper):
+        return "ACORDO_COOPERACAO"
+    if _RE_MISC.search(upper):
+        return "DIVERSOS"
+    if "NOTA DE EMPENHO" in upper:
+        return "EMPENHO"
+    if _RE_BIDDING.search(upper):
+        return "PREGAO"
+    return "OUTRO"
+
+
+def normalize_number(number: str) -> str:
+    """'70/25' -> '070/2025'; sem número devolve 'S/N' e sem ano o próprio valor"""
+    if not number or not any(ch.isdigit() for ch in number):
+        return "S/N"
+    parts = number.strip(".").split("/")
+    if len(parts) != 2 or not parts[1].isdigit():
+        return number
+    ano = parts[1] if len(parts[1]) == 4 else "20" + parts[1][-2:]
+    return f"{parts[0].zfill(3)}/{ano}"
+
+
+def contract_key(number: str) -> str:
+    """Chave de indexação de um número de contrato: '14/25', '0014/2025' e '14/2025' -> '014/2025'; vazio sem número/ano"""
+    parts = (number or "").strip().rstrip(".").split("/")
+    if len(parts) != 2:
+        return ""
+    num = "".join(ch for ch in parts[0] if ch.isdigit())
+    ano = parts[1].strip()
+    if not num or not ano.isdigit() or len(ano) not in (2, 4):
+        return ""
+    return f"{int(num):03d}/{ano if len(ano) == 4 else '20' + ano}"
+
+
+def label_for(doc_type: str, amendment_number: str = "") -> str:
+    label = TYPE_LABELS.get(doc_type, doc_type or "OUTRO")
+    if doc_type in ("ADITAMENTO", "APOSTILAMENTO") and amendment_number:
+        return f"{label} {normalize_number(amendment_number)}"
+    return label
+
+
+def formatter_type(doc_type: str) -> str:
+    """Tipo canônico no vocabulário do DiarioFormatter (ADITAMENTO/CONTRATO/LICITACAO/OUTROS)"""
+    return _FORMATTER_TYPES.get(doc_type, "OUTROS")
@@ -0,0 +1,128 @@
+"""
+Detecção de republicações (quase-duplicatas) pela síntese normalizada.
+
+Cada documento vira uma assinatura MinHash (64 permutações) dos trigramas de
+palavras da síntese, sem acentos nem marcas como "(NP)" ou "REPUBLICADO POR
+TER SAÍDO COM INCORREÇÕES". O LSH divide a assinatura em 16 faixas de 4
+valores: candidatos são os documentos que colidem em alguma faixa (consulta
+indexada por faixa, sem comparar com todo o histórico) e só eles têm a
+similaridade estimada. O índice fica em logs/dedup.db, junto dos campos que a
+IA extraiu de cada documento, para que uma republicação quase idêntica
+reaproveite a extração em vez de chamar a IA de novo.
+"""
+import json
+import logging
+import random
+import re
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from array import array
+from contextlib import closing
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+# Similaridade mínima para marcar como republicação e para reaproveitar a extração da IA
+DUPLICATE_THRESHOLD = 0.8
+REUSE_THRESHOLD = 0.9
+
+_PRIME = (1 << 61) - 1
+_rnd = random.Random(20250101)  # Permutações fixas: assinaturas gravadas continuam comparáveis
+_PERMS = [(_rnd.randrange(1, _PRIME), _rnd.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_RE_MARKERS = re.compile(r'\(NP\)|REPUBLICAD[OA] POR TER SAIDO COM INCORRECOES|REPUBLICACAO|POR TER SAIDO COM INCORRECOES')
+_RE_WORD = re.compile(r'[A-Z0-9]+')
+# Retificações mudam justamente os campos extraídos: nunca reaproveitam a IA
+_RE_RECTIFICATION = re.compile(r'RETIFICA')
+# Documentos sem número na listagem dividiriam uma linha só: podem achar originais, mas não entram no índice
+_NO_ID = ("", "S/N")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", (text or "").upper())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_RE_WORD.findall(_RE_MARKERS.sub(" ", text)))
+
+
+def signature(text: str) -> Optional[tuple]:
+    """Assinatura MinHash da síntese; None se o texto for curto demais para comparar"""
+    words = normalize(text).split()
+    if len(words) < SHINGLE_WORDS * 2:
+        return None
+    shingles = {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode()) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return tuple(min((a * s + b) % _PRIME for s in shingles) for a, b in _PERMS)
+
+
+def similarity(sig_a, sig_b) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def _bands(sig):
+    return [(band, "%x" % zlib.crc32(array("Q", sig[band * ROWS:(band + 1) * ROWS]).tobytes())) for band in range(BANDS)]
+
+
+class DedupIndex:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS docs (document_id TEXT PRIMARY KEY, root TEXT, signature BLOB, ai_fields TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket TEXT, document_id TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bands ON bands (band, bucket)")
+            # Índices gravados antes desta regra podem ter a linha compartilhada "S/N"
+            conn.execute("DELETE FROM bands WHERE document_id IN ('', 'S/N')")
+            conn.execute("DELETE FROM docs WHERE document_id IN ('', 'S/N')")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def match(self, document_id: str, text: str) -> Optional[dict]:
+        """Documento anterior mais parecido acima de DUPLICATE_THRESHOLD:
+        {"document_id" (original da cadeia), "similarity", "ai_fields" (só se reaproveitáveis)}"""
+        sig = signature(text)
+        if sig is None:
+            return None
+        where = " OR ".join("(band = ? AND bucket = ?)" for _ in range(BANDS))
+        params = [v for pair in _bands(sig) for v in pair]
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT DISTINCT d.document_id, d.root, d.signature, d.ai_fields FROM bands b "
+                f"JOIN docs d ON d.document_id = b.document_id WHERE ({where}) AND b.document_id != ? AND COALESCE(d.root, '') != ?",
+                [*params, document_id, document_id]).fetchall()
+        # Republicações do próprio documento ficam de fora: um original coletado de novo não é cópia de si mesmo
+        best = None
+        for doc_id, root, blob, ai_fields in rows:
+            score = similarity(sig, array("Q", blob))
+            if score >= DUPLICATE_THRESHOLD and (best is None or score > best[0]):
+                best = (score, root or doc_id, ai_fields)
+        if best is None:
+            return None
+        score, root, ai_fields = best
+        reusable = ai_fields and score >= REUSE_THRESHOLD and not _RE_RECTIFICATION.search(normalize(text))
+        return {"document_id": root, "similarity": score, "ai_fields": json.loads(ai_fields) if reusable else None}
+
+    def add(self, document_id: str, text: str, root: str = "", ai_fields: dict = None):
+        """Registra o documento (e, se houver, o que a IA extraiu dele); sem ai_fields, mantém a extração já guardada"""
+        sig = signature(text)
+        if sig is None or document_id in _NO_ID:
+            return
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM bands WHERE document_id = ?", (document_id,))
+            # Recoleta sem IA (use_ai=False) não apaga a extração anterior, que serve ao reaproveitamento e ao reprocess.py
+            conn.execute("INSERT INTO docs VALUES (?, ?, ?, ?) ON CONFLICT(document_id) DO UPDATE SET "
+                         "root = excluded.root, signature = excluded.signature, "
+                         "ai_fields = COALESCE(excluded.ai_fields, docs.ai_fields)",
+                         (document_id, root, array("Q", sig).tobytes(), json.dumps(ai_fields, ensure_ascii=False) if ai_fields else None))
+            conn.executemany("INSERT INTO bands VALUES (?, ?, ?)", [(band, bucket, document_id) for band, bucket in _bands(sig)])
+
+    def ai_fields(self, document_id: str) -> Optional[dict]:
+        """Campos que a IA extraiu do documento (próprios ou reaproveitados), se houver"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT ai_fields FROM docs WHERE document_id = ?", (document_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
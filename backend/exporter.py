@@ -0,0 +1,191 @@
+"""
+Exportação dos resultados de uma execução em CSV, XLSX ou Parquet.
+
+Os formatos consomem os lotes do ResultStore e emitem bytes em chunks: a
+memória fica limitada a um lote, qualquer que seja o tamanho do período.
+O XLSX é escrito direto (zip sem seek + planilha com inlineStr), sem
+dependências; o Parquet usa o pyarrow, opcional, com um row group por lote.
+"""
+import csv
+import importlib.util
+import io
+import re
+from typing import Iterable, Iterator, List
+from xml.sax.saxutils import escape
+
+# Campo do SearchResult -> cabeçalho
+COLUMN_HEADERS = {
+    "date": "Data",
+    "term": "Termo",
+    "category": "Categoria",
+    "process_number": "Processo",
+    "document_id": "Documento",
+    "summary": "Síntese",
+    "object_text": "Objeto",
+    "contractor": "Contratada",
+    "company_doc": "CNPJ/CPF",
+    "value": "Valor",
+    "contract_number": "Nº Contrato/Licitação",
+    "validity_start": "Início Vigência",
+    "validity_end": "Fim Vigência",
+    "link_html": "Link",
+    "link_pdf": "Link PDF",
+    "modality": "Modalidade",
+    "opening_date": "Data Abertura",
+    "amendment_number": "Nº Aditamento",
+    "parent_contract": "Contrato Original",
+    "doc_type": "Tipo",
+    "doc_label": "Rótulo",
+    "orgao": "Órgão",
+    "run_id": "Execução",
+    "duplicate_of": "Republicação de",
+}
+# Mesmas colunas do antigo CSV gerado no navegador
+DEFAULT_COLUMNS = ["date", "term", "object_text", "value", "process_number", "contractor", "link_pdf"]
+
+# formato -> (media type, extensão)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+_RE_XML_INVALIDO = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def format_available(fmt: str) -> bool:
+    if fmt == "parquet":
+        return importlib.util.find_spec("pyarrow") is not None
+    return fmt in FORMATS
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino sem seek que acumula o que foi escrito até o próximo drain()"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_csv(batches: Iterable[list], columns: List[str]) -> Iterator[bytes]:
+    """CSV com BOM (o Excel reconhece UTF-8) e separador vírgula; um chunk por lote"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([COLUMN_HEADERS.get(c, c) for c in columns])
+    yield ("\ufeff" + buf.getvalue()).encode("utf-8")
+    for batch in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(batch)
+        yield buf.getvalue().encode("utf-8")
+
+
+def _column_letter(idx: int) -> str:
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _xlsx_row(row_num: int, values, letters) -> str:
+    cells = "".join(
+        f'<c r="{col}{row_num}" t="inlineStr"><is><t xml:space="preserve">{escape(_RE_XML_INVALIDO.sub("", v or ""))}</t></is></c>'
+        for col, v in zip(letters, values)
+    )
+    return f'<row r="{row_num}">{cells}</row>'
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Resultados" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def iter_xlsx(batches: Iterable[list], columns: List[str]) -> Iterator[bytes]:
+    """Planilha única; o zip é escrito em streaming (data descriptors, sem voltar no arquivo)"""
+    import zipfile
+
+    sink = _ChunkSink()
+    letters = [_column_letter(i) for i in range(len(columns))]
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_STATIC.items():
+            zf.writestr(name, content)
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(1, [COLUMN_HEADERS.get(c, c) for c in columns], letters)
+            ).encode("utf-8"))
+            row_num = 1
+            for batch in batches:
+                parts = []
+                for values in batch:
+                    row_num += 1
+                    parts.append(_xlsx_row(row_num, values, letters))
+                sheet.write("".join(parts).encode("utf-8"))
+                data = sink.drain()
+                if data:
+                    yield data
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def iter_parquet(batches: Iterable[list], columns: List[str]) -> Iterator[bytes]:
+    """Parquet (todas as colunas texto), um row group por lote"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_arrays([pa.array(col, pa.string()) for col in zip(*batch)], schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+_WRITERS = {"csv": iter_csv, "xlsx": iter_xlsx, "parquet": iter_parquet}
+
+
+def iter_export(fmt: str, batches: Iterable[list], columns: List[str]) -> Iterator[bytes]:
+    return _WRITERS[fmt](batches, columns)
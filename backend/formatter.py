@@ -3,8 +3,26 @@ Formatador de resultados do scraper do Diário Oficial
 Converte resultados em HTML formatado estilo Google Colab
 """
 import re
-from typing import List
+from typing import Iterable, Iterator, List
+import classification
 from models import SearchResult
+from report_renderer import ReportRenderer
+
+# Expressões pré-compiladas (usadas em cada card do relatório)
+_RE_NAO_DIGITO = re.compile(r'\D')
+_RE_CPF = re.compile(r'(\d{3})[\.\s]?(\d{3})[\.\s]?(\d{3})[-\s]?(\d{2})')
+_RE_ADITAMENTO = re.compile(r'(?:ADITAMENTO|TERMO ADITIVO)[^0-9]*(\d+/\d+)')
+_RE_CONTRATO_ORIGEM = re.compile(r'CONTRATO Nº\s*(\d+/\d+)')
+_RE_LICITACAO = re.compile(r'(?:PREGÃO|LICITAÇÃO|CHAMAMENTO)[^0-9]*(\d+/\d+)')
+_RE_VENCEDOR = re.compile(r'EMPRESA\s+(.*?)(?:,|\.|CNPJ)')
+_RE_ESPACOS = re.compile(r'\s+')
+_RE_DATA_ABERTURA = re.compile(r'(?:abertura|sessão|disputa|lances|ocorrerá).*?(?:dia|em|at[ée])\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})', re.IGNORECASE)
+_RE_DATA_SESSAO = re.compile(r'Data da sessão\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})', re.IGNORECASE)
+_RE_VIGENCIA_INICIO_FIM = re.compile(
+    r'Data de início e t[ée]rmino.*?:?\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})\s*e\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})', re.IGNORECASE)
+_RE_VIGENCIA_PERIODO = re.compile(
+    r'período de\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})\s*a\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})', re.IGNORECASE)
+_RE_VIGENCIA_MESES = re.compile(r'pelo prazo de (?:mais)?\s*(\d+.*?)meses')
 
 
 class DiarioFormatter:
@@ -29,52 +47,27 @@ class DiarioFormatter:
             a { text-decoration: none; color: #0056b3; font-weight: bold; }
         </style>
         """
+        self._renderer = ReportRenderer(self)
     
     def anonimizar_cpf(self, texto: str) -> str:
         """Anonimiza CPF mantendo apenas primeiro e últimos dígitos"""
         if not texto:
             return ""
-        limpo = re.sub(r'\D', '', texto)
+        limpo = _RE_NAO_DIGITO.sub('', texto)
         if len(limpo) == 11:
-            return re.sub(r'(\d{3})[\.\s]?(\d{3})[\.\s]?(\d{3})[-\s]?(\d{2})', 
-                         r'\1.***.***-\4', texto)
+            return _RE_CPF.sub(r'\1.***.***-\4', texto)
         return texto
     
     def classificar_tipo(self, summary: str) -> str:
-        """Classifica o tipo de publicação com base no contexto"""
-        txt = summary.upper()
-        
-        # Prioridade 1: Verificar formalizações explícitas de contrato
-        if "FORMALIZAÇÃO DO CONTRATO" in txt or "FORMALIZADO EM" in txt:
-            return "CONTRATO"
-        
-        # Prioridade 2: Aditamentos
-        if "ADITAMENTO" in txt or "TERMO ADITIVO" in txt:
-            return "ADITAMENTO"
-        
-        # Prioridade 3: Contratos em geral (verificar contexto)
-        if "CONTRATO" in txt and "ADITAMENTO" not in txt:
-            # Se é formalização ou celebração, definitivamente é contrato
-            if any(palavra in txt for palavra in ["FORMALIZAÇÃO", "CELEBRADO", "ASSINATURA DO CONTRATO", "NÚMERO DO CONTRATO"]):
-                return "CONTRATO"
-            # Se menciona "contrato" mas não tem contexto de formalização, pode ser apenas referência
-            # Neste caso, continua verificando outras possibilidades
-        
-        # Prioridade 4: Licitações (pregão, homologação, etc)
-        if "PREGÃO" in txt or "LICITAÇÃO" in txt or "HOMOLOG" in txt:
-            # Se já foi identificado como contrato acima, não sobrescrever
-            # Se chegou aqui, é porque não tinha contexto forte de contrato
-            return "LICITACAO"
-        
-        # Prioridade 5: Se tem "CONTRATO" mas não se encaixou em nenhum dos acima
-        if "CONTRATO" in txt:
-            return "CONTRATO"
-        
-        return "OUTROS"
+        """Tipo da publicação no vocabulário do relatório (ADITAMENTO/CONTRATO/LICITACAO/OUTROS).
+
+        Resultados do scraper já trazem doc_type; isto serve a textos avulsos e usa a mesma
+        classificação canônica (classification.py)."""
+        return classification.formatter_type(classification.classify(summary))
     
     def extrair_numero_aditamento(self, texto: str) -> str:
         """Extrai número do aditamento"""
-        m_adit = re.search(r'(?:ADITAMENTO|TERMO ADITIVO)[^0-9]*(\d+/\d+)', texto.upper())
+        m_adit = _RE_ADITAMENTO.search(texto.upper())
         if m_adit:
             parts = m_adit.group(1).split('/')
             ano = parts[1] if len(parts[1]) == 4 else "20" + parts[1]
@@ -83,33 +76,32 @@ class DiarioFormatter:
     
     def extrair_numero_contrato_origem(self, texto: str) -> str:
         """Extrai número do contrato original (para aditamentos)"""
-        m_orig = re.search(r'CONTRATO Nº\s*(\d+/\d+)', texto.upper())
+        m_orig = _RE_CONTRATO_ORIGEM.search(texto.upper())
         return m_orig.group(1) if m_orig else "S/N"
     
     def extrair_numero_licitacao(self, texto: str, doc_id: str) -> str:
         """Extrai número da licitação"""
-        m_num = re.search(r'(?:PREGÃO|LICITAÇÃO|CHAMAMENTO)[^0-9]*(\d+/\d+)', texto.upper())
+        m_num = _RE_LICITACAO.search(texto.upper())
         return m_num.group(1) if m_num else doc_id
     
     def extrair_vencedor(self, texto: str) -> str:
         """Extrai vencedor da licitação"""
         txt = texto.upper()
         if "HOMOLOG" in txt or "ADJUDIC" in txt:
-            m_emp = re.search(r'EMPRESA\s+(.*?)(?:,|\.|CNPJ)', txt)
+            m_emp = _RE_VENCEDOR.search(txt)
             if m_emp:
                 return m_emp.group(1).strip()
         return "EM PROCESSO"
     
     def extrair_data_abertura(self, texto: str) -> str:
         """Extrai data de abertura da licitação"""
-        txt = re.sub(r'\s+', ' ', texto)
+        txt = _RE_ESPACOS.sub(' ', texto)
         
-        padrao_data = r'(?:abertura|sessão|disputa|lances|ocorrerá).*?(?:dia|em|at[ée])\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})'
-        match = re.search(padrao_data, txt, re.IGNORECASE)
+        match = _RE_DATA_ABERTURA.search(txt)
         if match:
             return match.group(1)
         
-        match_label = re.search(r'Data da sessão\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})', txt, re.IGNORECASE)
+        match_label = _RE_DATA_SESSAO.search(txt)
         if match_label:
             return match_label.group(1)
         
@@ -118,23 +110,17 @@ class DiarioFormatter:
     def extrair_vigencia(self, texto: str) -> str:
         """Extrai período de vigência"""
         # Padrão 1: "Data de início e término... X e Y"
-        m_inicio_fim = re.search(
-            r'Data de início e t[ée]rmino.*?:?\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})\s*e\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})',
-            texto, re.IGNORECASE
-        )
+        m_inicio_fim = _RE_VIGENCIA_INICIO_FIM.search(texto)
         if m_inicio_fim:
             return f"{m_inicio_fim.group(1)} a {m_inicio_fim.group(2)}"
         
         # Padrão 2: "período de X a Y"
-        m_periodo = re.search(
-            r'período de\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})\s*a\s*([\d]{2}[/.][\d]{2}[/.][\d]{4})',
-            texto, re.IGNORECASE
-        )
+        m_periodo = _RE_VIGENCIA_PERIODO.search(texto)
         if m_periodo:
             return f"{m_periodo.group(1)} a {m_periodo.group(2)}"
         
         # Padrão 3: Prazo em meses
-        m_meses = re.search(r'pelo prazo de (?:mais)?\s*(\d+.*?)meses', texto)
+        m_meses = _RE_VIGENCIA_MESES.search(texto)
         if m_meses:
             return f"{m_meses.group(1)}meses (ver datas no contrato)"
         
@@ -153,256 +139,39 @@ class DiarioFormatter:
             return "CHAMAMENTO PÚBLICO"
         return "PREGÃO ELETRÔNICO"
     
+    # Os cards são renderizados pelos templates de report_renderer
     def formatar_aditamento(self, r: SearchResult) -> str:
         """Formata card de aditamento"""
-        num_adit = self.extrair_numero_aditamento(r.summary)
-        num_orig = self.extrair_numero_contrato_origem(r.summary)
-        
-        contratada_full = "Ver íntegra"
-        if r.contractor and r.contractor != "-":
-            doc = self.anonimizar_cpf(r.value if r.value else "")
-            contratada_full = f"{r.contractor}, CNPJ/CPF {doc}"
-        
-        vigencia = self.extrair_vigencia(r.summary)
-        modalidade = self.extrair_modalidade(r.summary)
-        
-        return f"""<div class="card aditamento">
-        • <span class="label">Processo SEI:</span> <span class="val">{r.process_number}</span><br>
-        Aditamento nº <a href="{r.link_pdf}">{num_adit}</a> ao Contrato nº {num_orig}<br>
-        <span class="label">Contratada:</span> <span class="val">{contratada_full}</span><br>
-        <span class="label">Modalidade:</span> <span class="val">{modalidade}</span><br>
-        <span class="label">Objeto:</span> <span class="val">{r.object_text}</span><br>
-        <span class="label">Data da Assinatura:</span> <span class="val">{r.date}</span><br>
-        <span class="label">Data da Publicação:</span> <span class="val">{r.date}</span><br>
-        <span class="label">Vigência:</span> <span class="val">{vigencia}</span><br>
-        <span class="label">Valor:</span> <span class="val">{r.value if r.value != '-' else 'Ver íntegra'}</span>
-        </div>"""
+        return self._renderer.render_card(r, "aditamento")
     
     def formatar_contrato(self, r: SearchResult) -> str:
         """Formata card de contrato"""
-        num_con = self.extrair_numero_contrato_origem(r.summary)
-        
-        contratada_full = "Ver íntegra"
-        if r.contractor and r.contractor != "-":
-            doc = self.anonimizar_cpf(r.value if r.value else "")
-            contratada_full = f"{r.contractor}, CNPJ/CPF {doc}"
-        
-        return f"""<div class="card contrato">
-        • <span class="label">Processo SEI:</span> <span class="val">{r.process_number}</span><br>
-        Contrato nº <a href="{r.link_pdf}">{num_con}</a> - {contratada_full}<br>
-        <span class="label">Objeto:</span> <span class="val">{r.object_text}</span><br>
-        <span class="label">Data da Assinatura:</span> <span class="val">{r.date}</span><br>
-        <span class="label">Data da Publicação:</span> <span class="val">{r.date}</span><br>
-        <span class="label">Valor:</span> <span class="val">{r.value if r.value != '-' else 'Ver íntegra'}</span>
-        </div>"""
+        return self._renderer.render_card(r, "contrato")
     
     def formatar_licitacao(self, r: SearchResult) -> str:
         """Formata card de licitação"""
-        mod_nome = self.extrair_modalidade(r.summary)
-        num_pub = self.extrair_numero_licitacao(r.summary, r.document_id)
-        vencedor = self.extrair_vencedor(r.summary)
-        data_abertura = self.extrair_data_abertura(r.summary)
-        
-        return f"""<div class="card compra">
-        <span class="label">Número do Processo:</span> <span class="val">{r.process_number}</span><br>
-        <span class="label">Número da Publicação:</span> <a href="{r.link_pdf}">{mod_nome} {num_pub}</a><br>
-        <span class="label">Documento:</span> <a href="{r.link_html}">{r.document_id}</a><br>
-        <span class="label">Licitante Vencedor:</span> <span class="val">{vencedor}</span><br>
-        <span class="label">Modalidade:</span> <span class="val">{mod_nome}</span><br>
-        <span class="label">Data da Abertura:</span> <span class="val">{data_abertura}</span><br>
-        <span class="label">Objeto:</span> <span class="val">{r.object_text}</span><br>
-        <span class="label">Data de Publicação:</span> <span class="val">{r.date}</span>
-        </div>"""
-    
-    def formatar_html(self, results: List[SearchResult]) -> str:
-        """Formata todos os resultados em HTML"""
-        if not results:
-            return "<p>❌ Nenhum dado coletado.</p>"
-        
-        html = f"{self.css}\n<h2>📋 RESULTADOS - DIÁRIO OFICIAL</h2>\n"
-        
-        for r in results:
-            tipo = self.classificar_tipo(r.summary)
-            
-            if tipo == "ADITAMENTO":
-                html += self.formatar_aditamento(r)
-            elif tipo == "CONTRATO":
-                html += self.formatar_contrato(r)
-            elif tipo == "LICITACAO":
-                html += self.formatar_licitacao(r)
-            else:
-                # Fallback para outros tipos
-                html += f"""<div class="card">
-                <span class="label">Processo:</span> {r.process_number}<br>
-                <span class="label">Documento:</span> <a href="{r.link_html}">{r.document_id}</a><br>
-                <span class="label">Objeto:</span> {r.object_text}<br>
-                <span class="label">Data:</span> {r.date}
-                </div>"""
-        
-        return html
+        return self._renderer.render_card(r, "licitacao")
     
     def formatar_pedido_compra(self, r: SearchResult) -> str:
         """Formata card de pedido de compra (dispensa)"""
-        # Similar to contract but specific style
-        contratada_full = "Ver íntegra"
-        if r.contractor and r.contractor != "-":
-            doc = self.anonimizar_cpf(r.value if r.value else "") # This looks like a bug in original code (passing value instead of company_doc), let's fix it here? No, let's keep it safe or fix it properly. 
-            # Wait, r.value is money value. r.company_doc is the doc.
-            # The previous code had `doc = self.anonimizar_cpf(r.value if r.value else "")` ... wait, lines 144 and 168 in original: `doc = self.anonimizar_cpf(r.value if r.value else "")`
-            # That looks suspicious. It should probably be r.company_doc.
-            # I will fix it here for the new method, and maybe fixing the others is out of scope unless I'm sure.
-            # Actually, `r.value` usually holds the monetary value "2.178,00". `r.company_doc` holds CNPJ.
-            # The user complained about CPF anonymization not being seen. maybe because it was looking at the wrong field?
-            # I'll check `models.py`. company_doc is the field.
-            doc = self.anonimizar_cpf(r.company_doc if r.company_doc else "")
-            contratada_full = f"{r.contractor}, CNPJ/CPF {doc}"
-
-        return f"""<div class="card pedido-compra">
-        <div style="background-color: #e3f2fd; padding: 5px; border-bottom: 1px solid #ddd; margin-bottom: 10px;">
-            <strong>🛒 PEDIDO DE COMPRA / DISPENSA</strong>
-        </div>
-        • <span class="label">Processo SEI:</span> <span class="val">{r.process_number}</span><br>
-        <span class="label">Contratada:</span> <span class="val">{contratada_full}</span><br>
-        <span class="label">Objeto:</span> <span class="val">{r.object_text}</span><br>
-        <span class="label">Data da Assinatura:</span> <span class="val">{r.validity_start}</span><br>
-        <span class="label">Data da Publicação:</span> <span class="val">{r.date}</span><br>
-        <span class="label">Valor:</span> <span class="val">{r.value}</span><br>
-        </div>"""
+        return self._renderer.render_card(r, "pedido_compra")
 
     def formatar_acordo_cooperacao(self, r: SearchResult) -> str:
         """Formata card de Acordo de Cooperação"""
-        # Format the contract number to NNN/AAAA
-        formatted_num = r.contract_number if r.contract_number else "S/N"
-        if formatted_num != "S/N" and "/" in formatted_num:
-            parts = formatted_num.split("/")
-            nnn = parts[0].zfill(3)
-            aaaa = parts[1]
-            if len(aaaa) == 2 and int(aaaa) > 10:
-                aaaa = "20" + aaaa
-            formatted_num = f"{nnn}/{aaaa}"
-
-        orgao_completo = r.contractor if r.contractor else "-"
-        if r.company_doc and r.company_doc != "-":
-            orgao_completo += f", CNPJ nº {r.company_doc}"
-
-        vig_inicio = r.validity_start if r.validity_start else "-"
-        vig_fim = r.validity_end if r.validity_end else "-"
-
-        return f"""<div class="card parceria">
-        <div style="background-color: #e8f5e9; padding: 5px; border-bottom: 1px solid #ddd; margin-bottom: 10px;">
-            <strong>🤝 ACORDO DE COOPERAÇÃO</strong>
-        </div>
-        <p><strong>Número do processo: </strong> <a href="{r.link_html}" target="_blank">{r.process_number}</a></p>
-        <p><strong>Número do termo: </strong> ACORDO DE COOPERAÇÃO <a href="{r.link_pdf}" target="_blank">{formatted_num}</a></p>
-        <p><strong>Nome do órgão/instituição: </strong> {orgao_completo}</p>
-        <p><strong>Objeto: </strong> {r.object_text}</p>
-        <p><strong>Data da Assinatura: </strong> {r.validity_start if r.validity_start else '-'}</p>
-        <p><strong>Data da Publicação: </strong> {r.date}</p>
-        <p><strong>Vigência: </strong> de {vig_inicio} a {vig_fim}</p>
-        </div>"""
+        return self._renderer.render_card(r, "acordo_cooperacao")
 
     def formatar_destaque(self, r: SearchResult) -> str:
         """Formata card de destaque (Homologação/Adjudicação)"""
-        vencedor = r.contractor
-        doc = self.anonimizar_cpf(r.company_doc if r.company_doc else "")
-        
-        return f"""<div class="card destaque">
-        <div style="background-color: #fff3cd; color: #856404; padding: 10px; border-bottom: 2px solid #ffeeba; margin-bottom: 10px; font-size: 1.1em;">
-            <strong>🏆 RESULTADO DE LICITAÇÃO / HOMOLOGAÇÃO</strong>
-        </div>
-        <span class="label">Processo:</span> <span class="val">{r.process_number}</span><br>
-        <span class="label">Vencedor:</span> <span class="val" style="font-size: 1.1em; color: #000;">{vencedor}</span><br>
-        <span class="label">CNPJ/CPF:</span> <span class="val">{doc}</span><br>
-        <hr style="border: 0; border-top: 1px solid #eee;">
-        <span class="label">Objeto:</span> <span class="val">{r.object_text}</span><br>
-        <span class="label">Data de Publicação:</span> <span class="val">{r.date}</span><br>
-        <div style="margin-top: 10px; text-align: right;">
-             <a href="{r.link_pdf}" class="btn" style="background-color: #28a745; color: white; padding: 5px 10px; border-radius: 4px;">Abrir Documento 📄</a>
-        </div>
-        </div>"""
+        return self._renderer.render_card(r, "destaque")
+
+    def iter_html(self, results: Iterable[SearchResult]) -> Iterator[str]:
+        """Cards em chunks, para streaming (arquivo ou resposta HTTP)"""
+        return self._renderer.iter_cards(results)
 
     def formatar_html(self, results: List[SearchResult]) -> str:
         """Formata todos os resultados em HTML"""
-        if not results:
-            return "<p>❌ Nenhum dado coletado.</p>"
-        
-        # Update CSS for new types
-        extra_css = """
-        .pedido-compra { border-left: 5px solid #2196F3; background-color: #fbfdff; }
-        .destaque { border: 2px solid #ffc107; box-shadow: 0 4px 8px rgba(0,0,0,0.15); }
-        """
-        
-        html = f"{self.css}{extra_css}</style>\n<h2>📋 RESULTADOS - DIÁRIO OFICIAL</h2>\n"
-        
-        for r in results:
-            # Check explicit doc_type first (populated by scraper_service)
-            if r.doc_type == "PEDIDO_COMPRA":
-                html += self.formatar_pedido_compra(r)
-                continue
-            elif r.doc_type == "HOMOLOGACAO":
-                html += self.formatar_destaque(r)
-                continue
-            elif r.doc_type == "ACORDO_COOPERACAO":
-                html += self.formatar_acordo_cooperacao(r)
-                continue
-            elif r.doc_type == "DIVERSOS":
-                 continue # User implies "Outros" might be excluded or just put in "Outros" group?
-                 # "outros termos que precisam entrar na regra de Outros" -> Assuming "Outros" means "Excluded" or just "Generic/Ignored"?
-                 # User said: "os documentos que se referirem a 'Pedido de Compra'... sejam colocados em outro agrupamento"
-                 # And "Outros termos que precisam entrar na regra de Outros... NOTIFICAÇÃO..."
-                 # Usually "Outros/Diversos" implies we might not want to show them prominently or at all if they are noise.
-                 # Current code: `return "OUTROS"` in classify -> put in generic card.
-                 # Scraper sets `doc_type` = 'DIVERSOS'. 
-                 # Let's render them as generic cards for now so they aren't lost, unless user said "Exclude".
-                 # "exclude specific document types ... that are not relevant for publication" (from previous summary). 
-                 # So DIVERSOS should probably be SKIPPED or put in a separate list at bottom. 
-                 # Let's skip them for now if they are truly irrelevant, or render minimally.
-                 # User said: "classificar esses documentos como 'DIVERSOS' e garantindo que essa classificação seja passada para o frontend para exibição adequada."
-                 # So maybe just show them.
-                 pass
-            
-            # Fallback to text classification if doc_type is generic
-            tipo = self.classificar_tipo(r.summary)
-            if r.doc_type == 'DIVERSOS': tipo = "OUTROS_IRRELEVANTES" # catch-all
-
-            if tipo == "ADITAMENTO":
-                html += self.formatar_aditamento(r)
-            elif tipo == "CONTRATO":
-                html += self.formatar_contrato(r)
-            elif tipo == "LICITACAO":
-                html += self.formatar_licitacao(r)
-            elif tipo == "OUTROS_IRRELEVANTES":
-                 # Maybe exclude? Or render small.
-                 html += f"""<div class="card" style="opacity: 0.6; border-left: 5px solid #ccc;">
-                 <span class="label">Outros/Diversos:</span> <span class="val">{r.summary[:100]}...</span>
-                 </div>"""
-            else:
-                # Fallback
-                html += f"""<div class="card">
-                <span class="label">Processo:</span> {r.process_number}<br>
-                <span class="label">Documento:</span> <a href="{r.link_html}">{r.document_id}</a><br>
-                <span class="label">Objeto:</span> {r.object_text}<br>
-                <span class="label">Data:</span> {r.date}
-                </div>"""
-        
-        return html
+        return "".join(self._renderer.iter_cards(results))
     
-    def salvar_html(self, results: List[SearchResult], filename: str = "resultados.html"):
-        """Salva resultados em arquivo HTML"""
-        html = self.formatar_html(results)
-        html_completo = f"""<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Resultados - Diário Oficial</title>
-</head>
-<body>
-    {html}
-</body>
-</html>"""
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_completo)
-        
-        return filename
+    def salvar_html(self, results: Iterable[SearchResult], filename: str = "resultados.html"):
+        """Salva resultados em arquivo HTML (escrita em streaming, sem montar o documento em memória)"""
+        return self._renderer.write(results, filename)
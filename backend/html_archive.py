@@ -0,0 +1,99 @@
+"""
+Arquivo das páginas brutas (listagens e matérias) baixadas do Diário.
+
+Cada página vai comprimida (zlib) para o fim de um segmento append-only em
+logs/archive/ (seg-000001.z, seg-000002.z...; um segmento novo a cada
+SEGMENT_BYTES). O índice SQLite guarda, por chave ("doc:<id>" ou
+"listing:<data>:<órgão>"), o segmento, o deslocamento e o tamanho da versão
+mais recente, além da versão do extrator que gerou o resultado gravado. A
+leitura é feita por mmap dos segmentos, sem abrir e ler o arquivo a cada
+página. É daqui que o reprocess.py reextrai os resultados sem acessar o site.
+"""
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import closing
+from datetime import datetime
+from typing import List, Optional
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+COMPRESS_LEVEL = 6
+
+
+def decompress(raw: bytes) -> str:
+    return zlib.decompress(raw).decode("utf-8")
+
+
+class HtmlArchive:
+    def __init__(self, archive_dir: str, segment_bytes: int = SEGMENT_BYTES):
+        self.archive_dir = archive_dir
+        self.segment_bytes = segment_bytes
+        os.makedirs(archive_dir, exist_ok=True)
+        self._lock = threading.Lock()  # Serializa as gravações (chamadas de várias threads)
+        self._maps = {}  # segmento -> mmap
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, kind TEXT, url TEXT, segment INTEGER, "
+                         "offset INTEGER, length INTEGER, fetched_at TEXT, extractor_version INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_version ON pages (kind, extractor_version)")
+            self._segment = conn.execute("SELECT COALESCE(MAX(segment), 1) FROM pages").fetchone()[0]
+
+    def _connect(self):
+        return sqlite3.connect(os.path.join(self.archive_dir, "index.db"), check_same_thread=False)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.archive_dir, f"seg-{segment:06d}.z")
+
+    def put(self, kind: str, key: str, url: str, html: str, extractor_version: Optional[int] = None):
+        """Acrescenta a página ao segmento atual e aponta o índice para ela (versões antigas ficam no segmento)"""
+        raw = zlib.compress(html.encode("utf-8"), COMPRESS_LEVEL)
+        with self._lock:
+            path = self._segment_path(self._segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(raw) > self.segment_bytes:
+                self._segment += 1
+                path = self._segment_path(self._segment)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(raw)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (key, kind, url, self._segment, offset, len(raw),
+                              datetime.now().isoformat(timespec="seconds"), extractor_version))
+
+    def raw(self, key: str) -> Optional[bytes]:
+        """Bytes comprimidos da versão mais recente (para descomprimir em outro processo)"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT segment, offset, length FROM pages WHERE key = ?", (key,)).fetchone()
+        return self._read(*row) if row else None
+
+    def get(self, key: str) -> Optional[str]:
+        raw = self.raw(key)
+        return decompress(raw) if raw is not None else None
+
+    def _read(self, segment: int, offset: int, length: int) -> bytes:
+        mapped = self._maps.get(segment)
+        if mapped is None or offset + length > len(mapped):
+            # Segmento ainda aberto para gravação cresceu desde o último mapeamento
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped[offset:offset + length]
+
+    def stale(self, extractor_version: int, kind: str = "detail") -> List[tuple]:
+        """(chave, url) das páginas cujo resultado foi gerado por um extrator anterior a `extractor_version`"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT key, url FROM pages WHERE kind = ? AND (extractor_version IS NULL OR extractor_version < ?) "
+                "ORDER BY segment, offset", (kind, extractor_version)).fetchall()
+
+    def mark(self, keys: List[str], extractor_version: int):
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE pages SET extractor_version = ? WHERE key = ?", [(extractor_version, k) for k in keys])
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
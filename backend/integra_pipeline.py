@@ -0,0 +1,214 @@
+"""
+Download e extração de texto da "Íntegra" (documento SEI) das publicações.
+
+Vigência, valor e contratada muitas vezes só aparecem no documento integral.
+Os downloads correm em paralelo (limitados por um semáforo próprio, fora das
+vagas de página do navegador) e vão para o disco em blocos enquanto o
+SHA-256 é calculado: a memória fica em um bloco por download. O arquivo é
+guardado pelo hash, então o mesmo documento citado por várias matérias é
+gravado e extraído uma vez só; o índice url -> hash evita baixar de novo em
+execuções futuras. A extração (HTML com BeautifulSoup, PDF com pypdf,
+opcional) roda num pool de processos e o texto fica em cache ao lado do
+arquivo.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 64 * 1024
+MAX_BYTES = 25 * 1024 * 1024
+# Texto entregue às regex e à IA (o arquivo em cache guarda o texto inteiro)
+MAX_TEXT_CHARS = 20000
+# O índice url -> hash vai para o disco a cada N downloads e no close(), numa thread
+INDEX_FLUSH_EVERY = 50
+
+
+def extract_text(path: str) -> str:
+    """Texto de um documento baixado; executado no pool de processos"""
+    with open(path, "rb") as f:
+        head = f.read(5)
+    if head == b"%PDF-":
+        if importlib.util.find_spec("pypdf") is None:
+            return ""
+        from pypdf import PdfReader
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    from bs4 import BeautifulSoup
+    with open(path, "rb") as f:
+        soup = BeautifulSoup(f, "html.parser")
+    for tag in soup(["script", "style"]):
+        tag.decompose()
+    return soup.get_text(" ", strip=True)
+
+
+class IntegraPipeline:
+    def __init__(self, cache_dir: str, max_downloads: int = 4, max_workers: int = None, user_agent: str = None):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.user_agent = user_agent
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._sem = asyncio.Semaphore(max_downloads)
+        self._index_file = os.path.join(cache_dir, "index.json")
+        self._index = self._load_index()
+        self._index_pending = 0
+        self._index_lock = asyncio.Lock()
+        self._inflight = {}  # url -> Task (a mesma íntegra pedida por várias matérias ao mesmo tempo)
+        self._extracting = {}  # sha256 -> Future
+        self._session = None
+        self._pool = None
+        self.pdf_supported = importlib.util.find_spec("pypdf") is not None
+        if not self.pdf_supported:
+            logger.info("pypdf não instalado: íntegras em PDF serão baixadas, mas sem extração de texto")
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self._index_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: dict):
+        tmp = self._index_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, self._index_file)
+
+    async def _flush_index(self):
+        """Grava uma cópia do índice fora do event loop (uma gravação por vez)"""
+        if not self._index_pending:
+            return
+        self._index_pending = 0
+        snapshot = dict(self._index)
+        async with self._index_lock:
+            await asyncio.to_thread(self._save_index, snapshot)
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.cache_dir, sha)
+
+    async def text_for(self, url: str) -> str:
+        """Texto da íntegra (até MAX_TEXT_CHARS); vazio se não puder ser baixada ou lida"""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._text_for(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return (await asyncio.shield(task))[:MAX_TEXT_CHARS]
+
+    def cached_text(self, url: str) -> str:
+        """Texto já extraído de uma íntegra baixada antes (sem rede nem extração); vazio se não houver"""
+        sha = self._index.get(url)
+        if not sha or not os.path.exists(self._path(sha) + ".txt"):
+            return ""
+        return _read_text(self._path(sha) + ".txt")[:MAX_TEXT_CHARS]
+
+    async def _text_for(self, url: str) -> str:
+        sha = self._index.get(url)
+        cached = bool(sha) and os.path.exists(self._path(sha))
+        metrics.record_cache("integra_download", cached)
+        if cached:
+            metrics.INTEGRA_DOWNLOADS.inc(result="cached")
+        else:
+            sha = await self._download(url)
+            if sha is None:
+                return ""
+
+        future = self._extracting.get(sha)
+        if future is None:
+            future = asyncio.ensure_future(self._extract(sha))
+            self._extracting[sha] = future
+        return await asyncio.shield(future)
+
+    async def _extract(self, sha: str) -> str:
+        txt_path = self._path(sha) + ".txt"
+        cached = os.path.exists(txt_path)
+        metrics.record_cache("integra_text", cached)
+        if cached:
+            return await asyncio.to_thread(_read_text, txt_path)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            text = await asyncio.get_running_loop().run_in_executor(self._pool, extract_text, self._path(sha))
+        except Exception as e:
+            logger.warning(f"Falha ao extrair texto da íntegra {sha[:12]}: {e}")
+            return ""
+        if text:  # PDF sem pypdf não deixa cache vazio para trás
+            await asyncio.to_thread(_write_text, txt_path, text)
+        return text
+
+    async def _get_session(self):
+        if self._session is None:
+            import aiohttp
+            headers = {"User-Agent": self.user_agent} if self.user_agent else None
+            self._session = aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=60, sock_read=20))
+        return self._session
+
+    async def _download(self, url: str):
+        """Baixa em blocos para um .part calculando o hash; retorna o sha256 ou None"""
+        async with self._sem:
+            tmp = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.part")
+            digest = hashlib.sha256()
+            size = 0
+            complete = False
+            try:
+                # Sem aiohttp instalado o download falha aqui, como qualquer outro erro: a matéria segue sem íntegra
+                session = await self._get_session()
+                async with session.get(url) as resp:
+                    resp.raise_for_status()
+                    with open(tmp, "wb") as f:
+                        async for chunk in resp.content.iter_chunked(CHUNK_BYTES):
+                            size += len(chunk)
+                            if size > MAX_BYTES:
+                                metrics.INTEGRA_DOWNLOADS.inc(result="too_large")
+                                logger.warning(f"Íntegra acima de {MAX_BYTES // (1024 * 1024)} MB ignorada: {url}")
+                                return None
+                            digest.update(chunk)
+                            f.write(chunk)
+                complete = True
+            except Exception as e:
+                metrics.INTEGRA_DOWNLOADS.inc(result="error")
+                logger.warning(f"Falha ao baixar íntegra {url}: {e}")
+                return None
+            finally:
+                if not complete and os.path.exists(tmp):
+                    os.remove(tmp)
+
+            sha = digest.hexdigest()
+            if os.path.exists(self._path(sha)):
+                os.remove(tmp)
+                metrics.INTEGRA_DOWNLOADS.inc(result="dedup")
+            else:
+                os.replace(tmp, self._path(sha))
+                metrics.INTEGRA_DOWNLOADS.inc(result="downloaded")
+            metrics.INTEGRA_BYTES.inc(size)
+            self._index[url] = sha
+            self._index_pending += 1
+            if self._index_pending >= INDEX_FLUSH_EVERY:
+                await self._flush_index()
+            return sha
+
+    async def close(self):
+        await self._flush_index()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_text(path: str, text: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
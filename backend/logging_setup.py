@@ -0,0 +1,148 @@
+"""
+Configuração de logs fora do event loop.
+
+Quem loga só enfileira o registro (QueueHandler); uma thread (QueueListener)
+formata e escreve no console e em logs/app.jsonl, um JSON por linha com
+horário, nível, módulo e o run_id da coleta em andamento, rotacionado por
+tamanho. Avisos repetidos da mesma linha de código são limitados por janela
+de tempo: os excedentes são descartados antes de entrar na fila e a contagem
+aparece no próximo aviso que passar.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FILE = "app.jsonl"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+# Avisos por linha de código a cada janela; o resto é só contado
+RATE_LIMIT = 5
+RATE_WINDOW_S = 60.0
+
+_run_id = contextvars.ContextVar("run_id", default="")
+_listener = None
+
+
+def default_logs_dir() -> str:
+    """Mesma pasta logs/ usada pelo scraper (ao lado do executável quando congelado)"""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "logs")
+
+
+def set_run_id(run_id: str):
+    """Marca os logs do contexto atual (e das tarefas criadas a partir dele) com o run_id; retorna o token"""
+    return _run_id.set(run_id)
+
+
+def reset_run_id(token):
+    try:
+        _run_id.reset(token)
+    except ValueError:
+        # Gerador fechado a partir de outro contexto: o valor antigo morre com o contexto original
+        _run_id.set("")
+
+
+class RunIdFilter(logging.Filter):
+    """Copia o run_id para o registro antes de ele sair do contexto de quem logou"""
+
+    def filter(self, record):
+        record.run_id = _run_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """No máximo `limit` avisos (WARNING) por linha de código a cada `window` segundos; erros passam sempre"""
+
+    def __init__(self, limit: int = RATE_LIMIT, window: float = RATE_WINDOW_S):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._slots = {}  # (pathname, lineno) -> [início da janela, emitidos, suprimidos]
+
+    def filter(self, record):
+        if record.levelno != logging.WARNING:
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None or now - slot[0] >= self.window:
+                suppressed = slot[2] if slot else 0
+                self._slots[key] = [now, 1, 0]
+            elif slot[1] < self.limit:
+                slot[1] += 1
+                return True
+            else:
+                slot[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} avisos iguais suprimidos)"
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        # O QueueHandler já juntou o traceback (exc_info) à mensagem antes de enfileirar
+        return json.dumps({
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "run_id": getattr(record, "run_id", ""),
+            "message": record.getMessage(),
+        }, ensure_ascii=False)
+
+
+def setup_logging(logs_dir: str = None, level: int = logging.INFO, console: bool = True):
+    """Substitui os handlers da raiz por uma fila; a escrita fica com a thread do QueueListener"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    logs_dir = logs_dir or default_logs_dir()
+    os.makedirs(logs_dir, exist_ok=True)
+
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(logs_dir, LOG_FILE), maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    queue_handler.addFilter(RunIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Esvazia a fila e para a thread de escrita"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
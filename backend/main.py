@@ -1,30 +1,34 @@
 from fastapi import FastAPI, WebSocket, HTTPException, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import ValidationError
 from contextlib import asynccontextmanager
 from typing import List
-import uvicorn
 import asyncio
+import importlib
 import os
+import re
 import sys
 import logging
+import time
 import traceback
-import webbrowser
 import threading
 import multiprocessing
 from datetime import datetime
 
-from scraper_service_layer import ScraperService
-from models import SearchRequest, SearchResult
+from models import SearchRequest, SearchResult, WatchConfig
 from version import get_current_version, check_for_updates
+import metrics
+import profiling
+from report_renderer import ReportRenderer
+import exporter
+import wire
+from progress import ProgressChannel
+import logging_setup
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logs escritos por uma thread (console + logs/app.jsonl); o event loop só enfileira
+logging_setup.setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -38,8 +42,11 @@ async def lifespan(app: FastAPI):
     if sys.platform == 'win32' and not isinstance(loop, asyncio.ProactorEventLoop):
         logger.error("AVISO: Não está usando ProactorEventLoop! Playwright pode falhar.")
 
-    # Inicializa o serviço de scraping (Camada Intermediária)
-    app.state.service = ScraperService(debug=True)
+    # Serviço de scraping (Playwright, BeautifulSoup, tenacity) carregado em background:
+    # o servidor já responde ao index.html enquanto os módulos pesados são importados
+    app.state.browser = None
+    app.state.watcher = None
+    app.state.service_task = asyncio.create_task(init_service())
     
     # Verificar atualizações em background
     asyncio.create_task(check_updates_on_startup())
@@ -47,6 +54,14 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     logger.info("Encerrando servidor...")
+    try:
+        await app.state.service_task
+    except Exception as e:
+        logger.error(f"Serviço de scraping não inicializou: {e}")
+    if app.state.watcher is not None:
+        await app.state.watcher.stop()
+    if app.state.browser is not None:
+        await app.state.browser.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -87,8 +102,81 @@ async def check_update():
         return {"available": False, "current_version": get_current_version(), "error": "Erro ao verificar atualizações"}
     return update_info.to_dict()
 
+@app.get("/api/traces/{run_id}")
+async def get_trace(run_id: str):
+    """Arquivo de trace (Chrome Trace Event) de uma execução feita com trace ligado"""
+    if not re.fullmatch(r'[\w-]+', run_id):
+        raise HTTPException(status_code=400, detail="run_id inválido")
+    path = (await get_service()).trace_path(run_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Trace não encontrado")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
+
+@app.get("/api/profiles")
+async def list_profiles():
+    """Execuções feitas com profiling ligado"""
+    return profiling.list_profiles((await get_service()).profiles_dir)
+
+@app.get("/api/profiles/{run_id}")
+async def get_profile(run_id: str):
+    """Relatório de CPU e memória de uma execução"""
+    return FileResponse(_profile_file((await get_service()).profiles_dir, run_id, profiling.REPORT_FILE), media_type="application/json")
+
+@app.get("/api/profiles/{run_id}/collapsed")
+async def get_profile_collapsed(run_id: str):
+    """Pilhas colapsadas (flamegraph.pl / speedscope) de uma execução"""
+    return FileResponse(_profile_file((await get_service()).profiles_dir, run_id, profiling.COLLAPSED_FILE), media_type="text/plain")
+
+def _profile_file(profiles_dir: str, run_id: str, name: str) -> str:
+    if not re.fullmatch(r'[\w-]+', run_id):
+        raise HTTPException(status_code=400, detail="run_id inválido")
+    path = os.path.join(profiles_dir, run_id, name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profiling não encontrado")
+    return path
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Métricas por etapa no formato texto do Prometheus"""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+async def init_service():
+    """Importa a camada de scraping fora do event loop, cria o serviço e aquece navegador e IA"""
+    t0 = time.perf_counter()
+    layer = await asyncio.to_thread(importlib.import_module, "scraper_service_layer")
+    service = layer.ScraperService(debug=True)
+    logger.info(f"Serviço de scraping pronto em {time.perf_counter() - t0:.2f}s")
+
+    # Navegador persistente: lançado e aquecido em background para não atrasar a inicialização
+    app.state.browser = service.create_browser_manager()
+    asyncio.create_task(start_browser(app.state.browser))
+    asyncio.create_task(warm_ai_module())
+
+    # Modo vigia: consultas agendadas do dia corrente
+    from watcher import Watcher
+    app.state.watcher = Watcher(service, os.path.join(service.logs_dir, "watches.json")).start()
+    return service
+
+async def get_service():
+    """Serviço de scraping; aguarda a inicialização em background se ainda não terminou"""
+    return await app.state.service_task
+
+async def warm_ai_module():
+    # O SDK do Gemini é pesado; importá-lo aqui evita travar o event loop no primeiro documento
+    try:
+        await asyncio.to_thread(importlib.import_module, "ai_extractor")
+    except Exception as e:
+        logger.debug(f"Módulo de IA não pré-carregado: {e}")
+
+async def start_browser(manager):
+    try:
+        await manager.start()
+    except Exception as e:
+        logger.warning(f"Navegador não pôde ser pré-aquecido ({e}); será iniciado na primeira pesquisa")
+
 async def check_updates_on_startup():
     await asyncio.sleep(2)
+    await asyncio.to_thread(importlib.import_module, "aiohttp")
     update_info = await check_for_updates()
     if update_info and update_info.available:
         logger.info(f"🎉 Nova versão disponível: {update_info.latest_version}")
@@ -97,12 +185,132 @@ async def check_updates_on_startup():
 async def search_endpoint(request: SearchRequest):
     try:
         logger.info(f"Pesquisa via API iniciada: {request.start_date} a {request.end_date}")
-        results = await app.state.service.run(request)
+        service = await get_service()
+        _, results = await service.run(request)
         return results
     except Exception as e:
         logger.error(f"Pesquisa via API falhou: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/report")
+async def report_endpoint(results: List[SearchResult]):
+    """Relatório HTML dos resultados, enviado em streaming card a card"""
+    return StreamingResponse(ReportRenderer().iter_document(results), media_type="text/html; charset=utf-8")
+
+@app.get("/api/runs")
+async def list_runs():
+    """Execuções com resultados gravados (disponíveis para exportação)"""
+    service = await get_service()
+    return await asyncio.to_thread(service.store.runs)
+
+@app.get("/api/runs/{run_id}/export")
+async def export_run(run_id: str, format: str = "csv", columns: str = None, doc_type: str = None, orgao: str = None,
+                     term: str = None, date_from: str = None, date_to: str = None, q: str = None):
+    """Exporta os resultados de uma execução em streaming (csv, xlsx ou parquet).
+
+    `columns`, `doc_type` e `orgao` aceitam listas separadas por vírgula; datas em DD/MM/AAAA."""
+    if not re.fullmatch(r'[\w-]+', run_id):
+        raise HTTPException(status_code=400, detail="run_id inválido")
+    if format not in exporter.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido; use {', '.join(exporter.FORMATS)}")
+    if not exporter.format_available(format):
+        raise HTTPException(status_code=501, detail=f"Exportação {format} requer o pacote pyarrow")
+    store = (await get_service()).store
+    if not await asyncio.to_thread(store.has_run, run_id):
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+
+    cols = _split(columns) or exporter.DEFAULT_COLUMNS
+    try:
+        batches = store.iter_batches(run_id, cols, doc_types=_split(doc_type), orgaos=_split(orgao), term=term,
+                                     date_from=date_from, date_to=date_to, text=q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type, ext = exporter.FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="resultados_{run_id}.{ext}"'}
+    return StreamingResponse(exporter.iter_export(format, batches, cols), media_type=media_type, headers=headers)
+
+@app.get("/api/contracts/expiring")
+async def contracts_expiring(days: int = 30, today: str = None, limit: int = 500):
+    """Vigências terminando nos próximos `days` dias (contratos prorrogados por aditamento ficam de fora)"""
+    store = (await get_service()).store
+    try:
+        return await asyncio.to_thread(store.expiring, days, today, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data deve estar no formato DD/MM/AAAA")
+
+@app.get("/api/contracts/active")
+async def contracts_active(on: str, limit: int = 500):
+    """Documentos vigentes na data `on` (DD/MM/AAAA)"""
+    store = (await get_service()).store
+    try:
+        return await asyncio.to_thread(store.active_on, on, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/contracts/{numero:path}")
+async def contract_history(numero: str):
+    """Histórico do contrato em todas as execuções gravadas: origem, contrato, aditamentos e apostilamentos"""
+    store = (await get_service()).store
+    try:
+        history = await asyncio.to_thread(store.contract_history, numero)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if history is None:
+        raise HTTPException(status_code=404, detail="Contrato não encontrado nos resultados gravados")
+    return history
+
+def _split(value):
+    return [x.strip() for x in value.split(",") if x.strip()] if value else None
+
+@app.get("/api/analytics/summary")
+async def analytics_summary(group_by: str = "month", date_from: str = None, date_to: str = None, doc_type: str = None,
+                            run_id: str = None, limit: int = 100):
+    """Contagem e valores (centavos) por month, doc_type, modality ou contractor (maiores fornecedores primeiro)"""
+    store = (await get_service()).store
+    try:
+        return await asyncio.to_thread(store.aggregate, group_by, limit, date_from, date_to, _split(doc_type), run_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/analytics/distribution")
+async def analytics_distribution(date_from: str = None, date_to: str = None, doc_type: str = None, run_id: str = None):
+    """Quantidade e total por faixa de valor"""
+    store = (await get_service()).store
+    try:
+        return await asyncio.to_thread(store.value_distribution, date_from, date_to, _split(doc_type), run_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def get_watcher():
+    await get_service()
+    return app.state.watcher
+
+@app.get("/api/watches")
+async def list_watches():
+    return (await get_watcher()).list_watches()
+
+@app.post("/api/watches")
+async def add_watch(config: WatchConfig):
+    """Cria um vigia: órgãos e termos consultados no dia corrente a cada `interval_minutes`"""
+    return (await get_watcher()).add_watch(config)
+
+@app.delete("/api/watches/{watch_id}")
+async def remove_watch(watch_id: str):
+    if not (await get_watcher()).remove_watch(watch_id):
+        raise HTTPException(status_code=404, detail="Vigia não encontrado")
+    return {"status": "ok"}
+
+@app.get("/api/watch/digests")
+async def watch_digests(unread: bool = True):
+    """Publicações novas encontradas pelos vigias (por padrão só as não lidas)"""
+    return (await get_watcher()).digests(unread_only=unread)
+
+@app.post("/api/watch/digests/{digest_id}/ack")
+async def ack_digest(digest_id: str):
+    if not (await get_watcher()).ack(digest_id):
+        raise HTTPException(status_code=404, detail="Digest não encontrado")
+    return {"status": "ok"}
+
 @app.websocket("/ws/logs")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
@@ -111,8 +319,9 @@ async def websocket_endpoint(websocket: WebSocket):
             try:
                 data = await websocket.receive_json()
                 if data.get('action') == 'start_search':
+                    service = await get_service()
                     # Proteção: Apenas 1 execução simultânea por sessão
-                    if app.state.service.is_running:
+                    if service.is_running:
                         await websocket.send_json({"type": "error", "message": "Scraper já em execução."})
                         continue
 
@@ -123,13 +332,24 @@ async def websocket_endpoint(websocket: WebSocket):
                         await websocket.send_json({"type": "error", "message": f"Erro de validação: {ve.errors()[0]['msg']}"})
                         continue
 
-                    async def log_callback(msg):
-                        await websocket.send_json({"type": "log", "message": msg})
-                    
-                    results = await app.state.service.run(req, status_callback=log_callback)
-                    response_data = [r.model_dump() if hasattr(r, 'model_dump') else r.dict() for r in results]
-                    
-                    await websocket.send_json({"type": "result", "data": response_data})
+                    async def send_event(event):
+                        with metrics.time_stage("ws_send"):
+                            await websocket.send_json(event)
+
+                    # A coleta só publica no canal; o envio ao navegador corre em outra tarefa
+                    progress = ProgressChannel(send_event).start()
+                    try:
+                        run_id, results = await service.run(req, progress=progress)
+                    finally:
+                        await progress.close()
+                    # Formato negociado pelo cliente (wire.py); sem negociação, JSON como antes
+                    encoding, compression, fields = wire.negotiate(data)
+                    for message in wire.iter_result_messages(results, run_id, encoding, compression, fields):
+                        with metrics.time_stage("ws_send"):
+                            if isinstance(message, bytes):
+                                await websocket.send_bytes(message)
+                            else:
+                                await websocket.send_text(message)
                     await websocket.send_json({"type": "complete"})
                     
             except WebSocketDisconnect:
@@ -158,14 +378,24 @@ if __name__ == "__main__":
             asyncio.set_event_loop(loop)
 
         def open_browser():
-            import time
-            time.sleep(2.5)
+            import socket
+            import webbrowser
+            # Abre a interface assim que a porta aceitar conexões (em vez de esperar um tempo fixo)
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline:
+                try:
+                    with socket.create_connection(("127.0.0.1", 8085), timeout=0.5):
+                        break
+                except OSError:
+                    time.sleep(0.1)
             url = "http://127.0.0.1:8085"
             print(f"[INFO] Abrindo navegador em {url} ...")
             webbrowser.open(url)
         
         threading.Thread(target=open_browser, daemon=True).start()
-        uvicorn.run(app, host="127.0.0.1", port=8085, reload=False, log_level="info")
+        import uvicorn
+        # log_config=None: os logs do uvicorn também passam pela fila do logging_setup
+        uvicorn.run(app, host="127.0.0.1", port=8085, reload=False, log_level="info", log_config=None)
     except Exception as e:
         print("\nERRO FATAL NA INICIALIZAÇÃO:"); traceback.print_exc()
         input("\nPressione ENTER para fechar...")
@@ -0,0 +1,261 @@
+"""
+Métricas do serviço no formato texto do Prometheus (exposto em /api/metrics).
+
+Implementação mínima de contadores, gauges e histogramas com labels, sem
+dependências externas, para funcionar também no executável congelado.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, key, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, key)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    def _samples(self):
+        return iter(())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames=(), callback: Callable[[], Optional[float]] = None):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def _samples(self):
+        if self._callback is not None:
+            try:
+                value = self._callback()
+            except Exception as e:
+                logger.debug(f"Falha ao coletar {self.name}: {e}")
+                value = None
+            if value is not None:
+                yield f"{self.name} {_format_value(value)}"
+            return
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [contagem por bucket..., soma, contagem]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if idx < len(self.buckets):
+                state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(_label_key(self.labelnames, labels))
+        return state[-1] if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, state):
+                cumulative += n
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {state[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _browser_memory_bytes() -> Optional[float]:
+    """RSS somado da árvore do driver do Playwright (node e os processos do Chromium/Edge); requer psutil.
+
+    Filhos Python (pool de processos da íntegra, resource tracker do multiprocessing; no executável
+    congelado, cópias do próprio .exe) ficam de fora: não são memória do navegador."""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    me = psutil.Process()
+    own_name = me.name().lower()
+    total = 0
+    for child in me.children():
+        try:
+            name = child.name().lower()
+            if name == own_name or name.startswith("python"):
+                continue
+            for proc in [child, *child.children(recursive=True)]:
+                total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return float(total)
+
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "diario_stage_duration_seconds",
+    "Duração de cada etapa do pipeline (listing_fetch, detail_fetch, parse, extract, ai, checkpoint, ws_send)",
+    ["stage"]))
+RETRIES = REGISTRY.register(Counter(
+    "diario_retries_total", "Novas tentativas disparadas pelo tenacity", ["operation"]))
+TIMEOUTS = REGISTRY.register(Counter(
+    "diario_timeouts_total", "Timeouts de navegação/IA", ["operation"]))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "diario_cache_requests_total", "Consultas a caches internos (integra_download/integra_text/ai_reuse) por resultado (hit/miss)", ["cache", "result"]))
+DOCUMENTS = REGISTRY.register(Counter(
+    "diario_documents_total", "Matérias processadas por resultado (ok/error)", ["result"]))
+RUNS = REGISTRY.register(Counter(
+    "diario_runs_total", "Execuções de scraping por status (ok/error)", ["status"]))
+ACTIVE_FETCHES = REGISTRY.register(Gauge(
+    "diario_active_detail_fetches", "Páginas de detalhe sendo processadas neste momento"))
+RUN_IN_PROGRESS = REGISTRY.register(Gauge(
+    "diario_run_in_progress", "1 enquanto há uma execução de scraping em andamento"))
+BROWSER_RECYCLES = REGISTRY.register(Counter(
+    "diario_browser_recycles_total", "Reciclagens do navegador por escopo (context/browser) e motivo", ["scope", "reason"]))
+PAGE_STALLS = REGISTRY.register(Counter(
+    "diario_page_stalls_total", "Navegações travadas fechadas pelo watchdog", ["page"]))
+WATCH_POLLS = REGISTRY.register(Counter(
+    "diario_watch_polls_total", "Consultas do modo vigia por resultado (new/empty/skipped/error)", ["result"]))
+WATCH_NEW_DOCUMENTS = REGISTRY.register(Counter(
+    "diario_watch_new_documents_total", "Publicações novas encontradas pelo modo vigia"))
+DUPLICATES = REGISTRY.register(Counter(
+    "diario_duplicates_total", "Republicações detectadas, por reaproveitamento da IA (reused/not_reused)", ["ai"]))
+INTEGRA_DOWNLOADS = REGISTRY.register(Counter(
+    "diario_integra_downloads_total", "Íntegras por resultado (downloaded/dedup/cached/too_large/error)", ["result"]))
+INTEGRA_BYTES = REGISTRY.register(Counter(
+    "diario_integra_bytes_total", "Bytes de íntegras baixados"))
+PROGRESS_EVENTS = REGISTRY.register(Counter(
+    "diario_progress_events_total", "Eventos de progresso por destino (sent/coalesced/dropped)", ["result"]))
+BROWSER_MEMORY = REGISTRY.register(Gauge(
+    "diario_browser_memory_bytes", "RSS do driver do Playwright e do navegador, sem o pool da íntegra (requer psutil)",
+    callback=_browser_memory_bytes))
+
+
+def observe_stage(stage: str, seconds: float):
+    """Observador compatível com DiarioScraper.stage_observers"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def time_stage(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - t0)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def count_retry(operation: str):
+    """Fábrica de callback before_sleep do tenacity que conta novas tentativas"""
+    def _before_sleep(retry_state):
+        RETRIES.inc(operation=operation)
+    return _before_sleep
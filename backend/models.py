@@ -7,6 +7,10 @@ class SearchRequest(BaseModel):
     end_date: str
     terms: List[str]
     categories: List[str] = []
+    orgaos: List[str] = ["68"]  # IDs dos órgãos no Diário Oficial (68 = CET)
+    trace: bool = False  # Grava logs/traces/trace_<run_id>.json com os spans da execução
+    profile: bool = False  # Grava logs/profiles/<run_id>/ com CPU (amostragem) e memória (tracemalloc)
+    integra: bool = False  # Baixa a íntegra (documento SEI) e usa o texto para completar vigência, valor e contratada
 
     @field_validator('terms')
     @classmethod
@@ -14,6 +18,21 @@ class SearchRequest(BaseModel):
         # Remove empty strings and whitespace
         return [t.strip() for t in v if t and t.strip()]
 
+    @field_validator('orgaos')
+    @classmethod
+    def clean_orgaos(cls, v: List[str]) -> List[str]:
+        # Remove vazios/duplicados preservando a ordem; sem órgão, assume CET
+        orgaos = []
+        for o in v:
+            o = str(o).strip()
+            if not o:
+                continue
+            if not o.isdigit():
+                raise ValueError("Órgão deve ser o ID numérico do Diário Oficial (ex: 68)")
+            if o not in orgaos:
+                orgaos.append(o)
+        return orgaos or ["68"]
+
     @field_validator('start_date', 'end_date')
     @classmethod
     def validate_date_format(cls, v: str) -> str:
@@ -41,6 +60,30 @@ class SearchRequest(BaseModel):
             pass # Already caught by field_validator
         return self
 
+class WatchConfig(BaseModel):
+    """Vigia diário: (órgãos, termos) consultados no dia corrente a cada `interval_minutes`"""
+    orgaos: List[str] = ["68"]
+    terms: List[str] = []
+    interval_minutes: int = 30
+    enabled: bool = True
+
+    @field_validator('terms')
+    @classmethod
+    def clean_terms(cls, v: List[str]) -> List[str]:
+        return SearchRequest.clean_terms(v)
+
+    @field_validator('orgaos')
+    @classmethod
+    def clean_orgaos(cls, v: List[str]) -> List[str]:
+        return SearchRequest.clean_orgaos(v)
+
+    @field_validator('interval_minutes')
+    @classmethod
+    def validate_interval(cls, v: int) -> int:
+        if not 5 <= v <= 1440:
+            raise ValueError("Intervalo deve estar entre 5 e 1440 minutos")
+        return v
+
 class SearchResult(BaseModel):
     date: str
     term: str
@@ -61,4 +104,8 @@ class SearchResult(BaseModel):
     opening_date: str = "-"
     amendment_number: str = "" # New
     parent_contract: str = "" # New
-    doc_type: str = "OUTRO" # New: ADITAMENTO, CONTRATO, DIVERSOS, etc.
+    doc_type: str = "OUTRO" # Tipo canônico (classification.py): ADITAMENTO, CONTRATO, DIVERSOS, etc.
+    doc_label: str = "" # Rótulo pronto para exibição (ex.: "ADITAMENTO 070/2025")
+    orgao: str = "68" # ID do órgão publicador (68 = CET)
+    run_id: str = "" # Execução que coletou o resultado (liga ao trace)
+    duplicate_of: str = "" # document_id original quando a matéria é republicação (dedup.py)
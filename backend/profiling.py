@@ -0,0 +1,204 @@
+"""
+Modo de profiling de uma execução: CPU por amostragem + memória (tracemalloc).
+
+Uma thread amostra periodicamente a pilha da thread do event loop (onde
+rodam as corrotinas do scraper) e acumula pilhas colapsadas no formato do
+flamegraph.pl/speedscope. Em cada virada de dia é tirado um snapshot do
+tracemalloc com os maiores alocadores, o crescimento desde o snapshot
+anterior e a contagem de objetos vivos suspeitos (árvores BeautifulSoup,
+ResultRecord). Os relatórios ficam em logs/profiles/<run_id>/.
+"""
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILE = "report.json"
+COLLAPSED_FILE = "cpu_collapsed.txt"
+
+# Tipos cuja contagem de instâncias vivas é registrada em cada snapshot
+WATCHED_TYPES = ("BeautifulSoup", "Tag", "NavigableString", "ResultRecord", "SearchResult", "Page")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _count_live_objects():
+    counts = Counter()
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in WATCHED_TYPES:
+            counts[name] += 1
+    return dict(counts)
+
+
+def _stat_entry(stat):
+    frame = stat.traceback[0]
+    return {"location": f"{frame.filename}:{frame.lineno}", "size_kib": round(stat.size / 1024, 1), "count": stat.count}
+
+
+def _diff_entry(stat):
+    frame = stat.traceback[0]
+    return {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_diff_kib": round(stat.size_diff / 1024, 1),
+        "count_diff": stat.count_diff,
+        "size_kib": round(stat.size / 1024, 1),
+    }
+
+
+class RunProfiler:
+    """Profiler de uma execução; chame start(), snapshot() nas viradas de dia e stop()"""
+
+    def __init__(self, run_id: str, profiles_dir: str, interval: float = 0.005, top: int = 25):
+        self.run_id = run_id
+        self.out_dir = os.path.join(profiles_dir, run_id)
+        self.interval = interval
+        self.top = top
+        self._stacks = Counter()
+        self._samples = 0
+        self._snapshots = []
+        self._prev_snapshot = None
+        self._stop = threading.Event()
+        # Pausa a amostragem durante os snapshots para não contaminar o perfil de CPU
+        self._paused = threading.Event()
+        self._thread = None
+        self._target_tid = None
+        self._owns_tracemalloc = False
+        self._started_at = None
+
+    def start(self):
+        self._target_tid = threading.get_ident()
+        self._started_at = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._owns_tracemalloc = True
+        self._thread = threading.Thread(target=self._sample_loop, name=f"profiler-{self.run_id}", daemon=True)
+        self._thread.start()
+        self.snapshot("inicio")
+        return self
+
+    def _sample_loop(self):
+        own_tid = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_tid)
+            if frame is None or self._paused.is_set() or self._target_tid == own_tid:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+    def snapshot(self, label: str, **extra):
+        """Snapshot de memória; `extra` guarda contexto (ex.: tamanho da lista de resultados)"""
+        self._paused.set()
+        try:
+            self._take_snapshot(label, extra)
+        finally:
+            self._paused.clear()
+
+    def _take_snapshot(self, label, extra):
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        entry = {
+            "label": label,
+            "elapsed_s": round(time.perf_counter() - self._started_at, 3),
+            "traced_kib": round(current / 1024, 1),
+            "peak_kib": round(peak / 1024, 1),
+            "live_objects": _count_live_objects(),
+            "top_allocators": [_stat_entry(s) for s in snap.statistics("lineno")[:self.top]],
+        }
+        if self._prev_snapshot is not None:
+            growth = [s for s in snap.compare_to(self._prev_snapshot, "lineno") if s.size_diff > 0]
+            entry["growth"] = [_diff_entry(s) for s in growth[:self.top]]
+        entry.update(extra)
+        self._snapshots.append(entry)
+        self._prev_snapshot = snap
+
+    def _top_functions(self):
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, n in self._stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += n
+            for f in set(frames):
+                total_counts[f] += n
+        total = max(1, self._samples)
+        return [
+            {"function": f, "self_pct": round(self_counts[f] * 100 / total, 2), "total_pct": round(n * 100 / total, 2)}
+            for f, n in total_counts.most_common(self.top)
+        ], [
+            {"function": f, "self_pct": round(n * 100 / total, 2)}
+            for f, n in self_counts.most_common(self.top)
+        ]
+
+    def stop(self, **extra) -> str:
+        """Encerra a amostragem, tira o snapshot final e grava os relatórios; retorna o diretório"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.snapshot("fim", **extra)
+        except Exception as e:
+            logger.error(f"Erro no snapshot final de memória: {e}")
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+        by_total, by_self = self._top_functions()
+        first, last = self._snapshots[0], self._snapshots[-1]
+        report = {
+            "run_id": self.run_id,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_s": round(time.perf_counter() - self._started_at, 3),
+            "cpu": {
+                "interval_ms": self.interval * 1000,
+                "samples": self._samples,
+                "top_cumulative": by_total,
+                "top_self": by_self,
+                "collapsed_file": COLLAPSED_FILE,
+            },
+            "memory": {
+                "growth_kib": round(last["traced_kib"] - first["traced_kib"], 1),
+                "peak_kib": max(s["peak_kib"] for s in self._snapshots),
+                "snapshots": self._snapshots,
+            },
+        }
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(os.path.join(self.out_dir, COLLAPSED_FILE), "w", encoding="utf-8") as f:
+                for stack, n in self._stacks.most_common():
+                    f.write(f"{stack} {n}\n")
+            with open(os.path.join(self.out_dir, REPORT_FILE), "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            logger.info(f"Profiling salvo em {self.out_dir} ({self._samples} amostras, {len(self._snapshots)} snapshots)")
+        except Exception as e:
+            logger.error(f"Erro ao salvar profiling: {e}")
+        return self.out_dir
+
+
+def list_profiles(profiles_dir: str):
+    """Execuções com relatório de profiling, mais recentes primeiro"""
+    if not os.path.isdir(profiles_dir):
+        return []
+    runs = []
+    for run_id in os.listdir(profiles_dir):
+        path = os.path.join(profiles_dir, run_id, REPORT_FILE)
+        if os.path.exists(path):
+            runs.append({"run_id": run_id, "modified": datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")})
+    return sorted(runs, key=lambda r: r["modified"], reverse=True)
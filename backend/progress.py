@@ -0,0 +1,118 @@
+"""
+Canal de eventos de progresso da coleta.
+
+A coleta publica sem esperar ninguém: log() e update() só guardam o evento e
+retornam. Uma tarefa separada entrega os eventos ao consumidor (o WebSocket)
+em lotes, no máximo `max_rate` lotes por segundo: cada lote é o que estava
+pendente no início do tique, e o que chega durante o envio espera o próximo.
+Mensagens avulsas (início de dia, reciclagem do navegador, conclusão) ficam
+numa fila limitada que descarta as mais antigas; atualizações de progresso
+são condensadas, e entre duas entregas só a mais recente vale. Se o
+consumidor some, o canal fecha e passa a descartar tudo, sem erro para quem
+publica.
+"""
+import asyncio
+import logging
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressChannel:
+    def __init__(self, send, max_rate: float = 4.0, max_messages: int = 100):
+        """`send`: corrotina que recebe cada evento (dict com "type" e "message")"""
+        self._send = send
+        self._interval = 1.0 / max_rate
+        self._messages = deque(maxlen=max_messages)
+        self._latest = None
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self.closed = False
+
+    def start(self) -> "ProgressChannel":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def log(self, message: str):
+        """Mensagem avulsa: nunca condensada, descartada só se a fila encher"""
+        if self.closed:
+            metrics.PROGRESS_EVENTS.inc(result="dropped")
+            return
+        if self._latest is not None:
+            # Mantém a ordem: o progresso anterior sai antes da mensagem
+            self._enqueue(self._latest)
+            self._latest = None
+        self._enqueue({"type": "log", "message": message})
+        self._wake.set()
+
+    def _enqueue(self, event: dict):
+        if len(self._messages) == self._messages.maxlen:
+            metrics.PROGRESS_EVENTS.inc(result="dropped")  # O deque descarta o mais antigo
+        self._messages.append(event)
+
+    def update(self, **fields):
+        """Estado atual da coleta; substitui a atualização ainda não entregue"""
+        if self.closed:
+            metrics.PROGRESS_EVENTS.inc(result="dropped")
+            return
+        if self._latest is not None:
+            metrics.PROGRESS_EVENTS.inc(result="coalesced")
+        self._latest = {"type": "progress", **fields}
+        self._wake.set()
+
+    async def notify(self, message: str):
+        """Para quem espera um callback assíncrono de mensagem (BrowserSession.notify)"""
+        self.log(message)
+
+    async def _run(self):
+        while not (self._stopping or self.closed):
+            await self._wake.wait()
+            self._wake.clear()
+            await self._send_batch()
+            if not self._stopping:
+                await asyncio.sleep(self._interval)
+        # Ao fechar, o que sobrou sai sem esperar os tiques
+        while not self.closed and (self._messages or self._latest is not None):
+            await self._send_batch()
+
+    async def _send_batch(self):
+        """Um lote por tique: as mensagens pendentes e, por último, o progresso mais recente"""
+        batch = list(self._messages)
+        self._messages.clear()
+        if self._latest is not None:
+            batch.append(self._latest)
+            self._latest = None
+        for i, event in enumerate(batch):
+            try:
+                await self._send(event)
+            except Exception as e:
+                logger.debug(f"Consumidor de progresso indisponível, eventos descartados: {e}")
+                metrics.PROGRESS_EVENTS.inc(len(batch) - i, result="dropped")
+                self._discard()
+                return
+            metrics.PROGRESS_EVENTS.inc(result="sent")
+
+    def _discard(self):
+        self.closed = True
+        pending = len(self._messages) + (self._latest is not None)
+        if pending:
+            metrics.PROGRESS_EVENTS.inc(pending, result="dropped")
+        self._messages.clear()
+        self._latest = None
+
+    async def close(self, timeout: float = 5.0):
+        """Entrega o que ficou pendente (até `timeout` segundos) e encerra a tarefa de envio"""
+        if self._task is None:
+            self._discard()
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._discard()
@@ -0,0 +1,43 @@
+"""
+Registro interno de resultado.
+
+Dentro do sistema (extração, ResultStore, WebSocket, relatórios, modo vigia)
+cada publicação é um ResultRecord: dataclass com __slots__, sem validação e
+sem __dict__ por instância. O SearchResult (pydantic) fica só nas bordas: o
+que entra pela API é validado por ele e o que sai pela API é convertido nele
+pelo próprio FastAPI (response_model). Os campos são gerados a partir do
+SearchResult, então os dois nunca divergem.
+"""
+from dataclasses import field, make_dataclass
+from typing import Iterable, Optional
+
+from models import SearchResult
+
+FIELDS = list(SearchResult.model_fields)
+
+ResultRecord = make_dataclass(
+    "ResultRecord",
+    [
+        (name, str) if info.is_required() else (name, str, field(default=info.default))
+        for name, info in SearchResult.model_fields.items()
+    ],
+    slots=True,
+    kw_only=True,
+)
+ResultRecord.__doc__ = "Resultado de uma publicação (mesmos campos do SearchResult, sem validação)"
+ResultRecord.__module__ = __name__
+
+
+def to_dict(record, include: Optional[Iterable[str]] = None) -> dict:
+    """Campos do registro (ou só os de `include`) num dict raso, sem as cópias profundas de dataclasses.asdict"""
+    return {name: getattr(record, name) for name in (include or FIELDS)}
+
+
+def document_key(document_id: str, link_html: str) -> str:
+    """Identificação estável da publicação: o número do documento ou, sem número na listagem ("S/N"), o link da matéria"""
+    return document_id if document_id and document_id != "S/N" else link_html
+
+
+def to_model(record) -> SearchResult:
+    """Conversão validada para a borda da API"""
+    return SearchResult(**to_dict(record))
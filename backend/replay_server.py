@@ -0,0 +1,252 @@
+"""
+Servidor local que imita o Diário Oficial para benchmarks e testes offline.
+
+Reproduz a página de pesquisa, as listagens por data/órgão e as páginas de
+matéria a partir dos HTMLs gravados em logs/ (pregao_debug.html e
+debug_html_*.html), com injeção configurável de latência, erros HTTP e
+timeouts. Uso:
+
+    python replay_server.py --port 8090 --latency 50 --error-rate 0.05
+
+e depois rode o scraper com DIARIO_SITE_URL=http://127.0.0.1:8090.
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+LOGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+# Remove scripts e recursos externos para que a réplica não dependa de rede
+_RE_SCRIPT = re.compile(r'<script\b.*?</script>', re.IGNORECASE | re.DOTALL)
+_RE_EXTERNAL_LINK = re.compile(r'<link\b[^>]*href="https?://[^"]*"[^>]*>', re.IGNORECASE)
+_RE_RESULTS_DIV = re.compile(r'(<div[^>]*class="[^"]*resultadobusca[^"]*"[^>]*>)', re.IGNORECASE)
+_RE_DOC_ID = re.compile(r'Documento:\s*(\d+)')
+
+NO_RESULTS_HTML = '<div class="mensagem">Nenhum registro encontrado.</div>'
+
+
+@dataclass
+class ReplayConfig:
+    """Parâmetros de injeção de falhas e volume da réplica"""
+    latency_ms: float = 0.0        # Latência média por requisição
+    jitter_ms: float = 0.0         # Variação uniforme somada à latência
+    error_rate: float = 0.0        # Fração de respostas HTTP 500
+    timeout_rate: float = 0.0      # Fração de requisições que ficam penduradas
+    hang_s: float = 35.0           # Tempo "pendurado" (acima do timeout do scraper)
+    docs_per_day: int = 20         # Matérias por (data, órgão)
+    empty_weekends: bool = True    # Sábados/domingos sem publicações
+    seed: int = 42
+
+
+def _sanitize(html: str) -> str:
+    html = _RE_SCRIPT.sub("", html)
+    return _RE_EXTERNAL_LINK.sub("", html)
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+class ReplayCorpus:
+    """Páginas gravadas usadas como modelo para listagens e matérias"""
+
+    def __init__(self, logs_dir: str = LOGS_DIR):
+        search_pages = sorted(glob.glob(os.path.join(logs_dir, "debug_html_*.html")))
+        detail_pages = [p for p in [os.path.join(logs_dir, "pregao_debug.html")] if os.path.exists(p)]
+        detail_pages += sorted(glob.glob(os.path.join(logs_dir, "detail_*.html")))
+        if not search_pages or not detail_pages:
+            raise FileNotFoundError(f"Páginas gravadas não encontradas em {logs_dir}")
+
+        self.search_page = _sanitize(_read(search_pages[0]))
+        self.details = []
+        for path in detail_pages:
+            html = _sanitize(_read(path))
+            m = _RE_DOC_ID.search(html)
+            title = re.search(r'<title>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
+            self.details.append({
+                "html": html,
+                "doc_id": m.group(1) if m else "0",
+                "title": title.group(1).strip() if title else "Matéria",
+            })
+
+    def listing_entries(self, date: str, orgao: str, count: int):
+        """Gera entradas determinísticas (doc_id, modelo) para uma data/órgão"""
+        digest = hashlib.sha1(f"{date}|{orgao}".encode()).hexdigest()
+        base_id = 100000000 + int(digest[:7], 16) % 50000000
+        return [(str(base_id + i), self.details[i % len(self.details)]) for i in range(count)]
+
+    def render_listing(self, date: str, orgao: str, count: int) -> str:
+        if count <= 0:
+            body = NO_RESULTS_HTML
+        else:
+            blocks = []
+            for doc_id, tpl in self.listing_entries(date, orgao, count):
+                blocks.append(
+                    f'<div class="dadosDocumento"><p><b>{tpl["title"].replace(tpl["doc_id"], doc_id)}</b></p>'
+                    f'<p>Documento: {doc_id} | Publicação: {date} | Processo: 7410.2025/{doc_id[-7:]}-0</p>'
+                    f'<a href="md_epubli_visualizar.php?doc={doc_id}&orgao={orgao}">Visualizar</a></div>'
+                )
+            body = "\n".join(blocks)
+        if _RE_RESULTS_DIV.search(self.search_page):
+            return _RE_RESULTS_DIV.sub(lambda m: m.group(1) + body, self.search_page, count=1)
+        return self.search_page.replace("</body>", body + "</body>")
+
+    def render_detail(self, doc_id: str) -> str:
+        tpl = self.details[int(doc_id) % len(self.details)] if doc_id.isdigit() else self.details[0]
+        return tpl["html"].replace(tpl["doc_id"], doc_id)
+
+
+class ReplayServer:
+    """Servidor HTTP em thread própria; use como context manager"""
+
+    def __init__(self, config: ReplayConfig = None, host: str = "127.0.0.1", port: int = 0, logs_dir: str = LOGS_DIR):
+        self.config = config or ReplayConfig()
+        self.corpus = ReplayCorpus(logs_dir)
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors_injected": 0, "timeouts_injected": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _roll(self):
+        with self._rng_lock:
+            return self._rng.random(), self._rng.random()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                logger.debug("replay: " + fmt, *args)
+
+            def _inject(self) -> bool:
+                """Aplica latência/falhas; retorna False se a resposta já foi tratada"""
+                cfg = server.config
+                server.stats["requests"] += 1
+                r_fail, r_jitter = server._roll()
+                delay = (cfg.latency_ms + r_jitter * cfg.jitter_ms) / 1000.0
+                if delay > 0:
+                    time.sleep(delay)
+                if r_fail < cfg.timeout_rate:
+                    server.stats["timeouts_injected"] += 1
+                    time.sleep(cfg.hang_s)
+                    return False
+                if r_fail < cfg.timeout_rate + cfg.error_rate:
+                    server.stats["errors_injected"] += 1
+                    self.send_error(500, "Erro injetado pelo replay_server")
+                    return False
+                return True
+
+            def _send_html(self, html: str):
+                body = html.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path.endswith("md_epubli_visualizar.php"):
+                    if not self._inject():
+                        return
+                    doc_id = parse_qs(parsed.query).get("doc", ["0"])[0]
+                    self._send_html(server.corpus.render_detail(doc_id))
+                elif parsed.path.endswith("md_epubli_controlador.php"):
+                    if not self._inject():
+                        return
+                    self._send_html(server.corpus.search_page)
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                if not parsed.path.endswith("md_epubli_controlador.php"):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(length).decode("latin-1"))
+                if not self._inject():
+                    return
+                date = form.get("hdnDataPublicacao", [""])[0]
+                orgao = form.get("hdnOrgaoFiltro", [""])[0]
+                self._send_html(server.corpus.render_listing(date, orgao, server.docs_for(date)))
+
+        return Handler
+
+    def docs_for(self, date: str) -> int:
+        if self.config.empty_weekends:
+            try:
+                d, m, y = (int(x) for x in date.split("/"))
+                if time.strptime(f"{y}-{m}-{d}", "%Y-%m-%d").tm_wday >= 5:
+                    return 0
+            except ValueError:
+                return 0
+        return self.config.docs_per_day
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Replay do Diário Oficial em {self.url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réplica offline do Diário Oficial")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="latência média (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variação da latência (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hang", type=float, default=35.0, help="duração dos timeouts injetados (s)")
+    parser.add_argument("--docs-per-day", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = ReplayConfig(
+        latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, hang_s=args.hang, docs_per_day=args.docs_per_day, seed=args.seed,
+    )
+    server = ReplayServer(config, host=args.host, port=args.port)
+    print(f"Replay rodando em {server.url} (Ctrl+C para sair)")
+    print(f"Use: DIARIO_SITE_URL={server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
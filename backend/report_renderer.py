@@ -0,0 +1,238 @@
+"""
+Renderização em streaming do relatório HTML do DiarioFormatter.
+
+Os templates dos cards (campos no formato {nome}) são compilados uma única
+vez, no import, em funções com f-string — bem mais rápidas que str.format,
+que reinterpreta o template a cada card. Os cards são gerados um a um: o
+relatório pode ir direto para um arquivo ou para uma resposta HTTP sem
+montar a string inteira em memória, e cada card só roda as extrações que o
+seu template usa.
+"""
+import string
+from typing import Callable, Iterable, Iterator
+
+from classification import normalize_number
+from models import SearchResult
+
+DOCUMENT_HEAD = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Resultados - Diário Oficial</title>
+</head>
+<body>
+    """
+DOCUMENT_TAIL = """
+</body>
+</html>"""
+
+EXTRA_CSS = """
+        .pedido-compra { border-left: 5px solid #2196F3; background-color: #fbfdff; }
+        .destaque { border: 2px solid #ffc107; box-shadow: 0 4px 8px rgba(0,0,0,0.15); }
+        """
+TITLE = "\n<h2>📋 RESULTADOS - DIÁRIO OFICIAL</h2>\n"
+EMPTY = "<p>❌ Nenhum dado coletado.</p>"
+
+TEMPLATES = {
+    "aditamento": """<div class="card aditamento">
+        • <span class="label">Processo SEI:</span> <span class="val">{process_number}</span><br>
+        Aditamento nº <a href="{link_pdf}">{num_adit}</a> ao Contrato nº {num_orig}<br>
+        <span class="label">Contratada:</span> <span class="val">{contratada}</span><br>
+        <span class="label">Modalidade:</span> <span class="val">{modalidade}</span><br>
+        <span class="label">Objeto:</span> <span class="val">{object_text}</span><br>
+        <span class="label">Data da Assinatura:</span> <span class="val">{date}</span><br>
+        <span class="label">Data da Publicação:</span> <span class="val">{date}</span><br>
+        <span class="label">Vigência:</span> <span class="val">{vigencia}</span><br>
+        <span class="label">Valor:</span> <span class="val">{valor}</span>
+        </div>""",
+    "contrato": """<div class="card contrato">
+        • <span class="label">Processo SEI:</span> <span class="val">{process_number}</span><br>
+        Contrato nº <a href="{link_pdf}">{num_con}</a> - {contratada}<br>
+        <span class="label">Objeto:</span> <span class="val">{object_text}</span><br>
+        <span class="label">Data da Assinatura:</span> <span class="val">{date}</span><br>
+        <span class="label">Data da Publicação:</span> <span class="val">{date}</span><br>
+        <span class="label">Valor:</span> <span class="val">{valor}</span>
+        </div>""",
+    "licitacao": """<div class="card compra">
+        <span class="label">Número do Processo:</span> <span class="val">{process_number}</span><br>
+        <span class="label">Número da Publicação:</span> <a href="{link_pdf}">{modalidade} {num_pub}</a><br>
+        <span class="label">Documento:</span> <a href="{link_html}">{document_id}</a><br>
+        <span class="label">Licitante Vencedor:</span> <span class="val">{vencedor}</span><br>
+        <span class="label">Modalidade:</span> <span class="val">{modalidade}</span><br>
+        <span class="label">Data da Abertura:</span> <span class="val">{data_abertura}</span><br>
+        <span class="label">Objeto:</span> <span class="val">{object_text}</span><br>
+        <span class="label">Data de Publicação:</span> <span class="val">{date}</span>
+        </div>""",
+    "pedido_compra": """<div class="card pedido-compra">
+        <div style="background-color: #e3f2fd; padding: 5px; border-bottom: 1px solid #ddd; margin-bottom: 10px;">
+            <strong>🛒 PEDIDO DE COMPRA / DISPENSA</strong>
+        </div>
+        • <span class="label">Processo SEI:</span> <span class="val">{process_number}</span><br>
+        <span class="label">Contratada:</span> <span class="val">{contratada}</span><br>
+        <span class="label">Objeto:</span> <span class="val">{object_text}</span><br>
+        <span class="label">Data da Assinatura:</span> <span class="val">{validity_start}</span><br>
+        <span class="label">Data da Publicação:</span> <span class="val">{date}</span><br>
+        <span class="label">Valor:</span> <span class="val">{value}</span><br>
+        </div>""",
+    "acordo_cooperacao": """<div class="card parceria">
+        <div style="background-color: #e8f5e9; padding: 5px; border-bottom: 1px solid #ddd; margin-bottom: 10px;">
+            <strong>🤝 ACORDO DE COOPERAÇÃO</strong>
+        </div>
+        <p><strong>Número do processo: </strong> <a href="{link_html}" target="_blank">{process_number}</a></p>
+        <p><strong>Número do termo: </strong> ACORDO DE COOPERAÇÃO <a href="{link_pdf}" target="_blank">{formatted_num}</a></p>
+        <p><strong>Nome do órgão/instituição: </strong> {orgao_completo}</p>
+        <p><strong>Objeto: </strong> {object_text}</p>
+        <p><strong>Data da Assinatura: </strong> {vig_inicio}</p>
+        <p><strong>Data da Publicação: </strong> {date}</p>
+        <p><strong>Vigência: </strong> de {vig_inicio} a {vig_fim}</p>
+        </div>""",
+    "destaque": """<div class="card destaque">
+        <div style="background-color: #fff3cd; color: #856404; padding: 10px; border-bottom: 2px solid #ffeeba; margin-bottom: 10px; font-size: 1.1em;">
+            <strong>🏆 RESULTADO DE LICITAÇÃO / HOMOLOGAÇÃO</strong>
+        </div>
+        <span class="label">Processo:</span> <span class="val">{process_number}</span><br>
+        <span class="label">Vencedor:</span> <span class="val" style="font-size: 1.1em; color: #000;">{contractor}</span><br>
+        <span class="label">CNPJ/CPF:</span> <span class="val">{doc}</span><br>
+        <hr style="border: 0; border-top: 1px solid #eee;">
+        <span class="label">Objeto:</span> <span class="val">{object_text}</span><br>
+        <span class="label">Data de Publicação:</span> <span class="val">{date}</span><br>
+        <div style="margin-top: 10px; text-align: right;">
+             <a href="{link_pdf}" class="btn" style="background-color: #28a745; color: white; padding: 5px 10px; border-radius: 4px;">Abrir Documento 📄</a>
+        </div>
+        </div>""",
+    "outros": """<div class="card">
+                <span class="label">Processo:</span> {process_number}<br>
+                <span class="label">Documento:</span> <a href="{link_html}">{document_id}</a><br>
+                <span class="label">Objeto:</span> {object_text}<br>
+                <span class="label">Data:</span> {date}
+                </div>""",
+}
+
+
+
+def compile_template(name: str, template: str) -> Callable[..., str]:
+    """Converte um template {campo} numa função render(**campos) baseada em f-string"""
+    literal_parts, fields = [], []
+    for literal, field, _spec, _conv in string.Formatter().parse(template):
+        literal_parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            literal_parts.append("{" + field + "}")
+            if field not in fields:
+                fields.append(field)
+    source = f"def render({', '.join(fields)}, **_):\n    return f{''.join(literal_parts)!r}\n"
+    namespace = {}
+    exec(compile(source, f"<template {name}>", "exec"), namespace)
+    return namespace["render"]
+
+
+COMPILED = {name: compile_template(name, tpl) for name, tpl in TEMPLATES.items()}
+
+# Tipo canônico (classification.py, definido na extração) -> card
+_DOC_TYPE_CARDS = {
+    "ADITAMENTO": "aditamento", "APOSTILAMENTO": "aditamento",
+    "CONTRATO": "contrato", "EMPENHO": "contrato",
+    "PREGAO": "licitacao",
+    "PEDIDO_COMPRA": "pedido_compra", "HOMOLOGACAO": "destaque", "ACORDO_COOPERACAO": "acordo_cooperacao",
+}
+# Publicações irrelevantes ficam fora do relatório
+_SKIPPED_DOC_TYPES = {"DIVERSOS"}
+
+# Tamanho do buffer de escrita em disco
+WRITE_BUFFER = 64 * 1024
+
+
+class ReportRenderer:
+    def __init__(self, formatter=None):
+        if formatter is None:
+            from formatter import DiarioFormatter
+            formatter = DiarioFormatter()
+        self.fmt = formatter
+
+    def card_kind(self, r: SearchResult) -> str:
+        return _DOC_TYPE_CARDS.get(r.doc_type, "outros")
+
+    def _contratada(self, r: SearchResult, doc_source: str) -> str:
+        if r.contractor and r.contractor != "-":
+            return f"{r.contractor}, CNPJ/CPF {self.fmt.anonimizar_cpf(doc_source or '')}"
+        return "Ver íntegra"
+
+    def card_fields(self, r: SearchResult, kind: str) -> dict:
+        """Campos do template; cada tipo de card só executa as extrações que usa"""
+        fmt = self.fmt
+        fields = {
+            "process_number": r.process_number, "document_id": r.document_id, "object_text": r.object_text,
+            "date": r.date, "link_html": r.link_html, "link_pdf": r.link_pdf,
+        }
+        if kind == "aditamento":
+            # Números extraídos do texto completo na classificação; a síntese truncada é só o fallback
+            # Mantém o comportamento original: o documento anonimizado vem de r.value
+            fields.update(
+                num_adit=normalize_number(r.amendment_number) if r.amendment_number else fmt.extrair_numero_aditamento(r.summary),
+                num_orig=r.parent_contract or fmt.extrair_numero_contrato_origem(r.summary),
+                contratada=self._contratada(r, r.value), modalidade=fmt.extrair_modalidade(r.summary),
+                vigencia=fmt.extrair_vigencia(r.summary), valor=r.value if r.value != '-' else 'Ver íntegra',
+            )
+        elif kind == "contrato":
+            fields.update(
+                num_con=fmt.extrair_numero_contrato_origem(r.summary), contratada=self._contratada(r, r.value),
+                valor=r.value if r.value != '-' else 'Ver íntegra',
+            )
+        elif kind == "licitacao":
+            fields.update(
+                modalidade=fmt.extrair_modalidade(r.summary), num_pub=fmt.extrair_numero_licitacao(r.summary, r.document_id),
+                vencedor=fmt.extrair_vencedor(r.summary), data_abertura=fmt.extrair_data_abertura(r.summary),
+            )
+        elif kind == "pedido_compra":
+            fields.update(contratada=self._contratada(r, r.company_doc), validity_start=r.validity_start, value=r.value)
+        elif kind == "acordo_cooperacao":
+            formatted_num = r.contract_number if r.contract_number else "S/N"
+            if formatted_num != "S/N" and "/" in formatted_num:
+                parts = formatted_num.split("/")
+                nnn = parts[0].zfill(3)
+                aaaa = parts[1]
+                if len(aaaa) == 2 and int(aaaa) > 10:
+                    aaaa = "20" + aaaa
+                formatted_num = f"{nnn}/{aaaa}"
+            orgao_completo = r.contractor if r.contractor else "-"
+            if r.company_doc and r.company_doc != "-":
+                orgao_completo += f", CNPJ nº {r.company_doc}"
+            fields.update(
+                formatted_num=formatted_num, orgao_completo=orgao_completo,
+                vig_inicio=r.validity_start if r.validity_start else "-", vig_fim=r.validity_end if r.validity_end else "-",
+            )
+        elif kind == "destaque":
+            fields.update(contractor=r.contractor, doc=fmt.anonimizar_cpf(r.company_doc if r.company_doc else ""))
+        return fields
+
+    def render_card(self, r: SearchResult, kind: str = None) -> str:
+        kind = kind or self.card_kind(r)
+        return COMPILED[kind](**self.card_fields(r, kind))
+
+    def iter_cards(self, results: Iterable[SearchResult]) -> Iterator[str]:
+        """Cabeçalho (CSS + título) e um chunk por card; aceita qualquer iterável, inclusive geradores"""
+        empty = True
+        emitted = set()
+        for r in results:
+            if empty:
+                yield self.fmt.css.replace("</style>", EXTRA_CSS + "</style>", 1) + TITLE
+                empty = False
+            # Republicação cujo original já está no relatório não ganha outro card
+            if r.doc_type in _SKIPPED_DOC_TYPES or (r.duplicate_of and r.duplicate_of in emitted):
+                continue
+            emitted.add(r.document_id)
+            yield self.render_card(r)
+        if empty:
+            yield EMPTY
+
+    def iter_document(self, results: Iterable[SearchResult]) -> Iterator[str]:
+        """Documento HTML completo, em chunks"""
+        yield DOCUMENT_HEAD
+        yield from self.iter_cards(results)
+        yield DOCUMENT_TAIL
+
+    def write(self, results: Iterable[SearchResult], filename: str) -> str:
+        with open(filename, "w", encoding="utf-8", buffering=WRITE_BUFFER) as f:
+            for chunk in self.iter_document(results):
+                f.write(chunk)
+        return filename
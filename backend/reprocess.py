@@ -0,0 +1,121 @@
+"""
+Reextração offline dos resultados a partir do arquivo de páginas (logs/archive).
+
+Ao mudar as regras de extração (e incrementar EXTRACTOR_VERSION em
+scraper_service.py), este script roda o extract_details atual sobre as
+matérias arquivadas cujo resultado foi gerado por uma versão anterior e
+regrava os campos no results.db, sem acessar o site. As páginas são lidas do
+arquivo (mmap) no processo principal e extraídas num pool de processos; o
+texto da íntegra vem do cache do integra_pipeline, e a resposta da IA
+guardada no dedup.db é reaplicada como na coleta, sem nova chamada.
+
+    python reprocess.py               # só documentos com extrator desatualizado
+    python reprocess.py --all         # todos os documentos arquivados
+    python reprocess.py --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+from html_archive import decompress
+from integra_pipeline import IntegraPipeline
+from result_store import ResultStore
+from scraper_service import DiarioScraper, EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+_worker = None  # (DiarioScraper, IntegraPipeline | None) de cada processo do pool
+
+
+def _init_worker(integra_dir: str):
+    global _worker
+    logging.basicConfig(level=logging.ERROR)
+    integra = IntegraPipeline(integra_dir) if os.path.isdir(integra_dir) else None
+    _worker = (DiarioScraper(), integra)
+
+
+def reextract(job):
+    """(chave, url, página comprimida) -> (details, link_pdf), ou None se a extração falhar"""
+    key, url, raw = job
+    scraper, integra = _worker
+    try:
+        soup = BeautifulSoup(decompress(raw), 'html.parser')
+        details = scraper.extract_details(soup)
+        link_pdf = scraper._integra_link(soup, details, url)
+        soup.decompose()
+        if integra is not None and link_pdf != url:
+            text = integra.cached_text(link_pdf)
+            if text:
+                scraper.merge_integra_text(details, text)
+        details.pop('integra_texto', None)  # Só serve ao prompt da IA; não volta para o processo principal
+        return details, link_pdf
+    except Exception as e:
+        logger.error(f"Falha ao reextrair {key}: {e}")
+        return None
+
+
+def reprocess(scraper: DiarioScraper = None, workers: int = None, force: bool = False, batch_size: int = BATCH_SIZE) -> dict:
+    """Reextrai os documentos desatualizados (ou todos, com force) e regrava no results.db"""
+    scraper = scraper or DiarioScraper()
+    archive = scraper.archive
+    store = ResultStore(os.path.join(scraper.logs_dir, "results.db"))
+    jobs = archive.stale(EXTRACTOR_VERSION + 1 if force else EXTRACTOR_VERSION)
+    stats = {"documents": len(jobs), "reextracted": 0, "errors": 0, "ai_reapplied": 0, "rows_updated": 0}
+    if not jobs:
+        return stats
+
+    t0 = time.perf_counter()
+    integra_dir = os.path.join(scraper.logs_dir, "integra")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(integra_dir,)) as pool:
+            for start in range(0, len(jobs), batch_size):
+                batch = [(key, url, archive.raw(key)) for key, url in jobs[start:start + batch_size]]
+                by_id, by_link, done = {}, {}, []
+                for (key, _, _), result in zip(batch, pool.map(reextract, batch, chunksize=16)):
+                    if result is None:
+                        stats["errors"] += 1
+                        continue
+                    details, link_pdf = result
+                    # "doc:<id>" ou, para documentos sem número, "url:<link da matéria>" (sem IA própria guardada)
+                    kind, ident = key.split(":", 1)
+                    ai_data = scraper.dedup.ai_fields(ident) if kind == "doc" else None
+                    if ai_data:
+                        scraper.apply_ai_data(details, ai_data)
+                        stats["ai_reapplied"] += 1
+                    target = by_id if kind == "doc" else by_link
+                    target[ident] = {**scraper.detail_fields(details), "link_pdf": link_pdf}
+                    done.append(key)
+                stats["rows_updated"] += store.update_documents(by_id)
+                stats["rows_updated"] += store.update_documents(by_link, key_column="link_html")
+                archive.mark(done, EXTRACTOR_VERSION)
+                stats["reextracted"] += len(done)
+                logger.info(f"Reextraídos {stats['reextracted']} de {len(jobs)} documentos")
+    finally:
+        archive.close()
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reextração offline a partir do arquivo de páginas")
+    parser.add_argument("--all", action="store_true", help="reextrai todos os documentos, não só os desatualizados")
+    parser.add_argument("--workers", type=int, default=None, help="processos de extração (padrão: núcleos da CPU)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    stats = reprocess(workers=args.workers, force=args.all)
+    print(f"Extrator v{EXTRACTOR_VERSION}: {stats['reextracted']} de {stats['documents']} documentos reextraídos "
+          f"({stats['errors']} erros, IA reaplicada em {stats['ai_reapplied']}), "
+          f"{stats['rows_updated']} linhas atualizadas em {stats.get('seconds', 0)}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Armazenamento dos resultados por execução (SQLite em logs/results.db).
+
+Cada execução grava seus ResultRecord com o run_id; as exportações leem
+daqui em lotes (fetchmany), sem montar o conjunto inteiro em memória. As
+colunas seguem os campos do SearchResult: campos novos no modelo viram
+colunas novas na próxima abertura do banco.
+
+A tabela contract_index liga cada contrato (número normalizado por
+classification.contract_key) aos seus aditamentos e apostilamentos, e o
+processo SEI liga o contrato ao pregão/homologação de origem. É mantida a
+cada gravação, então o histórico de um contrato sai de consultas indexadas,
+sem varrer os resultados.
+
+A tabela validity guarda a vigência de cada documento (a coleta mais
+recente) em datas ISO, indexada pelo fim e por contrato: "vencendo nos
+próximos N dias" e "vigentes na data X" são buscas por faixa no índice.
+
+A tabela facts (também uma linha por documento, como a validity) tem as colunas tipadas que
+os agregados de gasto usam; ver analytics.py.
+"""
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import analytics
+import classification
+import records
+from records import ResultRecord
+
+logger = logging.getLogger(__name__)
+
+FIELDS = records.FIELDS
+
+# doc_type -> papel na linhagem do contrato
+_CONTRACT_ROLES = {"CONTRATO": "contrato", "EMPENHO": "contrato", "ADITAMENTO": "aditamento", "APOSTILAMENTO": "apostilamento"}
+_ORIGIN_TYPES = {"PREGAO", "HOMOLOGACAO", "PEDIDO_COMPRA"}
+# document_id de quem não tem número na listagem (scraper_service)
+_NO_ID = ("", "S/N")
+
+
+def _iso_date(value: str) -> str:
+    """DD/MM/AAAA (ou já AAAA-MM-DD, como a IA às vezes devolve) -> AAAA-MM-DD ordenável; vazio se não for data"""
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime((value or "").strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return ""
+
+
+def _lineage_key(doc_type, contract_number, parent_contract) -> str:
+    """Contrato ao qual o documento pertence (o próprio, ou o pai de um aditamento/apostilamento)"""
+    role = _CONTRACT_ROLES.get(doc_type)
+    if not role:
+        return ""
+    return classification.contract_key(parent_contract if role != "contrato" else contract_number)
+
+
+def _index_entry(run_id, seq, doc_type, contract_number, parent_contract, process_number):
+    """Linha do contract_index para um resultado, ou None se ele não entra na linhagem"""
+    process = (process_number or "").strip()
+    if process in ("N/A", "-"):
+        process = ""
+    role = _CONTRACT_ROLES.get(doc_type)
+    if role:
+        key = _lineage_key(doc_type, contract_number, parent_contract)
+        if key or process:
+            return (key, process, role, run_id, seq)
+    elif doc_type in _ORIGIN_TYPES and process:
+        return ("", process, "origem", run_id, seq)
+    return None
+
+
+def _doc_key(document_id, run_id, seq) -> str:
+    """Chave de "uma linha por documento": o próprio id, ou o id + execução/posição quando a listagem
+    não trouxe número (todos viriam "S/N" e a coleta mais recente de um apagaria os outros)"""
+    if document_id and document_id not in _NO_ID:
+        return document_id
+    return f"{document_id}@{run_id}:{seq}"
+
+
+def _validity_entry(run_id, seq, document_id, doc_type, contract_number, parent_contract, validity_start, validity_end):
+    """Linha da tabela validity, ou None sem data de fim reconhecível"""
+    end_iso = _iso_date(validity_end)
+    if not end_iso:
+        return None
+    return (_doc_key(document_id, run_id, seq), _lineage_key(doc_type, contract_number, parent_contract), _iso_date(validity_start), end_iso, run_id, seq)
+
+
+def _fact_entry(run_id, seq, document_id, date, doc_type, modality, contractor, company_doc, value):
+    date_iso = _iso_date(date)
+    return (_doc_key(document_id, run_id, seq), run_id, seq, date_iso, date_iso[:7], doc_type or "", (modality or "").strip("- "),
+            contractor if contractor not in ("-", None) else "", analytics.contractor_key(contractor, company_doc),
+            analytics.parse_value_cents(value))
+
+
+class ResultStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()  # Serializa as gravações
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, created_at TEXT, start_date TEXT, end_date TEXT, total INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS results (run_id TEXT NOT NULL, seq INTEGER NOT NULL, date_iso TEXT, PRIMARY KEY (run_id, seq))")
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+            for field in FIELDS:
+                if field not in existing:
+                    conn.execute(f'ALTER TABLE results ADD COLUMN "{field}" TEXT')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_run_date ON results (run_id, date_iso)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_document ON results (document_id)")
+            has_index = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contract_index'").fetchone()
+            conn.execute("CREATE TABLE IF NOT EXISTS contract_index (contract_key TEXT, process TEXT, role TEXT, run_id TEXT, seq INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_contract_key ON contract_index (contract_key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_contract_process ON contract_index (process, role)")
+            if not has_index:
+                # Banco anterior ao índice: monta a partir dos resultados já gravados (uma vez)
+                rows = conn.execute("SELECT run_id, seq, doc_type, contract_number, parent_contract, process_number FROM results")
+                conn.executemany("INSERT INTO contract_index VALUES (?, ?, ?, ?, ?)",
+                                 (e for run_id, seq, *fields in rows if (e := _index_entry(run_id, seq, *fields))))
+            has_validity = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'validity'").fetchone()
+            conn.execute("CREATE TABLE IF NOT EXISTS validity (document_id TEXT PRIMARY KEY, contract_key TEXT, "
+                         "start_iso TEXT, end_iso TEXT, run_id TEXT, seq INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_validity_end ON validity (end_iso)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_validity_contract ON validity (contract_key, end_iso)")
+            if has_validity and conn.execute("SELECT 1 FROM validity WHERE document_id IN ('', 'S/N') LIMIT 1").fetchone():
+                # Banco gravado antes de _doc_key: os documentos sem número estavam numa linha só
+                conn.execute("DELETE FROM validity")
+                has_validity = False
+            if not has_validity:
+                rows = conn.execute("SELECT run_id, seq, document_id, doc_type, contract_number, parent_contract, validity_start, validity_end "
+                                    "FROM results ORDER BY run_id")
+                conn.executemany("INSERT OR REPLACE INTO validity VALUES (?, ?, ?, ?, ?, ?)",
+                                 (e for fields in rows if (e := _validity_entry(*fields))))
+            has_facts = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'facts'").fetchone()
+            conn.execute("CREATE TABLE IF NOT EXISTS facts (document_id TEXT PRIMARY KEY, run_id TEXT, seq INTEGER, date_iso TEXT, "
+                         "month TEXT, doc_type TEXT, modality TEXT, contractor TEXT, contractor_key TEXT, value_cents INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_facts_date ON facts (date_iso)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_facts_contractor ON facts (contractor_key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_facts_run ON facts (run_id)")
+            if has_facts and conn.execute("SELECT 1 FROM facts WHERE document_id IN ('', 'S/N') LIMIT 1").fetchone():
+                # Mesma correção da validity: documentos sem número voltam a ter uma linha cada
+                conn.execute("DELETE FROM facts")
+                has_facts = False
+            if not has_facts:
+                rows = conn.execute("SELECT run_id, seq, document_id, date, doc_type, modality, contractor, company_doc, value "
+                                    "FROM results ORDER BY run_id")
+                conn.executemany("INSERT OR REPLACE INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (_fact_entry(*fields) for fields in rows))
+
+    def _connect(self):
+        # Leituras em streaming podem continuar em outra thread do pool entre um lote e outro
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def save(self, run_id: str, results: Iterable[ResultRecord], start_date: str = "", end_date: str = "") -> int:
+        """Grava (ou regrava) os resultados de uma execução; retorna a quantidade"""
+        columns = ", ".join(f'"{f}"' for f in FIELDS)
+        placeholders = ", ".join("?" for _ in FIELDS)
+        results = list(results)
+        rows = (
+            (run_id, seq, _iso_date(r.date), *(str(getattr(r, f)) for f in FIELDS))
+            for seq, r in enumerate(results)
+        )
+        entries = [
+            e for seq, r in enumerate(results)
+            if (e := _index_entry(run_id, seq, r.doc_type, r.contract_number, r.parent_contract, r.process_number))
+        ]
+        validity = [
+            e for seq, r in enumerate(results)
+            if (e := _validity_entry(run_id, seq, r.document_id, r.doc_type, r.contract_number, r.parent_contract, r.validity_start, r.validity_end))
+        ]
+        facts = [
+            _fact_entry(run_id, seq, r.document_id, r.date, r.doc_type, r.modality, r.contractor, r.company_doc, r.value)
+            for seq, r in enumerate(results)
+        ]
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM contract_index WHERE run_id = ?", (run_id,))
+            # Linhas de documentos sem número apontam para (run_id, seq) desta execução: são refeitas abaixo
+            conn.execute("DELETE FROM validity WHERE run_id = ? AND document_id LIKE '%@%'", (run_id,))
+            conn.execute("DELETE FROM facts WHERE run_id = ? AND document_id LIKE '%@%'", (run_id,))
+            cur = conn.executemany(f"INSERT INTO results (run_id, seq, date_iso, {columns}) VALUES (?, ?, ?, {placeholders})", rows)
+            total = cur.rowcount
+            conn.executemany("INSERT INTO contract_index VALUES (?, ?, ?, ?, ?)", entries)
+            # A coleta mais recente de cada documento define a vigência
+            conn.executemany("INSERT OR REPLACE INTO validity VALUES (?, ?, ?, ?, ?, ?)", validity)
+            conn.executemany("INSERT OR REPLACE INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", facts)
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, created_at, start_date, end_date, total) VALUES (?, ?, ?, ?, ?)",
+                (run_id, datetime.now().isoformat(timespec="seconds"), start_date, end_date, total),
+            )
+        logger.info(f"{total} resultados da execução {run_id} gravados em {self.db_path}")
+        return total
+
+    def update_documents(self, updates: Dict[str, dict], key_column: str = "document_id") -> int:
+        """Regrava campos reextraídos (document_id -> campos) em todas as execuções que têm o documento,
+        mantendo contract_index, validity e facts; retorna as linhas alteradas.
+
+        Documentos sem número (S/N) são identificados pelo link da matéria: key_column="link_html"."""
+        if key_column not in ("document_id", "link_html"):
+            raise ValueError(f"Coluna de identificação inválida: {key_column}")
+        total = 0
+        with self._lock, closing(self._connect()) as conn, conn:
+            for ident, fields in updates.items():
+                if key_column == "document_id" and ident in _NO_ID:
+                    # Vários documentos compartilham esse id: sem o link não há como saber qual regravar
+                    logger.warning(f"Reextração ignorada para document_id '{ident}'; use o link da matéria")
+                    continue
+                sets = ", ".join(f'"{f}" = ?' for f in fields)
+                total += conn.execute(f"UPDATE results SET {sets} WHERE {key_column} = ?",
+                                      [*(str(v) for v in fields.values()), ident]).rowcount
+                rows = conn.execute(
+                    "SELECT run_id, seq, document_id, date, doc_type, contract_number, parent_contract, process_number, validity_start, "
+                    f"validity_end, modality, contractor, company_doc, value FROM results WHERE {key_column} = ? ORDER BY run_id, seq",
+                    (ident,)).fetchall()
+                if not rows:
+                    continue
+                for run_id, seq, _, _, doc_type, contract_number, parent_contract, process_number, *_ in rows:
+                    conn.execute("DELETE FROM contract_index WHERE run_id = ? AND seq = ?", (run_id, seq))
+                    entry = _index_entry(run_id, seq, doc_type, contract_number, parent_contract, process_number)
+                    if entry:
+                        conn.execute("INSERT INTO contract_index VALUES (?, ?, ?, ?, ?)", entry)
+                # validity e facts seguem a coleta mais recente de cada chave, como em save()
+                latest = {_doc_key(row[2], row[0], row[1]): row for row in rows}
+                for key, (run_id, seq, document_id, date, doc_type, contract_number, parent_contract, _, start, end,
+                          modality, contractor, company_doc, value) in latest.items():
+                    conn.execute("DELETE FROM validity WHERE document_id = ?", (key,))
+                    validity = _validity_entry(run_id, seq, document_id, doc_type, contract_number, parent_contract, start, end)
+                    if validity:
+                        conn.execute("INSERT INTO validity VALUES (?, ?, ?, ?, ?, ?)", validity)
+                    conn.execute("INSERT OR REPLACE INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 _fact_entry(run_id, seq, document_id, date, doc_type, modality, contractor, company_doc, value))
+        return total
+
+    def has_run(self, run_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() is not None
+
+    def runs(self, limit: int = 50) -> List[dict]:
+        """Execuções gravadas, mais recentes primeiro"""
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("SELECT * FROM runs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def contract_history(self, number: str) -> Optional[dict]:
+        """Histórico de um contrato em todas as execuções: o contrato, aditamentos, apostilamentos e a origem
+        (pregão/homologação do mesmo processo). None se o número não estiver no índice."""
+        key = classification.contract_key(number)
+        if not key:
+            raise ValueError("Número de contrato deve ter número e ano (ex: 014/2025)")
+        columns = ", ".join(f'r."{f}"' for f in FIELDS)
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            linked = conn.execute(
+                f"SELECT ci.role, ci.process, r.date_iso, {columns} FROM contract_index ci "
+                "JOIN results r ON r.run_id = ci.run_id AND r.seq = ci.seq WHERE ci.contract_key = ?", (key,)).fetchall()
+            if not linked:
+                return None
+            processes = sorted({row["process"] for row in linked if row["process"]})
+            origin = conn.execute(
+                f"SELECT ci.role, ci.process, r.date_iso, {columns} FROM contract_index ci "
+                "JOIN results r ON r.run_id = ci.run_id AND r.seq = ci.seq "
+                f"WHERE ci.role = 'origem' AND ci.process IN ({', '.join('?' for _ in processes)})", processes).fetchall() if processes else []
+
+        # O mesmo documento pode ter sido coletado por várias execuções: fica a mais recente
+        latest = {}
+        for row in sorted(linked + origin, key=lambda r: r["run_id"] or ""):
+            latest[(row["role"], row["document_id"])] = row
+        history = {"contract": key, "processes": processes, "origem": [], "contrato": [], "aditamento": [], "apostilamento": []}
+        for row in sorted(latest.values(), key=lambda r: (r["date_iso"] or "", r["amendment_number"] or "")):
+            history[row["role"]].append({f: row[f] for f in FIELDS})
+        return history
+
+    def _validity_query(self, where: str, params: list, limit: int) -> List[dict]:
+        columns = ", ".join(f'r."{f}"' for f in FIELDS)
+        sql = (f"SELECT v.start_iso, v.end_iso, {columns} FROM validity v "
+               f"JOIN results r ON r.run_id = v.run_id AND r.seq = v.seq WHERE {where} ORDER BY v.end_iso LIMIT ?")
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, [*params, limit])]
+
+    # Um contrato prorrogado por aditamento (mesmo contract_key, fim posterior) não conta como vencendo
+    _NOT_EXTENDED = ("NOT EXISTS (SELECT 1 FROM validity w WHERE v.contract_key != '' "
+                     "AND w.contract_key = v.contract_key AND w.end_iso > v.end_iso)")
+
+    def expiring(self, days: int, today: str = None, limit: int = 500) -> List[dict]:
+        """Documentos com vigência terminando entre `today` (DD/MM/AAAA, padrão hoje) e `days` dias depois"""
+        start = datetime.strptime(today, "%d/%m/%Y") if today else datetime.now()
+        end = start + timedelta(days=days)
+        return self._validity_query(f"v.end_iso BETWEEN ? AND ? AND {self._NOT_EXTENDED}",
+                                    [start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")], limit)
+
+    def active_on(self, date: str, limit: int = 500) -> List[dict]:
+        """Documentos vigentes na data (DD/MM/AAAA); sem início conhecido, vale só o fim"""
+        iso = _iso_date(date)
+        if not iso:
+            raise ValueError("Data deve estar no formato DD/MM/AAAA")
+        return self._validity_query("v.end_iso >= ? AND (v.start_iso = '' OR v.start_iso <= ?)", [iso, iso], limit)
+
+    def aggregate(self, group_by: str, limit: int = 100, date_from: str = None, date_to: str = None,
+                  doc_types: Optional[List[str]] = None, run_id: str = None) -> List[dict]:
+        """Totais por mês/tipo/modalidade/contratada (datas em DD/MM/AAAA); ver analytics.aggregate"""
+        filters = self._analytics_filters(date_from, date_to, doc_types, run_id)
+        with closing(self._connect()) as conn:
+            return analytics.aggregate(conn, group_by, limit, **filters)
+
+    def value_distribution(self, date_from: str = None, date_to: str = None, doc_types: Optional[List[str]] = None,
+                           run_id: str = None) -> List[dict]:
+        filters = self._analytics_filters(date_from, date_to, doc_types, run_id)
+        with closing(self._connect()) as conn:
+            return analytics.distribution(conn, **filters)
+
+    @staticmethod
+    def _analytics_filters(date_from, date_to, doc_types, run_id) -> dict:
+        filters = {"doc_types": doc_types, "run_id": run_id}
+        for name, value in (("date_from", date_from), ("date_to", date_to)):
+            if value:
+                filters[name] = _iso_date(value)
+                if not filters[name]:
+                    raise ValueError("Data deve estar no formato DD/MM/AAAA")
+        return filters
+
+    def iter_batches(self, run_id: str, columns: List[str], doc_types: Optional[List[str]] = None, orgaos: Optional[List[str]] = None,
+                     term: str = None, date_from: str = None, date_to: str = None, text: str = None, batch_size: int = 1000) -> Iterator[list]:
+        """Lotes de tuplas (na ordem de `columns`) da execução, já filtrados no SQL.
+
+        Datas em DD/MM/AAAA; `text` procura no objeto, contratada e síntese. Filtros inválidos
+        geram ValueError aqui, antes de qualquer lote ser lido."""
+        unknown = [c for c in columns if c not in FIELDS]
+        if unknown:
+            raise ValueError(f"Colunas desconhecidas: {', '.join(unknown)}")
+        where, params = ["run_id = ?"], [run_id]
+        if doc_types:
+            where.append(f"doc_type IN ({', '.join('?' for _ in doc_types)})")
+            params += doc_types
+        if orgaos:
+            where.append(f"orgao IN ({', '.join('?' for _ in orgaos)})")
+            params += orgaos
+        if term:
+            where.append("term LIKE ?")
+            params.append(f"%{term}%")
+        for value, op in ((date_from, ">="), (date_to, "<=")):
+            if value:
+                iso = _iso_date(value)
+                if not iso:
+                    raise ValueError("Data deve estar no formato DD/MM/AAAA")
+                where.append(f"date_iso {op} ?")
+                params.append(iso)
+        if text:
+            where.append("(object_text LIKE ? OR contractor LIKE ? OR summary LIKE ?)")
+            params += [f"%{text}%"] * 3
+
+        select = ", ".join(f'"{c}"' for c in columns)
+        sql = f"SELECT {select} FROM results WHERE {' AND '.join(where)} ORDER BY seq"
+        return self._fetch(sql, params, batch_size)
+
+    def _fetch(self, sql: str, params: list, batch_size: int) -> Iterator[list]:
+        conn = self._connect()
+        try:
+            cur = conn.execute(sql, params)
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            conn.close()
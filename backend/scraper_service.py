@@ -4,21 +4,50 @@ import os
 import sys
 import logging
 import json
+import time
+import collections
+import uuid
+from collections import deque
+from contextlib import ExitStack, aclosing, contextmanager
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-from models import SearchResult
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import records
+from records import ResultRecord
+import classification
+import metrics
+from tracing import Tracer
+from profiling import RunProfiler
+from browser_manager import BrowserManager, USER_AGENT
+from dedup import DedupIndex
+from progress import ProgressChannel
+from html_archive import HtmlArchive
+import logging_setup
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 # Configuração de Logs
 logger = logging.getLogger(__name__)
 
+# Versão das regras de extract_details/extract_object: incremente ao mudá-las para que o
+# reprocess.py reextraia, a partir do arquivo de páginas, os documentos gravados com a anterior
+EXTRACTOR_VERSION = 1
+
 class DiarioScraper:
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, site_url=None):
         self.debug = debug  # If True, browser will be visible
-        self.base_url = "https://diariooficial.prefeitura.sp.gov.br/md_epubli_controlador.php?acao=materias_pesquisar"
-        self.orgao_id = "68"  # CET
+        # Raiz do site (sobrescrevível para rodar contra o replay_server local)
+        self.site_url = (site_url or os.getenv("DIARIO_SITE_URL") or "https://diariooficial.prefeitura.sp.gov.br").rstrip("/")
+        self.base_url = f"{self.site_url}/md_epubli_controlador.php?acao=materias_pesquisar"
+        self.nav_timeout_ms = 30000
+        # iter_results: documentos em andamento/prontos por vez; scrape: resultados entre checkpoints parciais
+        self.stream_window = 10
+        self.checkpoint_every = 50
+        self.orgao_id = "68"  # CET (órgão padrão quando nenhum é informado)
         self.is_running = False # Controle de execução simultânea
+        # Observadores de etapas: callables (stage, seconds) chamados ao fim de cada etapa medida
+        self.stage_observers = []
+        self._tracer = None
+        self.last_run_id = None
         
         # Determine base directory for logs
         if getattr(sys, 'frozen', False):
@@ -29,23 +58,74 @@ class DiarioScraper:
         self.logs_dir = os.path.join(base_dir, "logs")
         if not os.path.exists(self.logs_dir):
             os.makedirs(self.logs_dir)
+        self.traces_dir = os.path.join(self.logs_dir, "traces")
+        self.profiles_dir = os.path.join(self.logs_dir, "profiles")
         
         self.partial_results_file = os.path.join(base_dir, "partial_results.json")
+        self._dedup = None
+        self._archive = None
+        # Blindagem da execução atual: campo crítico -> documentos sem ele (resumida ao fim da coleta)
+        self.shielding = collections.Counter()
     
-    def _save_partial_results(self, results):
-        """Salva resultados parciais em JSON para resiliência"""
+    @property
+    def dedup(self) -> DedupIndex:
+        """Índice de republicações (logs/dedup.db), aberto na primeira consulta"""
+        if self._dedup is None:
+            self._dedup = DedupIndex(os.path.join(self.logs_dir, "dedup.db"))
+        return self._dedup
+
+    @property
+    def archive(self) -> HtmlArchive:
+        """Páginas brutas baixadas (logs/archive), base do reprocess.py"""
+        if self._archive is None:
+            self._archive = HtmlArchive(os.path.join(self.logs_dir, "archive"))
+        return self._archive
+
+    async def _archive_page(self, kind, key, url, html, extractor_version=None):
+        """Grava no arquivo numa thread; falha no disco não derruba a coleta"""
         try:
-            temp_results = []
-            for r in results:
-                if hasattr(r, 'model_dump'):
-                    temp_results.append(r.model_dump())
-                elif hasattr(r, 'dict'):
-                    temp_results.append(r.dict())
-                else:
-                    temp_results.append(r)
+            await asyncio.to_thread(self.archive.put, kind, key, url, html, extractor_version)
+        except Exception as e:
+            logger.warning(f"Falha ao arquivar {key}: {e}")
+
+    @contextmanager
+    def _span(self, name, lane=False, **attrs):
+        """Span de rastreamento da execução atual (no-op quando o trace está desligado)"""
+        if self._tracer is None:
+            yield attrs
+        else:
+            with self._tracer.span(name, lane=lane, **attrs) as span_attrs:
+                yield span_attrs
+
+    @contextmanager
+    def _stage(self, name, **attrs):
+        """Mede a duração de uma etapa do pipeline e notifica os observadores"""
+        t0 = time.perf_counter()
+        try:
+            with self._span(name, **attrs) as span_attrs:
+                yield span_attrs
+        finally:
+            elapsed = time.perf_counter() - t0
+            for observer in self.stage_observers:
+                try:
+                    observer(name, elapsed)
+                except Exception as e:
+                    logger.debug(f"Observador de etapa falhou: {e}")
 
-            with open(self.partial_results_file, "w", encoding="utf-8") as f:
-                json.dump(temp_results, f, ensure_ascii=False, indent=2)
+    def _save_partial_results(self, results, flushed=0):
+        """Salva resultados parciais em JSON para resiliência.
+
+        Só os resultados a partir de `flushed` são serializados: o array é reaberto antes do "]" final,
+        então cada checkpoint custa o lote novo e o arquivo continua um JSON válido."""
+        try:
+            items = ",\n".join(json.dumps(records.to_dict(r), ensure_ascii=False) for r in results[flushed:])
+            if flushed == 0:
+                with open(self.partial_results_file, "w", encoding="utf-8") as f:
+                    f.write(f"[\n{items}\n]")
+            elif items:
+                with open(self.partial_results_file, "r+b") as f:
+                    f.seek(-2, os.SEEK_END)
+                    f.write(f",\n{items}\n]".encode("utf-8"))
         except Exception as e:
             logger.error(f"Erro ao salvar resultados parciais: {e}")
     
@@ -55,18 +135,22 @@ class DiarioScraper:
             parts = link.split("http")
             return "http" + parts[-1] if len(parts) > 1 else link
         if not link.startswith("http"):
-            return f"https://diariooficial.prefeitura.sp.gov.br/{link}"
+            return f"{self.site_url}/{link.lstrip('/')}"
         return link
 
-    def extract_details(self, soup, default_summary=""):
-        """Método principal de extração (Refatorado)"""
-        data = {
+    def _new_details(self, default_summary=""):
+        """Dicionário de campos com os valores padrão usados pela extração"""
+        return {
             "contratada": "-", "contractor": "-", "doc_fiscal": "-", "sintese": default_summary,
             "num_contrato": "-", "integra_id": "", "data_assinatura": "",
             "prazo": "", "tipo_prazo": "", "valor": "-", "modality": "-",
             "opening_date": "-", "tipo_doc": "OUTRO", "num_aditamento": "",
             "contrato_pai": "", "validade_inicio": "-", "validade_fim": "-"
         }
+
+    def extract_details(self, soup, default_summary=""):
+        """Método principal de extração (Refatorado)"""
+        data = self._new_details(default_summary)
         
         # 1. Extração de campos estruturados (Tabelas/Labels)
         self._extract_structured_fields(soup, data)
@@ -127,11 +211,9 @@ class DiarioScraper:
 
     def _extract_modality(self, text, data):
         if data.get('modality') in ["-", "", None]:
-            m_mod = re.search(r'(PREGÃO ELETRÔNICO|PREGÃO|CONCORRÊNCIA|TOMADA DE PREÇOS|CONVITE|LEILÃO|DIÁLOGO COMPETITIVO|INEXIGIBILIDADE|DISPENSA)', text, re.IGNORECASE)
-            if m_mod:
-                data['modality'] = m_mod.group(1).upper()
-            elif "LICITAÇÃO" in text.upper():
-                data['modality'] = "LICITAÇÃO"
+            modality = classification.detect_modality(text)
+            if modality:
+                data['modality'] = modality
 
     def _extract_contractor(self, text, data):
         if data.get('contractor') in ["-", "", None]:
@@ -159,13 +241,13 @@ class DiarioScraper:
             if m_id: 
                 data['num_contrato'] = m_id.group(1)
 
-        m_adit = re.search(r'(?:Termo de )?(Aditamento|Apostilamento)\s*(?:nº|n°)?\s*([\d\.]+(?:/[\d]{2,4})?)', text, re.IGNORECASE)
+        m_adit = classification.RE_AMENDMENT.search(text)
         if m_adit:
             data['tipo_doc'] = m_adit.group(1).upper()
             data['num_aditamento'] = m_adit.group(2)
             
             # Parent Contract identification
-            m_pai = re.search(r'ao (?:Termo de )?(?:Contrato|Termo de Colaboração|Termo de Fomento|Ajuste)\s*(?:nº|n°)?\s*([\d\.]+(?:/[\d]{2,4})?)', text, re.IGNORECASE)
+            m_pai = classification.RE_PARENT_CONTRACT.search(text)
             if m_pai:
                 data['contrato_pai'] = m_pai.group(1)
 
@@ -240,76 +322,119 @@ class DiarioScraper:
         data['validade_fim'] = validade_fim
 
     def _classify_document(self, text, data):
-        if data.get('tipo_doc') in ['ADITAMENTO', 'APOSTILAMENTO']:
-            return
-
-        if data.get('modality') == 'DISPENSA' or "DISPENSA" in data.get('modality', '').upper():
-             data['tipo_doc'] = 'PEDIDO_COMPRA'
-        elif re.search(r'(?:Formalização|Termo|Extrato) d[oa] Contrato', text, re.IGNORECASE) or \
-             re.search(r'Contrato\s*(?:nº|n°)\s*[\d]+', text, re.IGNORECASE):
-             data['tipo_doc'] = 'CONTRATO'
-        elif re.search(r'(?:DESPACHO DE ADJUDICAÇÃO|ADJUDICO|DESPACHO DE HOMOLOGAÇÃO|HOMOLOGO|AUTORIZO a contratação)', text, re.IGNORECASE):
-             data['tipo_doc'] = 'HOMOLOGACAO'
-        elif re.search(r'Termo de (Fomento|Colaboração|Doação|Comodato)', text, re.IGNORECASE):
-             data['tipo_doc'] = 'PARCERIA' # Simplified grouping
-        elif re.search(r'Acordo de Coopera[çc][ãa]o', text, re.IGNORECASE):
-             data['tipo_doc'] = 'ACORDO_COOPERACAO'
-        elif re.search(r'(ESCLARECIMENTO|QUESTIONAMENTO|DESPACHO DE IMPUGNAÇ|IMPUGNAÇ[ÃA]O|NOTIFICAÇÃO|ATA DE ABERTURA)', text, re.IGNORECASE):
-             data['tipo_doc'] = 'DIVERSOS'
-        else:
-             data['tipo_doc'] = 'OUTRO'
+        """Classificação canônica (classification.py), feita uma única vez sobre o texto completo"""
+        data['tipo_doc'] = classification.classify(text, data.get('modality', ''), data.get('tipo_doc'))
+
+    def _integra_link(self, soup, details, default):
+        """Link da íntegra (documento SEI) citada na matéria; sem íntegra, o próprio link da matéria"""
+        if not details.get('integra_id'):
+            return default
+        a_precise = soup.find('a', string=lambda t: t and details['integra_id'] in t)
+        if a_precise and a_precise.has_attr('href'):
+            return self.clean_link(a_precise['href'])
+        for a in soup.find_all('a', href=True):
+            if details['integra_id'] in a['href']:
+                return self.clean_link(a['href'])
+        return default
+
+    def merge_integra_text(self, details, text):
+        """Completa com o texto da íntegra os campos que a matéria não trouxe (o tipo continua o da matéria)"""
+        extra = self._new_details()
+        extra['prazo'], extra['tipo_prazo'] = details.get('prazo', ''), details.get('tipo_prazo', '')
+        self._extract_dates(text, extra)
+        self._extract_contractor(text, extra)
+        self._extract_contract_info(text, extra)
+        self._extract_values(text, extra)
+        for key in ("validade_inicio", "validade_fim", "contractor", "valor", "num_contrato"):
+            if details.get(key) in ["-", "", None] and extra.get(key) not in ["-", "", None]:
+                details[key] = extra[key]
+        details['integra_texto'] = text
+
+    SHIELDING_FIELDS = [
+        ("contractor", "contratada/vencedora"),
+        ("valor", "valor"),
+        ("num_contrato", "número do contrato/pregão"),
+        ("validade_inicio", "data de início/assinatura")
+    ]
 
     def _apply_shielding(self, data):
-        """Blindagem: Alertas sobre campos críticos ausentes"""
-        criticos = [
-            ("contractor", "Contratada/Vencedora não identificada"),
-            ("valor", "Valor não identificado"),
-            ("num_contrato", "Número do contrato/pregão não identificado"),
-            ("validade_inicio", "Data de início/assinatura não identificada")
-        ]
-        for campo, msg in criticos:
+        """Blindagem: conta os campos críticos ausentes; o aviso sai uma vez por execução (_log_shielding)"""
+        for campo, _ in self.SHIELDING_FIELDS:
             valor = data.get(campo)
             if not valor or valor in ["-", "", None]:
-                logger.warning(f"[BLINDAGEM] {msg}")
+                self.shielding[campo] += 1
+
+    def _log_shielding(self, documents: int):
+        if not self.shielding:
+            return
+        missing = ", ".join(f"{label} {self.shielding[campo]}" for campo, label in self.SHIELDING_FIELDS if self.shielding[campo])
+        logger.warning(f"[BLINDAGEM] Campos críticos não identificados ({documents} documentos na execução): {missing}")
 
     async def enrich_with_ai(self, details, item_id, enabled=True):
-        """Isolamento da IA: Execução opcional e protegida"""
+        """Isolamento da IA: Execução opcional e protegida; retorna o que a IA extraiu (ou None)"""
         if not enabled:
-            return
+            return None
             
         try:
             from ai_extractor import is_ai_enabled, extract_with_gemini
             
             if not is_ai_enabled():
-                return
+                return None
                 
             logger.info(f"Enriquecendo documento {item_id} com IA...")
             # Timeout controlado de 30s para não travar o scraping
-            ai_data = await asyncio.wait_for(extract_with_gemini(details['sintese']), timeout=30.0)
+            try:
+                texto = details['sintese']
+                if details.get('integra_texto'):
+                    texto += "\n\nÍNTEGRA DO DOCUMENTO:\n" + details['integra_texto']
+                ai_data = await asyncio.wait_for(extract_with_gemini(texto), timeout=30.0)
+            except asyncio.TimeoutError:
+                metrics.TIMEOUTS.inc(operation="ai")
+                raise
             
             if ai_data:
                 logger.debug(f"IA retornou dados para {item_id}")
-                mapeamento = {
-                    'contractor': 'contractor',
-                    'company_doc': 'doc_fiscal',
-                    'object_text': 'explicit_object',
-                    'validity_start': 'validade_inicio',
-                    'validity_end': 'validade_fim',
-                    'value': 'valor',
-                    'contract_number': 'num_contrato'
-                }
-                for ai_key, dev_key in mapeamento.items():
-                    if ai_data.get(ai_key) and ai_data[ai_key] != '-':
-                        details[dev_key] = ai_data[ai_key]
-                
-                if ai_data.get('modality'):
-                    details['modality'] = ai_data['modality'].upper()
-                    if any(x in details['modality'] for x in ["DIVERSOS", "ATA", "JULGAMENTO"]):
-                        details['tipo_doc'] = 'DIVERSOS'
-                    elif "ACORDO DE COOPERA" in details['modality']:
-                         details['tipo_doc'] = 'ACORDO_COOPERACAO'
+                self.apply_ai_data(details, ai_data)
+                return ai_data
         except Exception as e:
             logger.error(f"Falha na IA para doc {item_id}: {e}")
+        return None
+
+    def apply_ai_data(self, details, ai_data):
+        """Aplica a resposta da IA (ou a reaproveitada de uma republicação) sobre os campos extraídos"""
+        mapeamento = {
+            'contractor': 'contractor',
+            'company_doc': 'doc_fiscal',
+            'object_text': 'explicit_object',
+            'validity_start': 'validade_inicio',
+            'validity_end': 'validade_fim',
+            'value': 'valor',
+            'contract_number': 'num_contrato'
+        }
+        for ai_key, dev_key in mapeamento.items():
+            if ai_data.get(ai_key) and ai_data[ai_key] != '-':
+                details[dev_key] = ai_data[ai_key]
+        
+        if ai_data.get('modality'):
+            details['modality'] = ai_data['modality'].upper()
+            if any(x in details['modality'] for x in ["DIVERSOS", "ATA", "JULGAMENTO"]):
+                details['tipo_doc'] = 'DIVERSOS'
+            elif "ACORDO DE COOPERA" in details['modality']:
+                 details['tipo_doc'] = 'ACORDO_COOPERACAO'
+
+    def detail_fields(self, details) -> dict:
+        """Campos do ResultRecord que saem da extração da matéria (os demais vêm da listagem e da execução)"""
+        obj_text = details.get('explicit_object')
+        if not obj_text or len(obj_text) <= 5: obj_text = self.extract_object(details['sintese'])
+        doc_type = details.get('tipo_doc', 'OUTRO')
+        return dict(
+            summary=details['sintese'][:200] + "...", object_text=obj_text, contractor=details['contractor'],
+            company_doc=details['doc_fiscal'], contract_number=details['num_contrato'],
+            validity_start=details['validade_inicio'], validity_end=details['validade_fim'], value=details['valor'],
+            modality=details.get('modality', '-'), opening_date=details.get('opening_date', '-'),
+            amendment_number=details.get('num_aditamento', ''), parent_contract=details.get('contrato_pai', ''),
+            doc_type=doc_type, doc_label=classification.label_for(doc_type, details.get('num_aditamento', ''))
+        )
 
     def extract_object(self, text):
         if not text: return "VERIFICAR NA ÍNTEGRA"
@@ -350,15 +475,58 @@ class DiarioScraper:
 
         return "Verificar objeto na íntegra."
 
-    async def scrape(self, start_date: str | datetime, end_date: str | datetime, terms: list, status_callback=None, use_ai=True):
+    async def scrape(self, *args, **kwargs) -> list:
+        """Pesquisa completa em lista (mesmos parâmetros de iter_results), com checkpoint parcial em disco"""
+        results = []
+        flushed = 0
+        async with aclosing(self.iter_results(*args, **kwargs)) as stream:
+            async for res in stream:
+                results.append(res)
+                if len(results) % self.checkpoint_every == 0:
+                    with self._stage("checkpoint"):
+                        self._save_partial_results(results, flushed)
+                    flushed = len(results)
+        with self._stage("checkpoint"):
+            self._save_partial_results(results, flushed)
+        return results
+
+    async def iter_results(self, start_date: str | datetime, end_date: str | datetime, terms: list, status_callback=None, use_ai=True, orgaos: list = None, trace=False, profile=False, browser_manager=None, known_doc_ids=None, integra_enabled=False, progress: ProgressChannel = None):
+        """Gerador assíncrono dos resultados, na ordem da listagem, à medida que são extraídos.
+
+        No máximo `stream_window` documentos ficam em andamento ou prontos à espera do consumidor: se ele
+        demora, a coleta espera. Para parar no meio, use `async with contextlib.aclosing(...)`, que fecha
+        páginas e navegador na hora.
+
+        O progresso vai para `progress` (ProgressChannel) sem que a coleta espere a entrega; um
+        `status_callback` de mensagens é atendido por um canal próprio, com a mesma garantia."""
         if self.is_running:
             raise Exception("O robô já está em execução. Aguarde a finalização.")
         
         self.is_running = True
+        metrics.RUN_IN_PROGRESS.set(1)
         start_time = datetime.now()
-        results = []
+        produced = 0
+        pending = deque()
+        run_id = f"{start_time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.last_run_id = run_id
+        self._tracer = Tracer(run_id, self.traces_dir) if trace else None
+        profiler = RunProfiler(run_id, self.profiles_dir).start() if profile else None
+        run_span = ExitStack()
+        manager = browser_manager
+        owns_manager = False
+        session = None
+        integra = None
+        docs_done = 0
+        run_t0 = time.perf_counter()
+        owns_progress = False
+        self.shielding.clear()
+        log_token = logging_setup.set_run_id(run_id)
+        if progress is None and status_callback is not None:
+            progress = ProgressChannel(lambda event: status_callback(event["message"])).start()
+            owns_progress = True
         
         try:
+            run_attrs = run_span.enter_context(self._span("run", run_id=run_id, start_date=str(start_date), end_date=str(end_date)))
             if isinstance(start_date, str):
                 d1 = datetime.strptime(start_date, "%d/%m/%Y")
             else:
@@ -374,75 +542,89 @@ class DiarioScraper:
             delta = d2 - d1
             date_list = [(d1 + timedelta(days=i)).strftime("%d/%m/%Y") for i in range(delta.days + 1)]
 
-            logger.info(f"Iniciando navegador (debug={self.debug})...")
-            
-            async with async_playwright() as p:
-                browser = None
-                launch_options = {"headless": not self.debug, "timeout": 30000}
-                
-                try:
-                    browser = await p.chromium.launch(**launch_options)
-                except:
-                    try:
-                        browser = await p.chromium.launch(channel="chrome", **launch_options)
-                    except:
-                        browser = await p.chromium.launch(channel="msedge", **launch_options)
-                
-                if not browser: raise Exception("Falha crítica ao iniciar navegador.")
-
-                context = await browser.new_context(user_agent="Mozilla/5.0 DiárioOficialScraper/1.0")
-                context.set_default_navigation_timeout(30000) 
-                page = await context.new_page()
-                
-                await page.goto(self.base_url, timeout=30000)
-
-                total_days = len(date_list)
-                for day_idx, current_date in enumerate(date_list):
+            # Unidades de listagem (data, órgão): todas compartilham o mesmo navegador e o mesmo pool de páginas
+            orgaos = list(orgaos) if orgaos else [self.orgao_id]
+            units = [(d, o) for d in date_list for o in orgaos]
+            run_attrs["orgaos"] = ",".join(orgaos)
+
+            if manager is None:
+                logger.info(f"Iniciando navegador (debug={self.debug})...")
+                manager = BrowserManager(self.base_url, debug=self.debug, nav_timeout_ms=self.nav_timeout_ms, keep_warm=False)
+                owns_manager = True
+            session = await manager.acquire()
+            session.notify = progress.notify if progress else None
+
+            # Limite global de páginas de detalhe abertas simultaneamente (compartilhado entre órgãos)
+            sem = asyncio.Semaphore(5)
+            # A IA roda fora das vagas de página, com o mesmo limite de chamadas simultâneas
+            ai_sem = asyncio.Semaphore(5)
+            if integra_enabled:
+                from integra_pipeline import IntegraPipeline
+                integra = IntegraPipeline(os.path.join(self.logs_dir, "integra"), user_agent=USER_AGENT)
+            total_days = len(date_list)
+            for unit_idx, (current_date, orgao) in enumerate(units):
+                with self._span("day", date=current_date, orgao=orgao):
+                    day_idx = unit_idx // len(orgaos)
+                    await manager.maybe_recycle(session)
+                    if profiler and unit_idx % len(orgaos) == 0 and unit_idx > 0:
+                        profiler.snapshot(f"antes de {current_date}", results=produced)
                     progress_msg = f"Processando dia {day_idx+1} de {total_days}: {current_date}"
-                    if status_callback: await status_callback(progress_msg)
+                    if len(orgaos) > 1: progress_msg += f" (órgão {orgao})"
+                    if progress: progress.log(progress_msg)
 
-                    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5))
+                    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5),
+                           before_sleep=metrics.count_retry("listing"))
                     async def fetch_results_with_retry():
-                        try: _ = page.url
-                        except: await page.goto(self.base_url, timeout=30000)
+                        page = await session.listing_page()
 
                         js_script = f"""
                             var f = document.createElement('form'); f.action='md_epubli_controlador.php?acao=materias_pesquisar'; f.method='POST';
                             var i1=document.createElement('input');i1.name='hdnDataPublicacao';i1.value='{current_date}';f.appendChild(i1);
-                            var i2=document.createElement('input');i2.name='hdnOrgaoFiltro';i2.value='{self.orgao_id}';f.appendChild(i2);
+                            var i2=document.createElement('input');i2.name='hdnOrgaoFiltro';i2.value='{orgao}';f.appendChild(i2);
                             var i3=document.createElement('input');i3.name='hdnModoPesquisa';i3.value='DATA';f.appendChild(i3);
                             var i4=document.createElement('input');i4.name='hdnVisualizacao';i4.value='L';f.appendChild(i4);
                             document.body.appendChild(f); f.submit();
                         """
-                        try:
-                            async with page.expect_navigation(timeout=30000):
-                                await page.evaluate(js_script)
-                        except: pass
-
-                        try:
-                            await page.wait_for_selector('div.dadosDocumento', state="attached", timeout=3000)
-                            return await page.query_selector_all('div.dadosDocumento')
-                        except:
-                             content = await page.content()
-                             if any(p in content for p in ["Nenhum registro encontrado", "Não foram encontrados registros"]):
-                                 return []
-                             await page.wait_for_selector('div.dadosDocumento', state="attached", timeout=10000)
-                             return await page.query_selector_all('div.dadosDocumento')
+                        async with session.track(page, "listagem"):
+                            try:
+                                async with page.expect_navigation(timeout=self.nav_timeout_ms):
+                                    await page.evaluate(js_script)
+                            except PlaywrightTimeoutError:
+                                metrics.TIMEOUTS.inc(operation="listing")
+                            except: pass
+
+                            try:
+                                await page.wait_for_selector('div.dadosDocumento', state="attached", timeout=3000)
+                                return await page.query_selector_all('div.dadosDocumento')
+                            except:
+                                 content = await page.content()
+                                 if any(p in content for p in ["Nenhum registro encontrado", "Não foram encontrados registros"]):
+                                     return []
+                                 await page.wait_for_selector('div.dadosDocumento', state="attached", timeout=10000)
+                                 return await page.query_selector_all('div.dadosDocumento')
 
                     elementos = []
                     try:
-                        elementos = await fetch_results_with_retry()
+                        with self._stage("listing_fetch", date=current_date, orgao=orgao) as listing_attrs:
+                            elementos = await fetch_results_with_retry()
+                            listing_attrs["items"] = len(elementos)
+                            listing_attrs["attempts"] = fetch_results_with_retry.statistics.get("attempt_number", 1)
                     except:
-                        logger.error(f"Falha ao buscar {current_date}")
+                        logger.error(f"Falha ao buscar {current_date} (órgão {orgao})")
                         continue
 
                     if not elementos: continue
+                    try:
+                        listing_html = await (await session.listing_page()).content()
+                        await self._archive_page("listing", f"listing:{current_date}:{orgao}", self.base_url, listing_html)
+                    except Exception as e:
+                        logger.warning(f"Listagem de {current_date} (órgão {orgao}) não arquivada: {e}")
 
                     links_to_visit = []
                     for el in elementos:
                         txt = await el.inner_text()
                         if "GSU" in txt.upper(): continue
-                        
+                    
                         matches_term = False
                         matched_term_name = "Geral"
                         if not terms: matches_term = True
@@ -452,7 +634,7 @@ class DiarioScraper:
                                     matches_term = True
                                     matched_term_name = t
                                     break
-                        
+                    
                         if matches_term:
                             m_proc = re.search(r'Processo:?\s?([\d\./-]+)', txt)
                             proc = m_proc.group(1) if m_proc else "N/A"
@@ -463,76 +645,159 @@ class DiarioScraper:
                                 href = await link_el.get_attribute('href')
                                 links_to_visit.append({"url": self.clean_link(href), "doc_id": doc_id, "processo": proc, "term": matched_term_name})
 
+                    if known_doc_ids:
+                        # Modo vigia: documentos já vistos (número ou, se S/N, link) não são abertos de novo
+                        links_to_visit = [l for l in links_to_visit if records.document_key(l["doc_id"], l["url"]) not in known_doc_ids]
+
                     if not links_to_visit: continue
 
-                    sem = asyncio.Semaphore(5)
                     total_items = len(links_to_visit)
                     day_processed_count = 0
 
+                    def report_item():
+                        nonlocal day_processed_count, docs_done
+                        day_processed_count += 1
+                        docs_done += 1
+                        if progress is None:
+                            return
+                        elapsed = time.perf_counter() - run_t0
+                        fraction = (unit_idx + day_processed_count / total_items) / len(units)
+                        progress.update(
+                            day=day_idx + 1, days=total_days, date=current_date, orgao=orgao,
+                            done=day_processed_count, total=total_items, documents=docs_done,
+                            rate_per_s=round(docs_done / elapsed, 2), eta_s=round(elapsed * (1 - fraction) / fraction),
+                            message=f"Extraindo item {day_processed_count} de {total_items} ({current_date})")
+
                     async def fetch_and_extract(item):
-                        nonlocal day_processed_count
-                        async with sem:
-                            @retry(stop=stop_after_attempt(2), wait=wait_exponential(min=2, max=5))
+                        with self._span("document", lane=True, doc_id=item['doc_id'], date=current_date, orgao=orgao) as doc_attrs:
+                            @retry(stop=stop_after_attempt(2), wait=wait_exponential(min=2, max=5),
+                                   before_sleep=metrics.count_retry("detail"))
                             async def fetch_item_details():
-                                page_detail = await context.new_page()
+                                page_detail = await session.new_page()
                                 try:
-                                    await page_detail.goto(item['url'], timeout=30000)
-                                    return await page_detail.content()
+                                    async with session.track(page_detail, "detalhe"):
+                                        await page_detail.goto(item['url'], timeout=self.nav_timeout_ms)
+                                        return await page_detail.content()
+                                except PlaywrightTimeoutError:
+                                    metrics.TIMEOUTS.inc(operation="detail")
+                                    raise
                                 finally: await page_detail.close()
 
                             try:
-                                content = await fetch_item_details()
-                                soup = BeautifulSoup(content, 'html.parser')
-                                details = self.extract_details(soup)
-                                await self.enrich_with_ai(details, item['doc_id'], enabled=use_ai)
-                                
-                                link_pdf = item['url']
-                                if details.get('integra_id'):
-                                     a_precise = soup.find('a', string=lambda t: t and details['integra_id'] in t)
-                                     if a_precise and a_precise.has_attr('href'):
-                                         link_pdf = self.clean_link(a_precise['href'])
-                                     else:
-                                         for a in soup.find_all('a', href=True):
-                                            if details['integra_id'] in a['href']:
-                                                link_pdf = self.clean_link(a['href'])
-                                                break
-                                
-                                obj_text = details.get('explicit_object')
-                                if not obj_text or len(obj_text) <= 5: obj_text = self.extract_object(details['sintese'])
-                                
-                                res = SearchResult(
+                                # A vaga de página é liberada após a extração: íntegra e IA não seguram o navegador
+                                async with sem:
+                                    metrics.ACTIVE_FETCHES.inc()
+                                    try:
+                                        with self._stage("detail_fetch") as fetch_attrs:
+                                            content = await fetch_item_details()
+                                            fetch_attrs["bytes"] = len(content)
+                                            fetch_attrs["attempts"] = fetch_item_details.statistics.get("attempt_number", 1)
+                                        with self._stage("parse"):
+                                            soup = BeautifulSoup(content, 'html.parser')
+                                        with self._stage("extract"):
+                                            details = self.extract_details(soup)
+                                        link_pdf = self._integra_link(soup, details, item['url'])
+                                        # A árvore do documento não é mais usada: liberada já, sem esperar o GC
+                                        soup.decompose()
+                                        del soup
+                                    finally:
+                                        metrics.ACTIVE_FETCHES.dec()
+
+                                # Página bruta arquivada fora da vaga de página, para reextração offline
+                                # Sem número na listagem (S/N), a chave é o link: vários documentos dividiriam "doc:S/N"
+                                archive_key = f"doc:{item['doc_id']}" if item['doc_id'] != "S/N" else f"url:{item['url']}"
+                                await self._archive_page("detail", archive_key, item['url'], content, EXTRACTOR_VERSION)
+                                del content
+
+                                if integra is not None and link_pdf != item['url']:
+                                    with self._stage("integra") as integra_attrs:
+                                        integra_text = await integra.text_for(link_pdf)
+                                        integra_attrs["chars"] = len(integra_text)
+                                    if integra_text:
+                                        self.merge_integra_text(details, integra_text)
+                                # Republicação quase idêntica de um documento já enriquecido: reaproveita a IA
+                                duplicate = await asyncio.to_thread(self.dedup.match, item['doc_id'], details['sintese'])
+                                ai_data = None
+                                reuse_ai = use_ai and duplicate is not None and duplicate["ai_fields"] is not None
+                                if use_ai:
+                                    metrics.record_cache("ai_reuse", reuse_ai)
+                                if duplicate:
+                                    metrics.DUPLICATES.inc(ai="reused" if reuse_ai else "not_reused")
+                                    doc_attrs["duplicate_of"] = duplicate["document_id"]
+                                if reuse_ai:
+                                    ai_data = duplicate["ai_fields"]
+                                    self.apply_ai_data(details, ai_data)
+                                elif use_ai:
+                                    async with ai_sem:
+                                        with self._stage("ai"):
+                                            ai_data = await self.enrich_with_ai(details, item['doc_id'], enabled=use_ai)
+                                await asyncio.to_thread(self.dedup.add, item['doc_id'], details['sintese'],
+                                                        duplicate["document_id"] if duplicate else "", ai_data)
+
+                                res = ResultRecord(
                                     date=current_date, term=item['term'], process_number=item['processo'],
-                                    document_id=item['doc_id'], summary=details['sintese'][:200] + "...",
-                                    object_text=obj_text, contractor=details['contractor'], company_doc=details['doc_fiscal'],
-                                    contract_number=details['num_contrato'], validity_start=details['validade_inicio'],
-                                    validity_end=details['validade_fim'], value=details['valor'], link_html=item['url'],
-                                    link_pdf=link_pdf, modality=details.get('modality', '-'), opening_date=details.get('opening_date', '-'),
-                                    amendment_number=details.get('num_aditamento', ''), parent_contract=details.get('contrato_pai', ''),
-                                    doc_type=details.get('tipo_doc', 'OUTRO')
+                                    document_id=item['doc_id'], link_html=item['url'], link_pdf=link_pdf,
+                                    orgao=orgao, run_id=run_id, duplicate_of=duplicate["document_id"] if duplicate else "",
+                                    **self.detail_fields(details)
                                 )
-                                day_processed_count += 1
-                                if status_callback: await status_callback(f"Extraindo item {day_processed_count} de {total_items} ({current_date})")
+                                doc_attrs["doc_type"] = res.doc_type
+                                metrics.DOCUMENTS.inc(result="ok")
+                                report_item()
                                 return res
                             except Exception as e:
                                 logger.error(f"Erro no item {item['doc_id']}: {e}")
-                                day_processed_count += 1
+                                metrics.DOCUMENTS.inc(result="error")
+                                report_item()
                                 return None
 
-                    day_tasks = [fetch_and_extract(it) for it in links_to_visit]
-                    day_results = await asyncio.gather(*day_tasks)
-                    results.extend([r for r in day_results if r])
-                    self._save_partial_results(results)
-                
-                await browser.close()
+                    next_item = 0
+                    while next_item < len(links_to_visit) or pending:
+                        # Completa a janela; o próximo documento só começa quando o consumidor pede mais
+                        while next_item < len(links_to_visit) and len(pending) < self.stream_window:
+                            pending.append(asyncio.ensure_future(fetch_and_extract(links_to_visit[next_item])))
+                            next_item += 1
+                        res = await pending.popleft()
+                        if res:
+                            produced += 1
+                            yield res
             
             elapsed = datetime.now() - start_time
-            finish_msg = f"Concluído em {elapsed}. Total: {len(results)}"
+            finish_msg = f"Concluído em {elapsed}. Total: {produced}"
             logger.info(finish_msg)
-            if status_callback: await status_callback(finish_msg)
-            return results
-
+            self._log_shielding(docs_done)
+            if progress: progress.log(finish_msg)
+            metrics.RUNS.inc(status="ok")
+            run_attrs["results"] = produced
+
+        except (GeneratorExit, asyncio.CancelledError):
+            # Consumidor parou de ler (aclose) ou a tarefa foi cancelada
+            metrics.RUNS.inc(status="cancelled")
+            run_attrs["cancelled"] = True
+            raise
         except Exception as e:
             logger.error(f"Erro fatal no scraping: {e}")
+            metrics.RUNS.inc(status="error")
+            run_attrs["error"] = str(e)
             raise
         finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            if integra is not None:
+                await integra.close()
+            if session is not None:
+                await manager.release(session)
+            if owns_manager:
+                await manager.close()
+            if owns_progress:
+                await progress.close()
+            logging_setup.reset_run_id(log_token)
+            run_span.close()
+            if self._tracer is not None:
+                self._tracer.save()
+                self._tracer = None
+            if profiler is not None:
+                profiler.stop(results=produced)
             self.is_running = False
+            metrics.RUN_IN_PROGRESS.set(0)
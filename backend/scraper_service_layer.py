@@ -1,7 +1,13 @@
+import asyncio
 import logging
-from typing import List
-from models import SearchRequest, SearchResult
+import os
+from typing import List, Tuple
+from models import SearchRequest
+from records import ResultRecord
 from scraper_service import DiarioScraper
+from browser_manager import BrowserManager
+from result_store import ResultStore
+import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -10,19 +16,69 @@ class ScraperService:
     
     def __init__(self, debug: bool = True):
         self._scraper = DiarioScraper(debug=debug)
+        self._scraper.stage_observers.append(metrics.observe_stage)
+        self._browser_manager = None
+        # Resultados de cada execução, lidos pelas exportações
+        self.store = ResultStore(os.path.join(self._scraper.logs_dir, "results.db"))
+
+    def create_browser_manager(self) -> BrowserManager:
+        """Navegador persistente usado por todas as execuções; o ciclo de vida é do chamador (lifespan)"""
+        self._browser_manager = BrowserManager(
+            self._scraper.base_url,
+            debug=self._scraper.debug,
+            nav_timeout_ms=self._scraper.nav_timeout_ms,
+            state_file=os.path.join(self._scraper.logs_dir, "browser_state.json"),
+        )
+        return self._browser_manager
 
     @property
     def is_running(self) -> bool:
         return self._scraper.is_running
 
-    async def run(self, request: SearchRequest, status_callback=None, use_ai=True) -> List[SearchResult]:
-        """Executa o scraping baseado num objeto SearchRequest"""
-        logger.info(f"Iniciando serviço de scraping para {len(request.terms)} termos... (IA={use_ai})")
+    @property
+    def last_run_id(self):
+        return self._scraper.last_run_id
+
+    def trace_path(self, run_id: str) -> str:
+        return os.path.join(self._scraper.traces_dir, f"trace_{run_id}.json")
+
+    @property
+    def profiles_dir(self) -> str:
+        return self._scraper.profiles_dir
+
+    @property
+    def logs_dir(self) -> str:
+        return self._scraper.logs_dir
+
+    async def run(self, request: SearchRequest, status_callback=None, use_ai=True, trace=False, profile=False,
+                  known_doc_ids=None, persist=True, progress=None) -> Tuple[str, List[ResultRecord]]:
+        """Executa o scraping baseado num objeto SearchRequest.
+
+        `known_doc_ids` pula o detalhe de documentos já vistos; com persist=False o chamador decide se grava no store.
+        Retorna (run_id, resultados): o run_id é lido assim que a coleta termina, antes que outra execução
+        (o modo vigia, por exemplo) troque o last_run_id."""
+        logger.info(f"Iniciando serviço de scraping para {len(request.terms)} termos e {len(request.orgaos)} órgão(s)... (IA={use_ai})")
         
-        return await self._scraper.scrape(
+        results = await self._scraper.scrape(
             start_date=request.start_date,
             end_date=request.end_date,
             terms=request.terms,
             status_callback=status_callback,
-            use_ai=use_ai
+            use_ai=use_ai,
+            orgaos=request.orgaos,
+            trace=trace or request.trace,
+            profile=profile or request.profile,
+            browser_manager=self._browser_manager,
+            known_doc_ids=known_doc_ids,
+            integra_enabled=request.integra,
+            progress=progress
         )
+        run_id = self.last_run_id
+        if not persist:
+            return run_id, results
+        try:
+            await asyncio.to_thread(self.store.save, run_id, results, request.start_date, request.end_date)
+        except Exception as e:
+            # A pesquisa não falha por causa do armazenamento; só a exportação fica indisponível
+            logger.error(f"Falha ao gravar resultados da execução {run_id}: {e}")
+        return run_id, results
@@ -0,0 +1,94 @@
+"""
+Rastreamento opcional de execuções (spans) no formato Chrome Trace Event.
+
+Cada execução gera logs/traces/trace_<run_id>.json com a árvore
+run → dia → listagem/documento → fetch/parse/extract/ai. O arquivo abre em
+chrome://tracing, https://ui.perfetto.dev ou speedscope (flamegraph).
+"""
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("diario_current_span", default=None)
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "tid", "start", "attrs")
+
+    def __init__(self, span_id, parent_id, name, tid, start, attrs):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.tid = tid
+        self.start = start
+        self.attrs = attrs
+
+
+class Tracer:
+    """Coleta spans em memória e grava um único JSON ao final da execução"""
+
+    def __init__(self, run_id: str, traces_dir: str):
+        self.run_id = run_id
+        self.path = os.path.join(traces_dir, f"trace_{run_id}.json")
+        self._events = []
+        self._ids = itertools.count(1)
+        # Documentos concorrentes ganham "trilhas" (tid) próprias para não se sobreporem no visualizador
+        self._lanes = itertools.count(2)
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+        self._pid = os.getpid()
+        os.makedirs(traces_dir, exist_ok=True)
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._epoch) * 1e6
+
+    @contextmanager
+    def span(self, name: str, lane: bool = False, **attrs):
+        """Abre um span filho do span atual; o dict de atributos pode ser alterado pelo chamador"""
+        parent = _current_span.get()
+        tid = next(self._lanes) if lane else (parent.tid if parent else 1)
+        span = Span(next(self._ids), parent.span_id if parent else None, name, tid, self._now_us(), dict(attrs))
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span.attrs
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            args = {k: v for k, v in span.attrs.items() if v is not None}
+            args["span_id"] = span.span_id
+            if span.parent_id:
+                args["parent_id"] = span.parent_id
+            if error is not None:
+                args["error"] = f"{type(error).__name__}: {error}"
+            event = {
+                "name": name, "cat": "diario", "ph": "X", "pid": self._pid, "tid": span.tid,
+                "ts": round(span.start, 1), "dur": round(self._now_us() - span.start, 1), "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+
+    def save(self) -> str:
+        with self._lock:
+            events = sorted(self._events, key=lambda e: e["ts"])
+        payload = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"run_id": self.run_id},
+        }
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            logger.info(f"Trace salvo em {self.path} ({len(events)} spans)")
+        except Exception as e:
+            logger.error(f"Erro ao salvar trace: {e}")
+        return self.path
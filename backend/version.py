@@ -1,9 +1,7 @@
 """
 Sistema de versionamento e verificação de atualizações
 """
-import aiohttp
 import logging
-from packaging import version
 from typing import Optional, Dict
 
 logger = logging.getLogger(__name__)
@@ -30,8 +28,9 @@ class UpdateInfo:
         self.release_date = data.get("release_date", "")
         self.critical = data.get("critical", False)
         
-        # Comparar versões
+        # Comparar versões (packaging importado aqui para não pesar na inicialização)
         try:
+            from packaging import version
             if version.parse(self.latest_version) > version.parse(self.current_version):
                 self.available = True
         except Exception as e:
@@ -62,6 +61,8 @@ async def check_for_updates() -> Optional[UpdateInfo]:
         logger.info("URL de verificação de atualização não configurada ainda")
         return None
     
+    import aiohttp
+
     try:
         logger.info(f"Verificando atualizações... Versão atual: {VERSION}")
         
@@ -0,0 +1,164 @@
+"""
+Modo vigia: consulta periódica do dia corrente para detectar só publicações novas.
+
+Cada vigia (órgãos, termos, intervalo) é consultado pelo agendador dentro do
+processo do FastAPI. A listagem do dia é sempre lida (uma requisição por
+órgão), mas o detalhe só é aberto para doc_ids que ainda não estão no
+conjunto de vistos; sem novidade, nenhuma página de detalhe é aberta. As
+novidades viram um digest (e uma execução no ResultStore) que a interface
+mostra assim que abre. Vigias, vistos e digests ficam em logs/watches.json.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import metrics
+import records
+from models import SearchRequest, WatchConfig
+
+logger = logging.getLogger(__name__)
+
+# Dias de doc_ids vistos mantidos por vigia
+SEEN_DAYS = 7
+MAX_DIGESTS = 50
+
+
+class Watcher:
+    def __init__(self, service, state_file: str, tick_s: float = 30):
+        self.service = service
+        self.state_file = state_file
+        self.tick_s = tick_s
+        self._task = None
+        self._state = {"watches": [], "seen": {}, "digests": []}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self._state.update(json.load(f))
+        except Exception as e:
+            logger.error(f"Estado do modo vigia ilegível ({e}); começando vazio")
+
+    def _save(self):
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_file)
+
+    # --- Configuração ---
+
+    def list_watches(self):
+        return self._state["watches"]
+
+    def add_watch(self, config: WatchConfig) -> dict:
+        watch = {"id": uuid.uuid4().hex[:8], **config.model_dump(), "last_poll": None, "last_error": None}
+        self._state["watches"].append(watch)
+        self._save()
+        logger.info(f"Vigia {watch['id']} criado: órgãos {watch['orgaos']}, termos {watch['terms']}, a cada {watch['interval_minutes']} min")
+        return watch
+
+    def remove_watch(self, watch_id: str) -> bool:
+        before = len(self._state["watches"])
+        self._state["watches"] = [w for w in self._state["watches"] if w["id"] != watch_id]
+        self._state["seen"].pop(watch_id, None)
+        if len(self._state["watches"]) == before:
+            return False
+        self._save()
+        return True
+
+    # --- Digests ---
+
+    def digests(self, unread_only: bool = True):
+        return [d for d in self._state["digests"] if not (unread_only and d["read"])]
+
+    def ack(self, digest_id: str) -> bool:
+        for d in self._state["digests"]:
+            if d["id"] == digest_id:
+                d["read"] = True
+                self._save()
+                return True
+        return False
+
+    # --- Agendamento ---
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _due(self, watch: dict, now: datetime) -> bool:
+        if not watch.get("enabled", True):
+            return False
+        if not watch.get("last_poll"):
+            return True
+        return now - datetime.fromisoformat(watch["last_poll"]) >= timedelta(minutes=watch["interval_minutes"])
+
+    async def _loop(self):
+        while True:
+            for watch in list(self._state["watches"]):
+                if self._due(watch, datetime.now()):
+                    try:
+                        await self.poll(watch)
+                    except Exception as e:
+                        metrics.WATCH_POLLS.inc(result="error")
+                        watch["last_poll"] = datetime.now().isoformat(timespec="seconds")
+                        watch["last_error"] = str(e)
+                        self._save()
+                        logger.error(f"Vigia {watch['id']} falhou: {e}")
+            await asyncio.sleep(self.tick_s)
+
+    def _seen_for(self, watch_id: str, day: str) -> set:
+        """Vistos do vigia no dia; descarta dias além de SEEN_DAYS"""
+        by_day = self._state["seen"].setdefault(watch_id, {})
+        cutoff = datetime.now() - timedelta(days=SEEN_DAYS)
+        for d in [d for d in by_day if datetime.strptime(d, "%d/%m/%Y") < cutoff]:
+            del by_day[d]
+        return set(by_day.get(day, []))
+
+    async def poll(self, watch: dict):
+        """Uma consulta do vigia; retorna o digest criado ou None"""
+        if self.service.is_running:
+            # Uma pesquisa manual está usando o scraper; o vigia tenta de novo no próximo tick
+            metrics.WATCH_POLLS.inc(result="skipped")
+            logger.info(f"Vigia {watch['id']} adiado: scraper em execução")
+            return None
+
+        today = datetime.now().strftime("%d/%m/%Y")
+        seen = self._seen_for(watch["id"], today)
+        request = SearchRequest(start_date=today, end_date=today, terms=watch["terms"], orgaos=watch["orgaos"])
+        run_id, results = await self.service.run(request, known_doc_ids=seen, persist=False)
+
+        # "S/N" é de vários documentos: esses ficam vistos pelo link da matéria
+        keys = [records.document_key(r.document_id, r.link_html) for r in results]
+        new = [r for r, key in zip(results, keys) if key not in seen]
+        self._state["seen"][watch["id"]][today] = sorted(seen | set(keys))
+        watch["last_poll"] = datetime.now().isoformat(timespec="seconds")
+        watch["last_error"] = None
+
+        digest = None
+        if new:
+            await asyncio.to_thread(self.service.store.save, run_id, new, today, today)
+            digest = {
+                "id": uuid.uuid4().hex[:8], "watch_id": watch["id"], "run_id": run_id,
+                "created_at": watch["last_poll"], "count": len(new), "read": False,
+                "items": [records.to_dict(r) for r in new],
+            }
+            self._state["digests"] = (self._state["digests"] + [digest])[-MAX_DIGESTS:]
+            metrics.WATCH_NEW_DOCUMENTS.inc(len(new))
+            logger.info(f"Vigia {watch['id']}: {len(new)} publicação(ões) nova(s)")
+        metrics.WATCH_POLLS.inc(result="new" if new else "empty")
+        self._save()
+        return digest
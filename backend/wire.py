@@ -0,0 +1,83 @@
+"""
+Codificação compacta da mensagem de resultados do WebSocket.
+
+O cliente negocia no start_search:
+
+    {"action": "start_search", "payload": {...},
+     "encoding": "columnar", "compression": "deflate", "fields": ["date", ...]}
+
+"columnar" manda os nomes dos campos uma vez só ("fields") e as linhas como
+listas; colunas de baixa cardinalidade (termo, tipo, órgão, data...) viram
+índices num dicionário ("dicts") e link_pdf igual ao link_html vai como
+null ("same"). Nesse formato os resultados vão em blocos: um "result"
+seguido de "result_append", para a interface começar a desenhar antes de
+receber tudo. Com "deflate" o JSON vai comprimido (zlib) num frame
+binário, que o navegador abre com DecompressionStream("deflate"). Sem
+negociação a mensagem continua no formato JSON original.
+"""
+import json
+import zlib
+from typing import List, Optional
+
+import records
+from records import ResultRecord
+
+ENCODINGS = ("json", "columnar")
+COMPRESSIONS = ("none", "deflate")
+ALL_FIELDS = records.FIELDS
+
+# Colunas com poucos valores distintos por execução
+DICT_FIELDS = {"date", "term", "category", "modality", "doc_type", "doc_label", "orgao", "run_id", "validity_start", "validity_end", "opening_date"}
+# campo -> campo do qual costuma ser cópia (null na linha = mesmo valor)
+SAME_AS = {"link_pdf": "link_html"}
+# Resultados por mensagem no formato columnar
+CHUNK_ROWS = 500
+
+
+def negotiate(message: dict):
+    """(encoding, compression, fields) pedidos pelo cliente; valores desconhecidos caem no padrão"""
+    encoding = message.get("encoding") if message.get("encoding") in ENCODINGS else "json"
+    compression = message.get("compression") if message.get("compression") in COMPRESSIONS else "none"
+    fields = [f for f in (message.get("fields") or []) if f in ALL_FIELDS] or None
+    return encoding, compression, fields
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_columnar(results: List[ResultRecord], fields: Optional[List[str]] = None) -> dict:
+    fields = fields or ALL_FIELDS
+    dicts = {f: {} for f in fields if f in DICT_FIELDS}
+    same = {f: src for f, src in SAME_AS.items() if f in fields and src in fields}
+    rows = []
+    for r in results:
+        row = []
+        for f in fields:
+            value = getattr(r, f)
+            if f in same and value == getattr(r, same[f]):
+                value = None
+            elif f in dicts:
+                value = dicts[f].setdefault(value, len(dicts[f]))
+            row.append(value)
+        rows.append(row)
+    return {"encoding": "columnar", "fields": fields, "dicts": {f: list(d) for f, d in dicts.items()}, "same": same, "rows": rows}
+
+
+def _pack(message: dict, compression: str):
+    text = _dumps(message)
+    if compression == "deflate":
+        return zlib.compress(text.encode("utf-8"), 6)
+    return text
+
+
+def iter_result_messages(results: List[ResultRecord], run_id: str, encoding: str = "json", compression: str = "none",
+                         fields: Optional[List[str]] = None, chunk_rows: int = CHUNK_ROWS):
+    """Mensagens de resultado prontas para envio: str (frame de texto) ou bytes (frame binário, comprimido)"""
+    if encoding != "columnar":
+        data = [records.to_dict(r, fields) for r in results]
+        yield _pack({"type": "result", "run_id": run_id, "data": data}, compression)
+        return
+    for start in range(0, max(len(results), 1), chunk_rows):
+        message_type = "result" if start == 0 else "result_append"
+        yield _pack({"type": message_type, "run_id": run_id, **encode_columnar(results[start:start + chunk_rows], fields)}, compression)
@@ -1,6 +1,39 @@
 let socket;
 let allResults = [];
+let currentRunId = null;
 let reconnectInterval = 3000;
+let messageQueue = Promise.resolve();
+
+// Campos usados pela interface; os demais não são enviados pelo servidor (ver backend/wire.py)
+const RESULT_FIELDS = [
+    'date', 'term', 'process_number', 'document_id', 'summary', 'object_text', 'contractor', 'company_doc',
+    'value', 'contract_number', 'validity_start', 'validity_end', 'link_html', 'link_pdf', 'modality',
+    'opening_date', 'amendment_number', 'parent_contract', 'doc_type', 'doc_label', 'orgao', 'duplicate_of',
+];
+const SUPPORTS_DEFLATE = typeof DecompressionStream !== 'undefined';
+
+// Frames binários chegam comprimidos (deflate); os de texto são JSON puro
+async function decodeMessage(raw) {
+    if (typeof raw === 'string') return JSON.parse(raw);
+    const stream = new Blob([raw]).stream().pipeThrough(new DecompressionStream('deflate'));
+    return JSON.parse(await new Response(stream).text());
+}
+
+// Formato "columnar": nomes dos campos uma vez, dicionários por coluna e null = mesmo valor de outro campo
+function decodeResults(msg) {
+    if (msg.encoding !== 'columnar') return msg.data || [];
+    const { fields, dicts, same, rows } = msg;
+    return rows.map(row => {
+        const item = { run_id: msg.run_id };
+        fields.forEach((field, i) => {
+            item[field] = dicts[field] ? dicts[field][row[i]] : row[i];
+        });
+        for (const [field, source] of Object.entries(same)) {
+            if (item[field] === null) item[field] = item[source];
+        }
+        return item;
+    });
+}
 
 function connectWS() {
     console.log("Tentando conectar ao WebSocket...");
@@ -11,29 +44,13 @@ function connectWS() {
         updateStatus("Conectado ao servidor.");
         // Verificar atualizações quando conectar
         checkForUpdates();
+        checkWatchDigests();
     };
 
+    socket.binaryType = 'arraybuffer';
+    // Fila: a descompressão é assíncrona e não pode deixar o 'complete' passar na frente do 'result'
     socket.onmessage = (event) => {
-        try {
-            const data = JSON.parse(event.data);
-
-            if (data.type === 'log') {
-                updateStatus(data.message);
-            } else if (data.type === 'result') {
-                allResults = data.data || [];
-                renderAll(allResults);
-            } else if (data.type === 'complete') {
-                updateStatus("Raspagem concluída!");
-                toggleLoading(false);
-            } else if (data.type === 'error') {
-                const errorMsg = data.message || "Erro desconhecido";
-                updateStatus("Erro: " + errorMsg);
-                showErrorState(errorMsg);
-                toggleLoading(false);
-            }
-        } catch (e) {
-            console.error("Erro ao processar mensagem WS:", e);
-        }
+        messageQueue = messageQueue.then(() => handleMessage(event.data));
     };
 
     socket.onclose = () => {
@@ -48,10 +65,163 @@ function connectWS() {
     };
 }
 
+// ===== RESULTADOS =====
+// O worker calcula tipo, HTML e estatísticas uma vez por resultado; a grade só mantém no DOM as linhas visíveis
+const resultsWorker = new Worker('/static/results_worker.js?v=6');
+const GRID = { minCardWidth: 300, estimatedCardHeight: 360, overscanRows: 3 };
+let renderGeneration = 0;
+let cardHtml = [];
+let pendingText = '';
+let gridFrame = null;
+let gridWindowKey = '';
+let gridCols = 0;
+let rowHeights = []; // Altura medida de cada linha já renderizada (com gridCols colunas)
+
+resultsWorker.onmessage = (event) => {
+    const msg = event.data;
+    if (msg.generation !== renderGeneration) return; // Resposta de uma lista já descartada
+    for (const card of msg.cards) cardHtml.push(card);
+    appendTextView(msg.text);
+    updateStats(msg.stats);
+    scheduleGridRender();
+};
+
+function resetResults() {
+    renderGeneration++;
+    allResults = [];
+    cardHtml = [];
+    pendingText = '';
+    gridWindowKey = '';
+    rowHeights = [];
+    resultsWorker.postMessage({ type: 'reset', generation: renderGeneration });
+    document.getElementById('statsValue').innerHTML = '';
+
+    const grid = document.getElementById('resultsGrid');
+    grid.classList.remove('virtual');
+    grid.style.height = '';
+    grid.innerHTML = '';
+    document.getElementById('resultsText').innerHTML = `
+        <div class="text-doc-header">
+            <i class="fa-solid fa-file-contract" style="font-size: 1.5rem; color: var(--primary);"></i>
+            <h2>RESULTADOS - DIÁRIO OFICIAL</h2>
+        </div>
+    `;
+    updateStats(null);
+}
+
+function appendResults(items) {
+    if (!items.length) return;
+    for (const item of items) allResults.push(item);
+    resultsWorker.postMessage({ type: 'append', generation: renderGeneration, items });
+}
+
 function renderAll(results) {
-    renderGrid(results);
-    renderTextView(results);
-    updateStats(results);
+    resetResults();
+    if (results.length === 0) {
+        showEmptyResults('Nenhum resultado encontrado.', 'fa-face-frown');
+        return;
+    }
+    appendResults(results);
+}
+
+function showEmptyResults(message, icon) {
+    document.getElementById('resultsGrid').innerHTML = `
+        <div class="empty-state">
+            <i class="fa-regular ${icon}"></i>
+            <p>${message}</p>
+        </div>
+    `;
+    document.getElementById('resultsText').innerHTML = '<p>Sem resultados.</p>';
+}
+
+// Visão texto: montada em blocos, e só enquanto está aberta (o resto espera em pendingText)
+function appendTextView(html) {
+    const container = document.getElementById('resultsText');
+    if (container.classList.contains('hidden')) {
+        pendingText += html;
+    } else {
+        container.insertAdjacentHTML('beforeend', pendingText + html);
+        pendingText = '';
+    }
+}
+
+function scheduleGridRender() {
+    if (gridFrame === null) gridFrame = requestAnimationFrame(renderGridWindow);
+}
+
+// Linhas de N colunas com a altura medida de cada uma (estimada até ser renderizada):
+// a janela visível é calculada pela rolagem de .content sobre os deslocamentos acumulados
+function renderGridWindow() {
+    gridFrame = null;
+    const grid = document.getElementById('resultsGrid');
+    if (cardHtml.length === 0 || grid.classList.contains('hidden')) return;
+
+    if (!grid.classList.contains('virtual')) {
+        grid.classList.add('virtual');
+        grid.innerHTML = '<div class="results-window"></div>';
+    }
+    const windowEl = grid.firstElementChild;
+    const scroller = document.querySelector('.content');
+    const gap = parseFloat(getComputedStyle(windowEl).rowGap) || 0;
+    const cols = Math.max(1, Math.floor((grid.clientWidth + gap) / (GRID.minCardWidth + gap)));
+    if (cols !== gridCols) {
+        // Com outra largura as linhas mudam de composição: as medidas antigas não valem mais
+        gridCols = cols;
+        rowHeights = [];
+    }
+    const rows = Math.ceil(cardHtml.length / cols);
+    const offsets = rowOffsets(rows, gap);
+    grid.style.height = `${offsets[rows] - gap}px`;
+
+    const top = scroller.getBoundingClientRect().top - grid.getBoundingClientRect().top;
+    const firstRow = Math.max(0, rowAt(offsets, top) - GRID.overscanRows);
+    const lastRow = Math.min(rows - 1, rowAt(offsets, top + scroller.clientHeight) + GRID.overscanRows);
+    const key = `${firstRow}:${lastRow}:${cols}:${cardHtml.length}`;
+    if (key === gridWindowKey) return;
+    gridWindowKey = key;
+
+    windowEl.style.gridTemplateColumns = `repeat(${cols}, 1fr)`;
+    windowEl.style.transform = `translateY(${offsets[firstRow]}px)`;
+    windowEl.innerHTML = cardHtml.slice(firstRow * cols, (lastRow + 1) * cols).join('');
+
+    // Os cards de uma linha esticam até o mais alto: o primeiro de cada linha dá a altura dela
+    let changed = false;
+    for (let row = firstRow; row <= lastRow; row++) {
+        const card = windowEl.children[(row - firstRow) * cols];
+        const height = card ? card.getBoundingClientRect().height : 0;
+        if (height && Math.abs((rowHeights[row] || 0) - height) > 0.5) {
+            rowHeights[row] = height;
+            changed = true;
+        }
+    }
+    if (changed) {
+        // Altura total e deslocamentos refeitos com as medidas novas
+        gridWindowKey = '';
+        scheduleGridRender();
+    }
+}
+
+// offsets[i] = topo da linha i (offsets[rows] = fim da grade, com o último gap)
+function rowOffsets(rows, gap) {
+    const measured = rowHeights.filter(h => h);
+    const estimate = measured.length ? measured.reduce((a, b) => a + b, 0) / measured.length : GRID.estimatedCardHeight;
+    const offsets = new Array(rows + 1);
+    offsets[0] = 0;
+    for (let row = 0; row < rows; row++) {
+        offsets[row + 1] = offsets[row] + (rowHeights[row] || estimate) + gap;
+    }
+    return offsets;
+}
+
+// Linha que contém a posição `y` (busca binária nos deslocamentos)
+function rowAt(offsets, y) {
+    let lo = 0, hi = offsets.length - 2;
+    while (lo < hi) {
+        const mid = (lo + hi + 1) >> 1;
+        if (offsets[mid] <= y) lo = mid;
+        else hi = mid - 1;
+    }
+    return Math.max(0, lo);
 }
 
 function startSearch() {
@@ -59,6 +229,8 @@ function startSearch() {
     const endRaw = document.getElementById('endDate').value;
     const checkboxes = document.querySelectorAll('input[name="searchTerm"]:checked');
     const terms = Array.from(checkboxes).map(cb => cb.value);
+    const orgaosRaw = document.getElementById('orgaos').value || '';
+    const orgaos = orgaosRaw.split(',').map(o => o.trim()).filter(o => o);
 
     if (!startRaw || !endRaw) {
         alert("Por favor, preencha as datas.");
@@ -71,12 +243,16 @@ function startSearch() {
     const end = `${endParts[2]}/${endParts[1]}/${endParts[0]}`;
 
     toggleLoading(true);
+    resetResults();
     document.getElementById('resultsGrid').innerHTML = '<div class="empty-state"><p>Pesquisando...</p></div>';
 
     if (socket && socket.readyState === WebSocket.OPEN) {
         socket.send(JSON.stringify({
             action: 'start_search',
-            payload: { start_date: start, end_date: end, terms: terms }
+            payload: { start_date: start, end_date: end, terms: terms, orgaos: orgaos, integra: document.getElementById('fetchIntegra').checked },
+            encoding: 'columnar',
+            compression: SUPPORTS_DEFLATE ? 'deflate' : 'none',
+            fields: RESULT_FIELDS
         }));
     } else {
         alert("Sem conexão com o servidor. Aguarde a reconexão...");
@@ -84,12 +260,55 @@ function startSearch() {
     }
 }
 
+async function handleMessage(raw) {
+    try {
+        const data = await decodeMessage(raw);
+
+        if (data.type === 'log') {
+            updateStatus(data.message);
+        } else if (data.type === 'progress') {
+            updateStatus(formatProgress(data));
+        } else if (data.type === 'result') {
+            currentRunId = data.run_id || null;
+            renderAll(decodeResults(data));
+        } else if (data.type === 'result_append') {
+            appendResults(decodeResults(data));
+        } else if (data.type === 'complete') {
+            updateStatus("Raspagem concluída!");
+            toggleLoading(false);
+            loadRunValue(currentRunId);
+        } else if (data.type === 'error') {
+            const errorMsg = data.message || "Erro desconhecido";
+            updateStatus("Erro: " + errorMsg);
+            showErrorState(errorMsg);
+            toggleLoading(false);
+        }
+    } catch (e) {
+        console.error("Erro ao processar mensagem WS:", e);
+    }
+}
+
+function formatEta(seconds) {
+    if (seconds == null) return '';
+    if (seconds < 60) return `${seconds}s`;
+    const min = Math.round(seconds / 60);
+    return min < 60 ? `${min} min` : `${Math.floor(min / 60)}h${String(min % 60).padStart(2, '0')}`;
+}
+
+function formatProgress(p) {
+    let msg = `Dia ${p.day} de ${p.days} (${p.date}): item ${p.done} de ${p.total}`;
+    if (p.rate_per_s) msg += ` · ${p.rate_per_s.toLocaleString('pt-BR')} doc/s`;
+    if (p.eta_s != null) msg += ` · restam ~${formatEta(p.eta_s)}`;
+    return msg;
+}
+
 function updateStatus(msg) {
     const log = document.getElementById('statusLog');
     if (log) log.innerText = msg;
 }
 
 function showErrorState(msg) {
+    resetResults();
     document.getElementById('resultsGrid').innerHTML = `
         <div class="empty-state" style="color: var(--danger-color, #ff4444)">
             <i class="fa-solid fa-triangle-exclamation"></i>
@@ -99,137 +318,6 @@ function showErrorState(msg) {
     `;
 }
 
-// Helper to determine type and visual class (Unified Logic)
-function determineType(item) {
-    const term = item.term || '';
-    const summary = item.summary || '';
-    const modality = item.modality || '';
-    const fullTerm = (term + " " + summary + " " + modality).toUpperCase();
-
-    let tipo = 'OUTRO';
-
-    // Check explicit backend type first if available
-    if (item.doc_type && item.doc_type !== 'OUTRO') {
-        tipo = item.doc_type;
-    } else {
-        // Fallback inference
-        const isApostilamento = fullTerm.includes('APOSTILAMENTO');
-        const isAditamento = item.amendment_number || fullTerm.includes('ADITAMENTO');
-        const isAcordoCoop = fullTerm.includes('ACORDO DE COOPERAÇÃO') || fullTerm.includes('ACORDO DE COOPERACAO');
-        const isParceria = fullTerm.includes('FOMENTO') || fullTerm.includes('COLABORAÇÃO') || fullTerm.includes('COOPERAÇÃO') || fullTerm.includes('TERMO DE COLABORAÇÃO');
-        const isDoacao = fullTerm.includes('DOAÇÃO') || fullTerm.includes('COMODATO');
-        const isEmpenho = fullTerm.includes('EMPENHO');
-        const isDiversos = fullTerm.includes('ESCLARECIMENTO') || fullTerm.includes('QUESTIONAMENTO') || fullTerm.includes('IMPUGNAÇ') || fullTerm.includes('IMPUGNAC') || fullTerm.includes('DEMONSTRATIVO DAS COMPRAS');
-
-        const isContractStrong = fullTerm.includes('TERMO DE CONTRATO') || fullTerm.includes('EXTRATO DE CONTRATO');
-        const isPregao = fullTerm.includes('PREGÃO') || fullTerm.includes('LICITAÇÃO') || fullTerm.includes('PREGAO') || fullTerm.includes('CONVITE') || fullTerm.includes('CONCORRÊNCIA');
-        const isContractWeak = fullTerm.includes('CONTRATO');
-
-        if (isApostilamento) tipo = 'APOSTILAMENTO';
-        else if (isAditamento) tipo = 'ADITAMENTO';
-        else if (isAcordoCoop) tipo = 'ACORDO_COOPERACAO';
-        else if (isParceria) tipo = 'PARCERIA';
-        else if (isDoacao) tipo = 'DOACAO';
-        else if (isEmpenho) tipo = 'EMPENHO';
-        else if (isDiversos) tipo = 'DIVERSOS';
-        else if (isContractStrong) tipo = 'CONTRATO';
-        else if (isPregao) tipo = 'PREGAO';
-        else if (isContractWeak) tipo = 'CONTRATO';
-    }
-
-    // Map type to visual class
-    let visualClass = 'outro';
-    let label = term || tipo;
-    let icon = 'fa-file';
-
-    if (tipo === 'ADITAMENTO' || tipo === 'APOSTILAMENTO') {
-        visualClass = 'aditamento';
-        icon = 'fa-file-pen';
-        label = item.amendment_number ? `ADITAMENTO ${item.amendment_number}` : 'ADITAMENTO';
-    }
-    else if (tipo === 'PARCERIA' || tipo === 'ACORDO_COOPERACAO') {
-        visualClass = 'parceria';
-        icon = 'fa-handshake';
-        label = tipo === 'ACORDO_COOPERACAO' ? 'ACORDO COOPERAÇÃO' : 'PARCERIA';
-    }
-    else if (tipo === 'DOACAO') {
-        visualClass = 'doacao';
-        icon = 'fa-gift';
-        label = 'DOAÇÃO';
-    }
-    else if (tipo === 'CONTRATO' || tipo === 'EMPENHO') {
-        visualClass = 'contrato';
-        icon = 'fa-file-signature';
-        label = tipo === 'EMPENHO' ? 'EMPENHO' : 'CONTRATO';
-    }
-    else if (tipo === 'PREGAO') {
-        visualClass = 'pregao';
-        icon = 'fa-gavel';
-        label = 'LICITAÇÃO';
-    }
-    else if (tipo === 'HOMOLOGACAO') {
-        visualClass = 'destaque';
-        icon = 'fa-award';
-        label = 'HOMOLOGAÇÃO';
-    }
-    else if (tipo === 'DIVERSOS') {
-        visualClass = 'diversos';
-        icon = 'fa-paperclip';
-        label = 'DIVERSOS';
-    }
-    else if (tipo === 'PEDIDO_COMPRA') {
-        visualClass = 'compra';
-        icon = 'fa-cart-shopping';
-        label = 'PEDIDO COMPRA';
-    }
-
-    return { tipo, visualClass, label, icon };
-}
-
-function renderGrid(results) {
-    const grid = document.getElementById('resultsGrid');
-    if (!results || results.length === 0) {
-        grid.innerHTML = `
-            <div class="empty-state">
-                <i class="fa-regular fa-face-frown"></i>
-                <p>Nenhum resultado encontrado.</p>
-            </div>
-        `;
-        return;
-    }
-
-    grid.innerHTML = '';
-    results.forEach(item => {
-        const { visualClass, label, icon } = determineType(item);
-        const typeClass = `type-${visualClass}`;
-
-        const card = document.createElement('div');
-        card.className = `card ${typeClass}`;
-
-        // Removed Object Title as requested
-        // Increased snippet lines via inline style (line-clamp: 8)
-
-        card.innerHTML = `
-            <div class="card-header">
-                <span class="badge ${typeClass}"><i class="fa-solid ${icon}"></i> ${label}</span>
-                <span class="meta-date"><i class="fa-regular fa-calendar"></i> ${item.date}</span>
-            </div>
-            
-            <div class="meta-row" style="margin-top: 1rem; margin-bottom:0.5rem">
-                <span><strong>Processo:</strong> ${item.process_number || '-'}</span>
-            </div>
-            
-            <p class="snippet" title="${item.summary}" style="-webkit-line-clamp: 8; line-clamp: 8;">${item.summary}</p>
-            
-            <div class="card-footer">
-                <a href="${item.link_pdf}" target="_blank" class="link-btn"><i class="fa-solid fa-file-pdf"></i> Ver PDF</a>
-                <a href="${item.link_html}" target="_blank" class="link-btn" style="color:var(--text-dim);font-size:0.8rem;font-weight:400">Ver Web</a>
-            </div>
-        `;
-        grid.appendChild(card);
-    });
-}
-
 function toggleLoading(isLoading) {
     const btn = document.getElementById('btnSearch');
     const statusBox = document.getElementById('statusArea');
@@ -265,6 +353,9 @@ window.addEventListener('DOMContentLoaded', () => {
 
     // Carregar versão atual
     loadCurrentVersion();
+
+    document.querySelector('.content').addEventListener('scroll', scheduleGridRender, { passive: true });
+    window.addEventListener('resize', scheduleGridRender);
 });
 
 // View Switching
@@ -279,259 +370,115 @@ function switchView(view) {
         text.classList.add('hidden');
         btnCards.classList.add('active');
         btnText.classList.remove('active');
+        gridWindowKey = '';
+        scheduleGridRender();
     } else {
         grid.classList.add('hidden');
         text.classList.remove('hidden');
         btnCards.classList.remove('active');
         btnText.classList.add('active');
+        appendTextView('');
     }
     // Scroll to top to ensure user sees the change
     document.querySelector('.content').scrollTop = 0;
 }
 
-function updateStats(results) {
+// Contagens calculadas no worker pelo tipo canônico
+function updateStats(stats) {
     const statsBox = document.getElementById('statsBox');
     const content = document.getElementById('statsContent');
 
-    if (!results || results.length === 0) {
+    if (!stats || stats.total === 0) {
         statsBox.classList.add('hidden');
         return;
     }
 
-    let contratos = 0;
-    let pregoes = 0;
-    let aditamentos = 0;
-    let outros = 0;
-
-    results.forEach(r => {
-        const t = ((r.term || '') + (r.summary || '')).toUpperCase();
-        if (t.includes('CONTRATO')) contratos++;
-        else if (t.includes('PREGÃO') || t.includes('PREGAO')) pregoes++;
-        else if (t.includes('ADITAMENTO')) aditamentos++;
-        else outros++;
-    });
-
     content.innerHTML = `
-        <div class="stat-row"><strong>Contratos:</strong> <span>${contratos}</span></div>
-        <div class="stat-row"><strong>Pregões:</strong> <span>${pregoes}</span></div>
-        <div class="stat-row"><strong>Aditamentos:</strong> <span>${aditamentos}</span></div>
-        <div class="stat-row"><strong>Outros:</strong> <span>${outros}</span></div>
+        <div class="stat-row"><strong>Contratos:</strong> <span>${stats.contratos}</span></div>
+        <div class="stat-row"><strong>Pregões:</strong> <span>${stats.pregoes}</span></div>
+        <div class="stat-row"><strong>Aditamentos:</strong> <span>${stats.aditamentos}</span></div>
+        <div class="stat-row"><strong>Outros:</strong> <span>${stats.outros}</span></div>
         <hr style="border-color: rgba(255,255,255,0.1); margin: 0.5rem 0;">
-        <div class="stat-row" style="font-size: 1rem;"><strong>Total:</strong> <span>${results.length}</span></div>
+        <div class="stat-row" style="font-size: 1rem;"><strong>Total:</strong> <span>${stats.total}</span></div>
     `;
     statsBox.classList.remove('hidden');
 }
 
 
+// Valores somados no servidor (backend/analytics.py): o campo "value" é texto livre e não dá para somar aqui
+const BRL = new Intl.NumberFormat('pt-BR', { style: 'currency', currency: 'BRL' });
+
+async function loadRunValue(runId) {
+    const box = document.getElementById('statsValue');
+    box.innerHTML = '';
+    if (!runId) return;
+    try {
+        const response = await fetch(`/api/analytics/summary?group_by=doc_type&run_id=${encodeURIComponent(runId)}`);
+        const groups = await response.json();
+        const total = groups.reduce((sum, g) => sum + g.total_cents, 0);
+        const valued = groups.reduce((sum, g) => sum + g.valued, 0);
+        if (valued === 0) return;
+        box.innerHTML = `<div class="stat-row"><strong>Valor total:</strong> <span>${BRL.format(total / 100)}</span></div>
+            <div class="stat-row" style="font-size: 0.8rem; color: var(--text-dim);">${valued} documento(s) com valor identificado</div>`;
+    } catch (error) {
+        console.log('Não foi possível carregar os valores da execução:', error);
+    }
+}
+
 function clearResults() {
-    document.getElementById('resultsGrid').innerHTML = `
-        <div class="empty-state">
-            <i class="fa-regular fa-folder-open"></i>
-            <p>Resultados limpos.</p>
-        </div>
-    `;
-    allResults = [];
+    resetResults();
+    showEmptyResults('Resultados limpos.', 'fa-folder-open');
+    currentRunId = null;
 }
 
-function exportCSV() {
-    if (allResults.length === 0) {
+// Exportação gerada no servidor em streaming (csv, xlsx ou parquet) a partir dos resultados gravados da execução
+function exportResults(format = 'csv') {
+    if (allResults.length === 0 || !currentRunId) {
         alert("Nada para exportar!");
         return;
     }
-
-    const headers = ["Data", "Termo", "Objeto", "Valor", "Processo", "Contratada", "Link PDF"];
-    let csvContent = headers.join(",") + "\n";
-
-    allResults.forEach(row => {
-        const line = [
-            row.date,
-            `"${row.term}"`,
-            `"${row.object_text.replace(/"/g, '""')}"`,
-            `"${row.value}"`,
-            row.process_number,
-            `"${row.contractor}"`,
-            row.link_pdf
-        ];
-        csvContent += line.join(",") + "\n";
-    });
-
-    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-    const url = URL.createObjectURL(blob);
     const link = document.createElement("a");
-    link.setAttribute("href", url);
-    link.setAttribute("download", "resultados_diario.csv");
+    link.setAttribute("href", `/api/runs/${encodeURIComponent(currentRunId)}/export?format=${format}`);
+    link.setAttribute("download", `resultados_diario.${format}`);
     document.body.appendChild(link);
     link.click();
+    link.remove();
 }
 
-// Init
-
-function renderTextView(results) {
-    const container = document.getElementById('resultsText');
+// ===== MODO VIGIA =====
+// Publicações novas encontradas pelas consultas agendadas (backend/watcher.py)
+let pendingDigests = [];
 
-    if (results.length === 0) {
-        container.innerHTML = '<p>Sem resultados.</p>';
-        return;
+async function checkWatchDigests() {
+    try {
+        const response = await fetch('/api/watch/digests');
+        pendingDigests = await response.json();
+        const total = pendingDigests.reduce((sum, d) => sum + d.count, 0);
+        if (total === 0) return;
+        document.getElementById('watchMessage').textContent =
+            `${total} publicação(ões) nova(s) encontrada(s) pelo modo vigia desde a última visita.`;
+        document.getElementById('watchBanner').classList.remove('hidden');
+    } catch (error) {
+        console.log('Não foi possível consultar o modo vigia:', error);
     }
+}
 
-    let html = `
-        <div class="text-doc-header">
-            <i class="fa-solid fa-file-contract" style="font-size: 1.5rem; color: var(--primary);"></i>
-            <h2>RESULTADOS - DIÁRIO OFICIAL</h2>
-        </div>
-    `;
-
-    results.forEach(item => {
-        const { tipo, visualClass } = determineType(item);
-        const modality = item.modality || '';
-        const objText = item.object_text || '-';
-
-        const P = (label, value) => `<p><strong>${label}</strong> ${value}</p>`;
-
-        html += `<div class="text-item type-${visualClass}">`;
-
-        // --- LAYOUT ADITAMENTO / APOSTILAMENTO ---
-        if (tipo === 'ADITAMENTO' || tipo === 'APOSTILAMENTO') {
-            const labelTipo = tipo === 'APOSTILAMENTO' ? 'Apostilamento' : 'Aditamento';
-
-            html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
-
-            const numAdit = item.amendment_number || "S/N";
-            const numPai = item.parent_contract || "S/N";
-            html += `<p>
-                 <strong>${labelTipo} nº </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${numAdit}</a> 
-                 <strong>ao Contrato nº </strong> ${numPai}
-             </p>`;
-
-            html += P("Contratada:", `${item.contractor || '-'} ${item.company_doc && item.company_doc !== '-' ? ', ' + item.company_doc : ''}`);
-            if (modality && modality !== '-') html += P("Modalidade:", modality);
-
-            html += P("Objeto:", objText);
-            html += P("Data da Assinatura:", item.validity_start || '-');
-            html += P("Data da Publicação:", item.date);
-
-            if (item.validity_end && item.validity_end !== '-') {
-                html += P("Vigência:", `${item.validity_start} e ${item.validity_end}`);
-            }
-            html += P("Valor:", item.value || 'Sem efeito financeiros');
-        }
-
-        // --- LAYOUT ACORDO DE COOPERAÇÃO ---
-        else if (tipo === 'ACORDO_COOPERACAO') {
-            html += `<p><strong>Número do processo: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
-
-            const numAcordo = item.contract_number ? item.contract_number.replace(/^0*/, '').padStart(3, '0') + '/' + new Date().getFullYear().toString() : "S/N"; // formatting NNN/AAAA loosely or using what comes. Actually, let's format it properly:
-            
-            // Format to NNN/AAAA if possible
-            let formattedNum = item.contract_number || "S/N";
-            if (formattedNum !== "S/N" && formattedNum.includes('/')) {
-                let parts = formattedNum.split('/');
-                let nnn = parts[0].padStart(3, '0');
-                let aaaa = parts[1];
-                if (aaaa.length === 2 && parseInt(aaaa) > 10) aaaa = "20" + aaaa;
-                formattedNum = `${nnn}/${aaaa}`;
-            }
-
-            html += `<p>
-                 <strong>Número do termo: </strong> ACORDO DE COOPERAÇÃO <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${formattedNum}</a>
-             </p>`;
-
-            const orgaoCompleto = `${item.contractor || '-'} ${item.company_doc && item.company_doc !== '-' ? ', CNPJ nº ' + item.company_doc : ''}`;
-            html += P("Nome do órgão/instituição:", orgaoCompleto);
-            html += P("Objeto:", objText);
-            html += P("Data da Assinatura:", item.validity_start || '-');
-            html += P("Data da Publicação:", item.date);
-
-            const vigInicio = item.validity_start || '-';
-            const vigFim = item.validity_end || '-';
-            html += P("Vigência:", `de ${vigInicio} a ${vigFim}`);
-        }
-
-        // --- LAYOUT PARCERIA (Convênios, Fomento) ---
-        else if (tipo === 'PARCERIA') {
-            html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
-
-            const numInst = item.contract_number || "S/N";
-            html += `<p>
-                 <strong>Instrumento nº </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${numInst}</a>
-             </p>`;
-
-            html += P("Participe/OS:", item.contractor || '-');
-            html += P("Objeto:", objText);
-            html += P("Vigência:", `${item.validity_start || '-'} a ${item.validity_end || '-'}`);
-            html += P("Valor:", item.value || '-');
-            html += P("Data da Publicação:", item.date);
-        }
-
-        // --- LAYOUT DOAÇÃO / COMODATO ---
-        else if (tipo === 'DOACAO') {
-            html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
-            html += `<p><strong>Instrumento: </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">Termo de Doação/Comodato</a></p>`;
-
-            html += P("Doador/Comodatário:", item.contractor || '-');
-            html += P("Objeto:", objText);
-            html += P("Encargos:", "Sem ônus para a municipalidade"); // Default assumption unless scraped
-            html += P("Data da Publicação:", item.date);
-        }
-
-        // --- LAYOUT CONTRATO / EMPENHO ---
-        else if (tipo === 'CONTRATO' || tipo === 'EMPENHO') {
-            const labelInst = tipo === 'EMPENHO' ? 'Nota de Empenho' : 'Contrato';
-
-            html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
-
-            const numCont = item.contract_number && item.contract_number !== '-' ? item.contract_number : "S/N";
-            html += `<p>
-                <strong>${labelInst} nº </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${numCont}</a> - ${item.contractor} ${item.company_doc && item.company_doc !== '-' ? ', ' + item.company_doc : ''}
-            </p>`;
-
-            if (modality && modality !== '-') {
-                html += P("Modalidade:", modality);
-            }
-
-            html += P("Objeto:", objText);
-            html += P("Data da Assinatura:", item.validity_start || '-');
-            if (tipo === 'CONTRATO') {
-                html += P("Início da Vigência do Contrato:", item.validity_start || '-');
-                html += P("Término da Vigência do Contrato:", item.validity_end || '-');
-            }
-            html += P("Data da Publicação:", item.date);
-            html += P("Valor:", item.value || 'Sem efeito financeiros');
-        }
-
-        // --- LAYOUT PREGÃO / LICITAÇÃO / OUTROS ---
-        else {
-            if (tipo === 'DIVERSOS') {
-                html += `<p style="opacity: 0.7; font-size: 0.9em;"><em>[Publicação Diversa - Baixa Prioridade]</em></p>`;
-            }
-
-            html += P("Número do Processo:", item.process_number || '-');
-
-            const pubNum = item.contract_number && item.contract_number.length > 2 ? item.contract_number : "S/N";
-            const pubLabel = (modality && modality !== '-' ? modality : "PUBLICACAO");
-            html += `<p>
-                <strong>Número da Publicação: </strong> 
-                <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${pubLabel} ${pubNum}</a>
-             </p>`;
-
-            html += `<p><strong>Documento: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.document_id || '-'}</a></p>`;
-
-            if (tipo !== 'DIVERSOS') {
-                html += P("Licitante Vencedor:", item.contractor || 'EM PROCESSO');
-                html += P("Modalidade:", modality);
-                html += P("Data da Abertura:", item.opening_date || '-');
-            }
-
-            html += P("Objeto:", objText);
-            html += P("Data de Publicação:", item.date);
-        }
-
-        html += `</div>`;
-    });
+async function showWatchDigests() {
+    const digests = pendingDigests;
+    pendingDigests = [];
+    document.getElementById('watchBanner').classList.add('hidden');
+    renderAll(digests.flatMap(d => d.items));
+    // Exportação só faz sentido quando os itens vêm de uma única execução
+    currentRunId = digests.length === 1 ? digests[0].run_id : null;
+    await Promise.all(digests.map(d => fetch(`/api/watch/digests/${d.id}/ack`, { method: 'POST' })));
+}
 
-    container.innerHTML = html;
+function dismissWatchBanner() {
+    document.getElementById('watchBanner').classList.add('hidden');
 }
 
+// Init
+
 // ===== UPDATE SYSTEM =====
 
 async function loadCurrentVersion() {
@@ -0,0 +1,231 @@
+// Web Worker dos resultados: tipo visual, HTML dos cards e da visão texto e estatísticas,
+// calculados uma vez por resultado fora da thread da interface.
+// Entrada: {type: 'reset'|'append', generation, items} -> saída: {type: 'rendered', generation, cards, text, stats}
+
+// Visual por tipo canônico; o tipo e o rótulo vêm prontos do backend (classification.py)
+const TYPE_VISUALS = {
+    ADITAMENTO: { visualClass: 'aditamento', icon: 'fa-file-pen' },
+    APOSTILAMENTO: { visualClass: 'aditamento', icon: 'fa-file-pen' },
+    PARCERIA: { visualClass: 'parceria', icon: 'fa-handshake' },
+    ACORDO_COOPERACAO: { visualClass: 'parceria', icon: 'fa-handshake' },
+    DOACAO: { visualClass: 'doacao', icon: 'fa-gift' },
+    CONTRATO: { visualClass: 'contrato', icon: 'fa-file-signature' },
+    EMPENHO: { visualClass: 'contrato', icon: 'fa-file-signature' },
+    PREGAO: { visualClass: 'pregao', icon: 'fa-gavel' },
+    HOMOLOGACAO: { visualClass: 'destaque', icon: 'fa-award' },
+    DIVERSOS: { visualClass: 'diversos', icon: 'fa-paperclip' },
+    PEDIDO_COMPRA: { visualClass: 'compra', icon: 'fa-cart-shopping' },
+};
+
+function determineType(item) {
+    const tipo = item.doc_type || 'OUTRO';
+    const visual = TYPE_VISUALS[tipo] || { visualClass: 'outro', icon: 'fa-file' };
+    // Sem tipo reconhecido, o termo pesquisado identifica melhor o card que "OUTRO"
+    const label = tipo === 'OUTRO' ? (item.term || item.doc_label || tipo) : (item.doc_label || tipo);
+    return { tipo, label, ...visual };
+}
+
+// Agrupamento das estatísticas pelo tipo canônico
+const STAT_GROUPS = {
+    CONTRATO: 'contratos', EMPENHO: 'contratos',
+    PREGAO: 'pregoes', HOMOLOGACAO: 'pregoes',
+    ADITAMENTO: 'aditamentos', APOSTILAMENTO: 'aditamentos',
+};
+
+let stats = null;
+
+function emptyStats() {
+    return { contratos: 0, pregoes: 0, aditamentos: 0, outros: 0, total: 0 };
+}
+
+function renderCard(item, view) {
+    const { visualClass, label, icon } = view;
+    const typeClass = `type-${visualClass}`;
+    return `<div class="card ${typeClass}">
+    <div class="card-header">
+        <span class="badge ${typeClass}"><i class="fa-solid ${icon}"></i> ${label}</span>
+        <span class="meta-date"><i class="fa-regular fa-calendar"></i> ${item.date}</span>
+    </div>
+    ${item.duplicate_of ? `<span class="duplicate-tag" title="Matéria quase idêntica ao documento ${item.duplicate_of}"><i class="fa-solid fa-clone"></i> Republicação de ${item.duplicate_of}</span>` : ''}
+
+    <div class="meta-row" style="margin-top: 1rem; margin-bottom:0.5rem">
+        <span><strong>Processo:</strong> ${item.process_number || '-'}</span>
+        <span><strong>Órgão:</strong> ${item.orgao || '-'}</span>
+    </div>
+
+    <p class="snippet" title="${item.summary}" style="-webkit-line-clamp: 8; line-clamp: 8;">${item.summary}</p>
+
+    <div class="card-footer">
+        <a href="${item.link_pdf}" target="_blank" class="link-btn"><i class="fa-solid fa-file-pdf"></i> Ver PDF</a>
+        <a href="${item.link_html}" target="_blank" class="link-btn" style="color:var(--text-dim);font-size:0.8rem;font-weight:400">Ver Web</a>
+    </div>
+    </div>`;
+}
+
+function renderTextItem(item, view) {
+    const { tipo, visualClass } = view;
+    const modality = item.modality || '';
+    const objText = item.object_text || '-';
+
+    const P = (label, value) => `<p><strong>${label}</strong> ${value}</p>`;
+
+    let html = `<div class="text-item type-${visualClass}">`;
+
+    // --- LAYOUT ADITAMENTO / APOSTILAMENTO ---
+    if (tipo === 'ADITAMENTO' || tipo === 'APOSTILAMENTO') {
+        const labelTipo = tipo === 'APOSTILAMENTO' ? 'Apostilamento' : 'Aditamento';
+
+        html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
+
+        const numAdit = item.amendment_number || "S/N";
+        const numPai = item.parent_contract || "S/N";
+        html += `<p>
+             <strong>${labelTipo} nº </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${numAdit}</a> 
+             <strong>ao Contrato nº </strong> ${numPai}
+         </p>`;
+
+        html += P("Contratada:", `${item.contractor || '-'} ${item.company_doc && item.company_doc !== '-' ? ', ' + item.company_doc : ''}`);
+        if (modality && modality !== '-') html += P("Modalidade:", modality);
+
+        html += P("Objeto:", objText);
+        html += P("Data da Assinatura:", item.validity_start || '-');
+        html += P("Data da Publicação:", item.date);
+
+        if (item.validity_end && item.validity_end !== '-') {
+            html += P("Vigência:", `${item.validity_start} e ${item.validity_end}`);
+        }
+        html += P("Valor:", item.value || 'Sem efeito financeiros');
+    }
+
+    // --- LAYOUT ACORDO DE COOPERAÇÃO ---
+    else if (tipo === 'ACORDO_COOPERACAO') {
+        html += `<p><strong>Número do processo: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
+
+        // Format to NNN/AAAA if possible
+        let formattedNum = item.contract_number || "S/N";
+        if (formattedNum !== "S/N" && formattedNum.includes('/')) {
+            let parts = formattedNum.split('/');
+            let nnn = parts[0].padStart(3, '0');
+            let aaaa = parts[1];
+            if (aaaa.length === 2 && parseInt(aaaa) > 10) aaaa = "20" + aaaa;
+            formattedNum = `${nnn}/${aaaa}`;
+        }
+
+        html += `<p>
+             <strong>Número do termo: </strong> ACORDO DE COOPERAÇÃO <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${formattedNum}</a>
+         </p>`;
+
+        const orgaoCompleto = `${item.contractor || '-'} ${item.company_doc && item.company_doc !== '-' ? ', CNPJ nº ' + item.company_doc : ''}`;
+        html += P("Nome do órgão/instituição:", orgaoCompleto);
+        html += P("Objeto:", objText);
+        html += P("Data da Assinatura:", item.validity_start || '-');
+        html += P("Data da Publicação:", item.date);
+
+        const vigInicio = item.validity_start || '-';
+        const vigFim = item.validity_end || '-';
+        html += P("Vigência:", `de ${vigInicio} a ${vigFim}`);
+    }
+
+    // --- LAYOUT PARCERIA (Convênios, Fomento) ---
+    else if (tipo === 'PARCERIA') {
+        html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
+
+        const numInst = item.contract_number || "S/N";
+        html += `<p>
+             <strong>Instrumento nº </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${numInst}</a>
+         </p>`;
+
+        html += P("Participe/OS:", item.contractor || '-');
+        html += P("Objeto:", objText);
+        html += P("Vigência:", `${item.validity_start || '-'} a ${item.validity_end || '-'}`);
+        html += P("Valor:", item.value || '-');
+        html += P("Data da Publicação:", item.date);
+    }
+
+    // --- LAYOUT DOAÇÃO / COMODATO ---
+    else if (tipo === 'DOACAO') {
+        html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
+        html += `<p><strong>Instrumento: </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">Termo de Doação/Comodato</a></p>`;
+
+        html += P("Doador/Comodatário:", item.contractor || '-');
+        html += P("Objeto:", objText);
+        html += P("Encargos:", "Sem ônus para a municipalidade"); // Default assumption unless scraped
+        html += P("Data da Publicação:", item.date);
+    }
+
+    // --- LAYOUT CONTRATO / EMPENHO ---
+    else if (tipo === 'CONTRATO' || tipo === 'EMPENHO') {
+        const labelInst = tipo === 'EMPENHO' ? 'Nota de Empenho' : 'Contrato';
+
+        html += `<p><strong>• Processo SEI: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.process_number || '-'}</a></p>`;
+
+        const numCont = item.contract_number && item.contract_number !== '-' ? item.contract_number : "S/N";
+        html += `<p>
+            <strong>${labelInst} nº </strong> <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${numCont}</a> - ${item.contractor} ${item.company_doc && item.company_doc !== '-' ? ', ' + item.company_doc : ''}
+        </p>`;
+
+        if (modality && modality !== '-') {
+            html += P("Modalidade:", modality);
+        }
+
+        html += P("Objeto:", objText);
+        html += P("Data da Assinatura:", item.validity_start || '-');
+        if (tipo === 'CONTRATO') {
+            html += P("Início da Vigência do Contrato:", item.validity_start || '-');
+            html += P("Término da Vigência do Contrato:", item.validity_end || '-');
+        }
+        html += P("Data da Publicação:", item.date);
+        html += P("Valor:", item.value || 'Sem efeito financeiros');
+    }
+
+    // --- LAYOUT PREGÃO / LICITAÇÃO / OUTROS ---
+    else {
+        if (tipo === 'DIVERSOS') {
+            html += `<p style="opacity: 0.7; font-size: 0.9em;"><em>[Publicação Diversa - Baixa Prioridade]</em></p>`;
+        }
+
+        html += P("Número do Processo:", item.process_number || '-');
+
+        const pubNum = item.contract_number && item.contract_number.length > 2 ? item.contract_number : "S/N";
+        const pubLabel = (modality && modality !== '-' ? modality : "PUBLICACAO");
+        html += `<p>
+            <strong>Número da Publicação: </strong> 
+            <a href="${item.link_pdf}" target="_blank" style="color:blue;text-decoration:none">${pubLabel} ${pubNum}</a>
+         </p>`;
+
+        html += `<p><strong>Documento: </strong> <a href="${item.link_html}" target="_blank" style="color:blue;text-decoration:none">${item.document_id || '-'}</a></p>`;
+
+        if (tipo !== 'DIVERSOS') {
+            html += P("Licitante Vencedor:", item.contractor || 'EM PROCESSO');
+            html += P("Modalidade:", modality);
+            html += P("Data da Abertura:", item.opening_date || '-');
+        }
+
+        html += P("Objeto:", objText);
+        html += P("Data de Publicação:", item.date);
+    }
+
+
+    html += `</div>`;
+    return html;
+}
+
+self.onmessage = (event) => {
+    const msg = event.data;
+    if (msg.type === 'reset') {
+        stats = emptyStats();
+        return;
+    }
+    if (msg.type === 'append') {
+        const cards = [];
+        let text = '';
+        for (const item of msg.items) {
+            const view = determineType(item);
+            cards.push(renderCard(item, view));
+            text += renderTextItem(item, view);
+            stats[STAT_GROUPS[view.tipo] || 'outros']++;
+            stats.total++;
+        }
+        self.postMessage({ type: 'rendered', generation: msg.generation, cards, text, stats: { ...stats } });
+    }
+};
@@ -9,7 +9,7 @@ a = Analysis(
     datas=[
         ('frontend', 'frontend'),
     ],
-    hiddenimports=['uvicorn.logging', 'uvicorn.loops', 'uvicorn.loops.auto', 'uvicorn.protocols', 'uvicorn.protocols.http', 'uvicorn.protocols.http.auto', 'uvicorn.protocols.websockets', 'uvicorn.protocols.websockets.auto', 'uvicorn.lifespan', 'uvicorn.lifespan.on', 'engineio.async_drivers.aiohttp', 'playwright', 'BeautifulSoup', 'bs4'],
+    hiddenimports=['uvicorn.logging', 'uvicorn.loops', 'uvicorn.loops.auto', 'uvicorn.protocols', 'uvicorn.protocols.http', 'uvicorn.protocols.http.auto', 'uvicorn.protocols.websockets', 'uvicorn.protocols.websockets.auto', 'uvicorn.lifespan', 'uvicorn.lifespan.on', 'engineio.async_drivers.aiohttp', 'aiohttp', 'playwright', 'BeautifulSoup', 'bs4', 'scraper_service_layer', 'ai_extractor'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],